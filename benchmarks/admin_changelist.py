@@ -0,0 +1,94 @@
+"""
+    Queries and rendering time of the farm changelist in the admin, with the columns computed in SQL (current
+    FarmAdmin) vs. computed per row in Python (municipality and phone fetched/parsed row by row).
+
+    Runs against a throwaway test database filled with fake farms.
+
+    Usage: DEVELOPMENT_MODE=True python benchmarks/admin_changelist.py [farms]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mgcensus.settings")
+os.environ.setdefault("DEVELOPMENT_MODE", "True")
+
+import django
+
+django.setup()
+
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from census.admin import FarmAdmin
+from census.models import Farm, Municipality
+
+def populate(count):
+    User.objects.create_superuser("admin", "admin@example.org", "admin")
+
+    municipalities = Municipality.objects.bulk_create([Municipality(name="Commune {0}".format(i),
+                                                                    province="Namur",
+                                                                    area=50,
+                                                                    population=10000)
+                                                       for i in range(200)])
+
+    Farm.objects.bulk_create([Farm(name="Ferme {0}".format(i),
+                                   municipality=municipalities[i % len(municipalities)],
+                                   email="ferme{0}@example.org".format(i),
+                                   phone="+32470{0:06d}".format(i),
+                                   research_priorities="Le désherbage")
+                              for i in range(count)])
+
+def measure(client, per_page, repeat=5):
+    timings = []
+
+    with mock.patch.object(FarmAdmin, "list_per_page", per_page):
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(reverse("admin:census_farm_changelist"))
+                timings.append(time.perf_counter() - started)
+            assert response.status_code == 200
+
+    return len(queries), min(timings)
+
+# What the changelist did before: one query per row for the municipality, one PhoneNumber per row
+PER_ROW = {
+    "get_queryset": admin.ModelAdmin.get_queryset,
+    "municipality_display": lambda self, obj: obj.municipality.name,
+    "email_display": lambda self, obj: obj.email[:10] + '...' if obj.email is not None else None,
+    "phone_display": lambda self, obj: str(obj.phone) if obj.phone else None,
+}
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        populate(count)
+
+        client = Client()
+        client.login(username="admin", password="admin")
+
+        for per_page in (50, 200, 500):
+            with mock.patch.multiple(FarmAdmin, **PER_ROW):
+                before = measure(client, per_page)
+            after = measure(client, per_page)
+
+            print("{0:4d} rows/page: per row {1:4d} queries {2:7.1f} ms | SQL columns {3:4d} queries {4:7.1f} ms"
+                  .format(per_page, before[0], before[1] * 1000, after[0], after[1] * 1000))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+if __name__ == "__main__":
+    main()
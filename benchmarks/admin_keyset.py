@@ -0,0 +1,91 @@
+"""
+    Latency of page N of the edit links changelist in the admin, with OFFSET pages (?p=N) vs. keyset pages
+    (?after=<pk>, see census.pagination).
+
+    Runs against a throwaway test database filled with fake edit links.
+
+    Usage: DEVELOPMENT_MODE=True python benchmarks/admin_keyset.py [links]
+"""
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mgcensus.settings")
+os.environ.setdefault("DEVELOPMENT_MODE", "True")
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from census.admin import ExpiringUniqueEditLinkAdmin
+from census.models import ExpiringUniqueEditLink, Farm, Municipality
+
+def populate(count):
+    User.objects.create_superuser("admin", "admin@example.org", "admin")
+
+    municipality = Municipality.objects.create(name="Commune", province="Namur", area=50, population=10000)
+    farms = Farm.objects.bulk_create([Farm(name="Ferme {0}".format(i),
+                                           municipality=municipality,
+                                           email="ferme{0}@example.org".format(i),
+                                           research_priorities="Le désherbage")
+                                      for i in range(100)])
+
+    now = timezone.now()
+    for start in range(0, count, 10000):
+        ExpiringUniqueEditLink.objects.bulk_create([
+            ExpiringUniqueEditLink(farm=farms[i % len(farms)],
+                                   token="token-{0}".format(i),
+                                   expiration_date=now + datetime.timedelta(minutes=i))
+            for i in range(start, min(start + 10000, count))
+        ])
+
+def timed(client, url, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return min(timings) * 1000
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        populate(count)
+
+        client = Client()
+        client.login(username="admin", password="admin")
+
+        url = reverse("admin:census_expiringuniqueeditlink_changelist")
+        per_page = ExpiringUniqueEditLinkAdmin.list_per_page
+        ordered = list(ExpiringUniqueEditLink.objects.order_by("-expiration_date", "-pk").values_list("pk", flat=True))
+
+        for page in (1, 10, 100, 1000, count // per_page):
+            offset = timed(client, "{0}?p={1}".format(url, page))
+
+            # The cursor is the last row of the previous page, as in the "next" links
+            if page > 1:
+                keyset = timed(client, "{0}?after={1}".format(url, ordered[(page - 1) * per_page - 1]))
+            else:
+                keyset = timed(client, url)
+
+            print("page {0:5d}: OFFSET {1:7.1f} ms | keyset {2:7.1f} ms".format(page, offset, keyset))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+if __name__ == "__main__":
+    main()
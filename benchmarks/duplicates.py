@@ -0,0 +1,91 @@
+"""
+    Run time of the duplicate farms detection (see census.duplicates) on a growing number of fake farms, spread over
+    fake municipalities on a grid, with a few duplicates (similar name, same website or close location).
+
+    Runs against a throwaway test database.
+
+    Usage: DEVELOPMENT_MODE=True python benchmarks/duplicates.py [farms]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mgcensus.settings")
+os.environ.setdefault("DEVELOPMENT_MODE", "True")
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from census.duplicates import DuplicateDetector
+from census.models import Farm, Municipality
+
+SYLLABLES = [consonant + vowel for consonant in ["b", "br", "c", "ch", "d", "f", "g", "gr", "l", "m", "n", "p", "pr",
+                                                "r", "s", "t", "tr", "v"]
+             for vowel in ["a", "ai", "an", "e", "eau", "i", "in", "o", "on", "ou", "u"]]
+
+def fake_name(rng):
+    return " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+                    for _ in range(rng.randint(1, 3)))
+
+def populate(count, rng):
+    municipalities = Municipality.objects.bulk_create([
+        Municipality(name="Commune {0}".format(i), province="Namur", area=50, population=10000,
+                     GPS_coordinates="{0:.5f}, {1:.5f}".format(49.5 + (i // 20) * 0.07, 3 + (i % 20) * 0.11))
+        for i in range(300)
+    ])
+
+    farms, duplicates = [], 0
+    for i in range(count):
+        municipality = rng.choice(municipalities)
+        latitude, longitude = (float(v) for v in municipality.GPS_coordinates.split(", "))
+        farm = Farm(name="Ferme " + fake_name(rng), municipality=municipality, email="ferme{0}@example.org".format(i),
+                    website="https://ferme{0}.example.org".format(i) if rng.random() < 0.5 else None,
+                    GPS_coordinates="{0:.5f}, {1:.5f}".format(latitude + rng.uniform(-0.03, 0.03),
+                                                                longitude + rng.uniform(-0.05, 0.05)),
+                    research_priorities="Le désherbage")
+
+        # 1 % of duplicates of a previous farm: other e-mail, name with a typo, same website
+        if farms and rng.random() < 0.01:
+            original = rng.choice(farms)
+            farm.name = original.name.replace("a", "e", 1) + " "
+            farm.municipality = original.municipality
+            farm.website = original.website + "/?ref={0}".format(i) if original.website else None
+            farm.GPS_coordinates = original.GPS_coordinates
+            duplicates += 1
+
+        farms.append(farm)
+
+    Farm.objects.bulk_create(farms, batch_size=5000)
+    return duplicates
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(42)
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        for size in (count // 10, count // 2, count):
+            Farm.objects.all().delete()
+            Municipality.objects.all().delete()
+            duplicates = populate(size, rng)
+
+            started = time.perf_counter()
+            pairs = DuplicateDetector().run()
+            elapsed = time.perf_counter() - started
+
+            print("{0:6d} farms: {1:6.2f} s, {2} pairs found for {3} duplicates".format(size, elapsed, len(pairs),
+                                                                                        duplicates))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+    Run time of the data-quality rules (see census.quality) on a growing number of fake farms, spread over fake
+    municipalities on a grid, with a few implausible values (area in ares, FTE in people, years swapped, coordinates
+    swapped, Facebook page as website).
+
+    Runs against a throwaway test database. The target is well under a second for 10 000 farms.
+
+    Usage: DEVELOPMENT_MODE=True python benchmarks/quality.py [farms]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mgcensus.settings")
+os.environ.setdefault("DEVELOPMENT_MODE", "True")
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from census import quality
+from census.models import Farm, Municipality
+
+def populate(count, rng):
+    municipalities = []
+    for i in range(300):
+        latitude, longitude = 49.5 + (i // 20) * 0.07, 3 + (i % 20) * 0.11
+        municipalities.append(Municipality(
+            name="Commune {0}".format(i), province="Namur", area=50, population=10000,
+            GPS_coordinates="{0:.5f}, {1:.5f}".format(latitude, longitude),
+            bbox=[longitude - 0.06, latitude - 0.04, longitude + 0.06, latitude + 0.04]))
+    municipalities = Municipality.objects.bulk_create(municipalities)
+
+    farms, errors = [], 0
+    for i in range(count):
+        municipality = rng.choice(municipalities)
+        latitude, longitude = (float(v) for v in municipality.GPS_coordinates.split(", "))
+        start_year = rng.randint(1990, 2024)
+        farm = Farm(name="Ferme {0}".format(i), municipality=municipality, email="ferme{0}@example.org".format(i),
+                    area=round(rng.uniform(0.1, 5), 2), FTE=round(rng.uniform(0.5, 5), 1),
+                    FTEv=round(rng.uniform(0, 2), 1), start_year=start_year,
+                    end_year=rng.randint(start_year, 2025) if rng.random() < 0.1 else None,
+                    website="https://ferme{0}.example.org".format(i) if rng.random() < 0.5 else "",
+                    fb_page="https://facebook.com/ferme{0}".format(i) if rng.random() < 0.5 else "",
+                    GPS_coordinates="{0:.5f}, {1:.5f}".format(latitude + rng.uniform(-0.03, 0.03),
+                                                                longitude + rng.uniform(-0.05, 0.05)))
+
+        # 2 % of implausible values
+        if rng.random() < 0.02:
+            error = rng.randrange(5)
+            if error == 0:
+                farm.area = rng.choice([25, 50, 80])
+            elif error == 1:
+                farm.FTE = rng.choice([30, 45, 60])
+            elif error == 2:
+                farm.start_year, farm.end_year = 2020, 2015
+            elif error == 3:
+                farm.GPS_coordinates = "{0:.5f}, {1:.5f}".format(longitude, latitude)
+            else:
+                farm.website, farm.fb_page = "https://facebook.com/ferme{0}".format(i), ""
+            errors += 1
+
+        farms.append(farm)
+
+    Farm.objects.bulk_create(farms, batch_size=5000)
+    return errors
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(42)
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        for size in (count // 10, count // 2, count):
+            Farm.objects.all().delete()
+            Municipality.objects.all().delete()
+            errors = populate(size, rng)
+
+            started = time.perf_counter()
+            suggestions = quality.run()
+            elapsed = time.perf_counter() - started
+
+            print("{0:6d} farms: {1:6.3f} s, {2} suggestions for {3} implausible values".format(
+                size, elapsed, len(suggestions), errors))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+if __name__ == "__main__":
+    main()
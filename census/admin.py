@@ -1,67 +1,247 @@
+import datetime
+import glob
+import os
+import re
+import tempfile
+import time
+
 from django.contrib import admin
-from import_export.widgets import ForeignKeyWidget
 
-from census.models import Municipality, Farm, MarketGardener, OtherLinks, ExpiringUniqueEditLink
+from census.models import (Municipality, Farm, MarketGardener, OtherLinks, ExpiringUniqueEditLink, CampaignDelivery, Job,
+                           FarmChange, FarmTerm, LinkStatus)
+from census.resources import MunicipalityResource
 
-from import_export import fields, resources
 from import_export.admin import ImportExportModelAdmin
 
-from django.urls import reverse
-
+from django.contrib import messages
+from django.contrib.admin.utils import unquote
+from django.core.paginator import Paginator
 from django.db import models
-
-from census.utils import send_email
+from django.db.models import F
+from django.db.models.functions import Cast, Substr
+from django.http import HttpResponse, JsonResponse
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.html import format_html, format_html_join, strip_tags
+
+from census import changelog, quality
+from census.duplicates import DuplicateDetector
+from census.exports import streaming_response
+from census.importer import IMPORTERS
+from census.jobs import enqueue
+from census.pagination import KeysetPaginationMixin
+from census.search import FullTextSearchMixin
+from census.statistics import COLUMNS, statistics
+from census.survival import GROUPS, MILESTONES, survival
+from census.terms import analysis
 
 admin.site.site_header = 'Administration'
 
 """
-    MUNICIPALITY
+    JOBS
 """
-class MunicipalityResource(resources.ModelResource):
+def enqueue_job(request, kind, queryset, **params):
+    # Long operations are processed by the workers (manage.py run_jobs), the admin only follows their progress
+    job = enqueue(kind, queryset.order_by("pk").values_list("pk", flat=True), user=request.user, **params)
+    messages.success(request, "{0} ajoutée à la file d'attente ({1} élément(s)).".format(job, job.total))
+
+    return redirect("admin:census_job_change", job.pk)
+
+def run_campaign(request, kind, queryset):
+    # The campaign is resumable: the deliveries already done are skipped if the same objects are selected again
+    return enqueue_job(request, kind, queryset, base_url=request.build_absolute_uri("/"))
+
+def background_export(kind):
+    @admin.action(description="Exporter en CSV (en arrière-plan)")
+    def export(modeladmin, request, queryset):
+        return enqueue_job(request, kind, queryset)
+
+    export.__name__ = "background_" + kind
+    return export
+
+def streaming_export(kind, format):
+    # Streamed as it is read, for the selections too large for the export of django-import-export
+    @admin.action(description="Exporter en {0} (flux)".format("CSV" if format == "csv" else "JSON Lines"))
+    def export(modeladmin, request, queryset):
+        return streaming_response(kind, format, queryset)
+
+    export.__name__ = "streaming_export_" + format
+    return export
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'progress_display', 'error_count', 'created_by', 'created', 'finished')
+    list_filter = ['kind', 'status']
+    ordering = ['-created']
+    readonly_fields = ('kind', 'status', 'progress_display', 'processed', 'total', 'result', 'download', 'errors',
+                       'created_by', 'created', 'run_after', 'started', 'finished', 'heartbeat')
+    exclude = ('payload', 'result_filename')
+
+    @admin.display(description="Progression")
+    def progress_display(self, obj):
+        return format_html('<progress value="{0}" max="100"></progress> {0} % ({1}/{2})',
+                           obj.progress(), obj.processed, obj.total)
+
+    @admin.display(description="Erreurs")
+    def error_count(self, obj):
+        return len(obj.errors)
+
+    @admin.display(description="Fichier")
+    def download(self, obj):
+        if not obj.result_filename:
+            return "-"
+        return format_html('<a href="{0}">{1}</a>', reverse("admin:census_job_download", args=(obj.pk,)),
+                           obj.result_filename)
+
+    def get_urls(self):
+        urls = [
+            path("<int:job_id>/download/", self.admin_site.admin_view(self.download_view),
+                 name="census_job_download"),
+        ]
+        return urls + super().get_urls()
+
+    def download_view(self, request, job_id):
+        job = get_object_or_404(Job, pk=job_id)
+
+        response = HttpResponse(bytes(job.result_file or b""), content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="{0}"'.format(job.result_filename)
+        return response
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(Job, JobAdmin)
 
-    class Meta:
-        model = Municipality
+"""
+    BULK IMPORT
+"""
+# Uploaded files not confirmed after this many seconds are deleted
+BULK_IMPORT_MAX_AGE = 24 * 3600
+
+def remove_stale_imports(max_age=BULK_IMPORT_MAX_AGE):
+    # Files of the simulations that were never confirmed (nor cancelled explicitly, there is no such thing)
+    limit = time.time() - max_age
+    for file_path in glob.glob(os.path.join(tempfile.gettempdir(), "census-import-*.csv")):
+        try:
+            if os.path.getmtime(file_path) < limit:
+                os.remove(file_path)
+        except FileNotFoundError:
+            # Removed by a concurrent request
+            pass
+
+class BulkImportMixin:
+    # Fast import of large CSV files next to the import of django-import-export (see census.importer)
+    bulk_import_kind = None
+    import_export_change_list_template = "admin/census/change_list_bulk_import.html"
+
+    def get_urls(self):
+        urls = [
+            path("bulk-import/", self.admin_site.admin_view(self.bulk_import_view),
+                 name="census_{0}_bulk_import".format(self.model._meta.model_name)),
+        ]
+        return urls + super().get_urls()
+
+    def bulk_import_view(self, request):
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+
+        context = dict(self.admin_site.each_context(request), opts=self.model._meta, title="Import rapide")
+        remove_stale_imports()
+
+        if request.method == "POST":
+            # The file is kept between the simulation and the confirmation, as django-import-export does
+            name = request.POST.get("file_name", "")
+            if request.FILES.get("file"):
+                with tempfile.NamedTemporaryFile(prefix="census-import-", suffix=".csv", delete=False) as f:
+                    for chunk in request.FILES["file"].chunks():
+                        f.write(chunk)
+                name = os.path.basename(f.name)
+            file_path = os.path.join(tempfile.gettempdir(), name)
+
+            if not re.fullmatch(r"census-import-\w+\.csv", name) or not os.path.exists(file_path):
+                messages.error(request, "Veuillez choisir un fichier CSV.")
+                return TemplateResponse(request, "admin/census/bulk_import.html", context)
+
+            dry_run = "confirm" not in request.POST
+            importer = IMPORTERS[self.bulk_import_kind](dry_run=dry_run, actor=request.user.get_username())
+
+            try:
+                with open(file_path, newline="", encoding="utf-8-sig") as stream:
+                    report = importer.run(stream)
+            except UnicodeDecodeError:
+                os.remove(file_path)
+                messages.error(request, "Le fichier doit être encodé en UTF-8.")
+                return TemplateResponse(request, "admin/census/bulk_import.html", context)
+
+            if not dry_run:
+                os.remove(file_path)
+                messages.success(request, "Import terminé : {0}.".format(report))
+                return redirect("admin:census_{0}_changelist".format(self.model._meta.model_name))
+
+            context.update(report=report, file_name=name, fields=importer.fields)
+
+        return TemplateResponse(request, "admin/census/bulk_import.html", context)
 
+"""
+    MUNICIPALITY
+"""
 @admin.action(description="Lancer la campagne annuelle")
 def campaign_municipality(modeladmin, request, queryset):
-    for mun in queryset:
-        home_url = request.build_absolute_uri(reverse("census:index"))
-        listing_url = request.build_absolute_uri(reverse("census:listing"))
-        map_url = request.build_absolute_uri(reverse("census:map"))
-
-        farm_count = Farm.objects.filter(public=True, end_year=None, municipality_id=mun.id).count()
-
-        context = {
-            'home_url': home_url,
-            'listing_url': listing_url,
-            'map_url': map_url,
-            'farm_count': farm_count,
-        }
-
-        send_email(mun.email_list(),
-                   "Recensement 2026 du maraîchage diversifié : appel aux communes",
-                   "campaign_municipality",
-                   context)
-
-class MunicipalityAdmin(ImportExportModelAdmin):
+    return run_campaign(request, "campaign_municipality", queryset)
+
+class MunicipalityAdmin(BulkImportMixin, ImportExportModelAdmin):
     list_display = ('name', 'province', 'population', 'area', 'GPS_coordinates', 'email')
     list_filter = ['province']
     ordering = ['name']
     search_fields = ['name']
-    actions = [campaign_municipality]
+    actions = [campaign_municipality, background_export("export_municipalities"),
+               streaming_export("municipality", "csv"), streaming_export("municipality", "jsonl")]
     resource_class = MunicipalityResource
+    bulk_import_kind = "municipality"
 
 admin.site.register(Municipality, MunicipalityAdmin)
 
 """
     EXPIRING UNIQUE EDIT LINK
 """
-class ExpiringUniqueEditLinkAdmin(ImportExportModelAdmin):
+class ExpiringUniqueEditLinkAdmin(KeysetPaginationMixin, ImportExportModelAdmin):
     list_display = ('farm', 'token', 'expiration_date')
+    list_select_related = ['farm']
     ordering = ['-expiration_date']
 
 admin.site.register(ExpiringUniqueEditLink, ExpiringUniqueEditLinkAdmin)
 
+"""
+    CAMPAIGN DELIVERY
+"""
+class CampaignDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('campaign', 'farm', 'municipality', 'status', 'date', 'error')
+    list_filter = ['campaign', 'status']
+    ordering = ['-date']
+    search_fields = ['farm__name', 'municipality__name']
+    list_select_related = ['farm', 'municipality']
+
+admin.site.register(CampaignDelivery, CampaignDeliveryAdmin)
+
+"""
+    LINK STATUS
+"""
+class LinkStatusAdmin(admin.ModelAdmin):
+    # Filled by manage.py check_links (see census.links)
+    list_display = ('url', 'alive', 'status', 'error', 'failures', 'checked')
+    list_filter = ['alive', 'status']
+    ordering = ['-failures', 'url']
+    search_fields = ['url']
+    readonly_fields = ('url', 'status', 'alive', 'error', 'failures', 'checked')
+
+admin.site.register(LinkStatus, LinkStatusAdmin)
+
 """
     MARKET GARDENERS
 """
@@ -70,15 +250,16 @@ class MarketGardernerInLine(admin.StackedInline):
     classes = ['']
     extra = 0
 
-class MarketGardenerResource(resources.ModelResource):
-
-    class Meta:
-        model = MarketGardener
-
-class MarketGardenerAdmin(ImportExportModelAdmin):
+class MarketGardenerAdmin(FullTextSearchMixin, KeysetPaginationMixin, ImportExportModelAdmin):
     list_display = ('lastname', 'firstname', 'farm', 'phone', 'email')
+    list_select_related = ['farm']
     ordering = ['lastname']
+    # Full-text search on the name, e-mail and farm (see census.search)
     search_fields = ['firstname', 'lastname']
+    search_kind = "gardener"
+    search_help_text = "Nom, prénom, e-mail ou ferme (sans tenir compte des accents)."
+    actions = [background_export("export_gardeners"),
+               streaming_export("gardener", "csv"), streaming_export("gardener", "jsonl")]
 
 admin.site.register(MarketGardener, MarketGardenerAdmin)
 
@@ -93,16 +274,6 @@ class OtherLinksInLine(admin.StackedInline):
 """
     FARM
 """
-class FarmResource(resources.ModelResource):
-    municipality = fields.Field(
-        column_name='municipality',
-        attribute='municipality',
-        widget=ForeignKeyWidget(Municipality, field='name'))
-
-    class Meta:
-        model = Farm
-        fields = ('municipality',)
-
 """
     TODO: repasser dessus + voir si il est possible d'override le verbose name (très bien pour l'utilisateur, trop long
     pour l'admin.
@@ -110,97 +281,95 @@ class FarmResource(resources.ModelResource):
 
 @admin.action(description="Rendre publique")
 def make_public(modeladmin, request, queryset):
-    queryset.update(public=True)
+    changelog.update(queryset, "action", request.user, public=True)
 
 @admin.action(description="Cacher")
 def hide(modeladmin, request, queryset):
-    queryset.update(public=False)
+    changelog.update(queryset, "action", request.user, public=False)
 
 @admin.action(description='Marquer comme ajouté par "Staff"')
 def mark_staff(modeladmin, request, queryset):
-    queryset.update(added_by="Staff")
+    changelog.update(queryset, "action", request.user, added_by="Staff")
 
 @admin.action(description='Marquer comme ajouté par "User"')
 def mark_user(modeladmin, request, queryset):
-    queryset.update(added_by="User")
+    changelog.update(queryset, "action", request.user, added_by="User")
+
+@admin.action(description="Révoquer les liens d'édition envoyés")
+def revoke_edit_links(modeladmin, request, queryset):
+    count = changelog.update(queryset, "action", request.user, edit_token_generation=F("edit_token_generation") + 1)
+    ExpiringUniqueEditLink.objects.filter(farm__in=queryset).delete()
+
+    modeladmin.message_user(request, "Liens d'édition révoqués pour {0} ferme(s).".format(count), messages.SUCCESS)
 
 @admin.action(description="Lancer la campagne annuelle")
 def campaign(modeladmin, request, queryset):
-    for farm in queryset:
-        # Only send to farm with no known end_year
-        if farm.end_year is None:
-            # Delete existing link pointing to the same farm (if any)
-            ExpiringUniqueEditLink.objects.filter(farm=farm).delete()
-
-            # Create a new expiring unique edit link, expiring in three weeks
-            link = ExpiringUniqueEditLink.create(farm=farm, days=21)
-            link.save()
-
-            home_url = request.build_absolute_uri(reverse("census:index"))
-            unique_edit_url = request.build_absolute_uri(reverse("census:update", args=(link.token,)))
-
-            context = {
-                'farm': farm,
-                'home_url': home_url,
-                'unique_edit_url': unique_edit_url,
-            }
-
-            # FIXME: a try-catch here + message after operation is done ?
-            send_email(farm.email_list(),
-                       "Le recensement 2026 du maraîchage diversifié",
-                       "campaign",
-                       context)
+    return run_campaign(request, "campaign", queryset)
 
 @admin.action(description="Lancer le rappel")
 def reminder(modeladmin, request, queryset):
-    for farm in queryset:
-        # Only send to farm with no known end_year and not yet edited by user
-        if farm.end_year is None and not farm.edited_by_user :
-            # Delete existing link pointing to the same farm (if any)
-            # EDIT: don't, because people might still use the old link and get an error (it happened)
-            # ExpiringUniqueEditLink.objects.filter(farm=farm).delete()
-
-            # Create a new expiring unique edit link, expiring in three weeks
-            link = ExpiringUniqueEditLink.create(farm=farm, days=21)
-            link.save()
-
-            home_url = request.build_absolute_uri(reverse("census:index"))
-            unique_edit_url = request.build_absolute_uri(reverse("census:update", args=(link.token,)))
-
-            farm_count_mun = Farm.objects.filter(public=True, end_year=None, edited_by_user=True,
-                                                 municipality_id=farm.municipality.id).count()
-
-            farm_count_province = Farm.objects.filter(public=True, end_year=None, edited_by_user=True,
-                                                      municipality__province=farm.municipality.province).count()
-
-            context = {
-                'farm': farm,
-                'home_url': home_url,
-                'unique_edit_url': unique_edit_url,
-                'farm_count_mun' : farm_count_mun,
-                'farm_count_province' : farm_count_province,
-            }
-
-            # FIXME: a try-catch here + message after operation is done ?
-            send_email(farm.email_list(),
-                       "RAPPEL : recensement 2026 du maraîchage diversifié",
-                       "reminder",
-                       context)
-
-# TODO: @admin.action create unique expiring link
-
-class FarmAdmin(ImportExportModelAdmin):
+    return run_campaign(request, "reminder", queryset)
+
+@admin.action(description="Chercher les doublons et les signaler")
+def flag_duplicates(modeladmin, request, queryset):
+    # The selected farms are compared with all the farms (see census.duplicates)
+    pairs = DuplicateDetector().run(farm_ids=queryset.values_list("pk", flat=True))
+
+    ids = {farm.pk for pair in pairs for farm in (pair.first, pair.second)}
+    changelog.update(Farm.objects.filter(pk__in=ids), "action", request.user, flagged=True)
+
+    if not pairs:
+        messages.success(request, "Aucun doublon potentiel trouvé.")
+        return
+
+    messages.warning(request, format_html(
+        "{0} doublon(s) potentiel(s), {1} ferme(s) signalée(s) :<ul>{2}</ul>", len(pairs), len(ids),
+        format_html_join("", '<li><a href="{0}">{1}</a> / <a href="{2}">{3}</a> : {4} ({5})</li>',
+                         ((reverse("admin:census_farm_change", args=(pair.first.pk,)), pair.first.name,
+                           reverse("admin:census_farm_change", args=(pair.second.pk,)), pair.second.name,
+                           "{0:.0%}".format(pair.score), ", ".join(pair.reasons))
+                          for pair in pairs[:20]))))
+
+@admin.action(description="Vérifier la qualité des données et signaler")
+def flag_quality(modeladmin, request, queryset):
+    # Implausible values of the selected farms (see census.quality)
+    suggestions = quality.run(queryset)
+
+    flagged = changelog.update(Farm.objects.filter(pk__in=[s.pk for s in suggestions], flagged=False), "action",
+                               request.user, flagged=True)
+
+    if not suggestions:
+        messages.success(request, "Aucune donnée suspecte trouvée.")
+        return
+
+    messages.warning(request, format_html(
+        "{0} ferme(s) aux données suspectes, {1} nouvellement signalée(s) :<ul>{2}</ul>", len(suggestions), flagged,
+        format_html_join("", '<li><a href="{0}">{1}</a> : {2}</li>',
+                         ((reverse("admin:census_farm_change", args=(suggestion.pk,)), suggestion.name,
+                           " ; ".join(text for _, text in suggestion.reasons))
+                          for suggestion in suggestions[:50]))))
+
+class FarmAdmin(BulkImportMixin, FullTextSearchMixin, KeysetPaginationMixin, ImportExportModelAdmin):
     list_display = ('name_display', 'municipality_display', 'area_display', 'fte_display', 'ftev_display', 'production_display',
-                    'start_year_display', 'end_year_display', 'flagged', 'public', 'email_display', 'phone', 'consent_display', 'edited_by_user_display',
+                    'start_year_display', 'end_year_display', 'flagged', 'public', 'email_display', 'phone_display', 'consent_display', 'edited_by_user_display',
                     'last_update_display')
 
     # TODO: nicer filter https://docs.djangoproject.com/fr/6.0/ref/contrib/admin/filters/
     list_filter = ['municipality__province', 'edited_by_user', 'end_year', 'flagged', 'production', 'consent']
     ordering = ['-last_update']
+    # Full-text search on the name, address, municipality, e-mails and market gardeners (see census.search)
     search_fields = ['name', 'email', "municipality__name"]
-    actions = [make_public, hide, mark_staff, mark_user, campaign, reminder]
+    search_kind = "farm"
+    bulk_import_kind = "farm"
+    import_export_change_list_template = "admin/census/change_list_farm.html"
+    search_help_text = "Nom, adresse, commune, e-mail ou maraîcher·ère (sans tenir compte des accents)."
+    actions = [make_public, hide, mark_staff, mark_user, flag_duplicates, flag_quality, revoke_edit_links, campaign, reminder,
+               background_export("export_farms"), streaming_export("farm", "csv"), streaming_export("farm", "jsonl")]
     list_per_page = 500
 
+    # Facet counts add one scan per filter, for 500-row pages: not worth it
+    show_facets = admin.ShowFacets.NEVER
+
     formfield_overrides = {
         # Allows to update a entry without a known email address
         models.EmailField: {'required': False},
@@ -268,6 +437,26 @@ class FarmAdmin(ImportExportModelAdmin):
 
     inlines = [OtherLinksInLine, MarketGardernerInLine]
 
+    # The changelist columns below are computed in the same query as the farms, instead of one query (municipality)
+    # or one PhoneNumber parsing (phone) per row
+    def get_queryset(self, request):
+        return (super().get_queryset(request)
+                .annotate(municipality_name=F("municipality__name"),
+                          email_prefix=Substr("email", 1, 10),
+                          phone_raw=Cast("phone", output_field=models.CharField())))
+
+    @admin.display(description="Commune", ordering="municipality_name")
+    def municipality_display(self, obj):
+        return obj.municipality_name
+
+    @admin.display(description="E-mail", ordering="email")
+    def email_display(self, obj):
+        return obj.email_prefix + '...' if obj.email_prefix is not None else None
+
+    @admin.display(description="N° de téléphone", ordering="phone")
+    def phone_display(self, obj):
+        return obj.phone_raw or None
+
     # I don't want municipalities to be added, changed or worse - deleted - from here
     def get_form(self, request, obj=None, **kwargs):
         form = super(FarmAdmin, self).get_form(request, obj, **kwargs)
@@ -277,4 +466,172 @@ class FarmAdmin(ImportExportModelAdmin):
         field.widget.can_delete_related = False
         return form
 
+    def save_model(self, request, obj, form, change):
+        with changelog.change_source("admin", request.user.get_username()):
+            super().save_model(request, obj, form, change)
+
+    # Imports of django-import-export (dry run, then confirmation): the farms are saved one by one, the change log only
+    # needs the source
+    def import_action(self, request, **kwargs):
+        with changelog.change_source("import", request.user.get_username()):
+            return super().import_action(request, **kwargs)
+
+    def process_import(self, request, **kwargs):
+        with changelog.change_source("import", request.user.get_username()):
+            return super().process_import(request, **kwargs)
+
+    def get_urls(self):
+        urls = [
+            path("statistics/", self.admin_site.admin_view(self.statistics_view), name="census_farm_statistics"),
+            path("terms/", self.admin_site.admin_view(self.terms_view), name="census_farm_terms"),
+            path("survival/", self.admin_site.admin_view(self.survival_view), name="census_farm_survival"),
+        ]
+        return urls + super().get_urls()
+
+    def statistics_view(self, request):
+        # Cached until the next change of the data (see census.statistics)
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+
+        result = statistics()
+        if request.GET.get("format") == "json":
+            return JsonResponse(result, json_dumps_params={"ensure_ascii": False})
+
+        def table(rows):
+            return [(row, [row[column] for column in COLUMNS]) for row in rows]
+
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.opts,
+            title="Statistiques",
+            computed=parse_datetime(result["computed"]),
+            modes=[mode["mode"] for mode in result["total"]["production"]],
+            tables=[("Ensemble", table([result["total"]])),
+                    ("Par province", table(result["provinces"])),
+                    ("Par commune", table(result["municipalities"]))],
+        )
+
+        return TemplateResponse(request, "admin/census/statistics.html", context)
+
+    def terms_view(self, request):
+        # Free-text answers, from the term index (see census.terms)
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+
+        field = request.GET.get("field")
+        if field not in FarmTerm.FIELDS:
+            field = next(iter(FarmTerm.FIELDS))
+
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.opts,
+            title="Réponses libres : {0}".format(FarmTerm.FIELDS[field]),
+            fields=FarmTerm.FIELDS.items(),
+            field=field,
+            result=analysis(field),
+        )
+
+        return TemplateResponse(request, "admin/census/terms.html", context)
+
+    def survival_view(self, request):
+        # Kaplan-Meier curves drawn as SVG step lines (see census.survival)
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+
+        by = request.GET.get("by")
+        if by not in GROUPS:
+            by = next(iter(GROUPS))
+
+        result = survival()
+        curves = [dict(result["all"], name="Ensemble")] + result[by]
+
+        width, height, margin = 640, 320, 40
+        years = max([len(curve["years"]) for curve in curves] + [1])
+
+        def x(year):
+            return margin + (width - 2 * margin) * year / years
+
+        def y(value):
+            return height - margin - (height - 2 * margin) * value
+
+        def points(curve):
+            # Survival of 100 % until the first year, then a step at each year
+            steps, previous = [(x(0), y(1))], 1
+            for year, value in zip(curve["years"], curve["survival"]):
+                steps += [(x(year), y(previous)), (x(year), y(value))]
+                previous = value
+            steps.append((x(len(curve["years"])), y(previous)))
+            return " ".join("{0:.1f},{1:.1f}".format(*point) for point in steps)
+
+        colors = ["#000000", "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f"]
+
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.opts,
+            title="Survie des fermes",
+            groups=GROUPS.items(),
+            by=by,
+            result=result,
+            milestones=MILESTONES,
+            curves=[(curve, colors[i % len(colors)], points(curve)) for i, curve in enumerate(curves)],
+            chart={"width": width, "height": height, "left": margin, "right": width - margin, "top": margin,
+                   "bottom": height - margin,
+                   "y_ticks": [(y(value), "{0:.0%}".format(value)) for value in (0, 0.25, 0.5, 0.75, 1)],
+                   "x_ticks": [(x(year), year) for year in range(0, years + 1, 5 if years > 10 else 1)]},
+        )
+
+        return TemplateResponse(request, "admin/census/survival.html", context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        # Change log of the farm (see census.changelog) instead of the admin log entries, with its state at a date
+        farm = self.get_object(request, unquote(object_id))
+        if farm is None:
+            return self._get_obj_does_not_exist_redirect(request, self.opts, object_id)
+        if not self.has_view_or_change_permission(request, farm):
+            raise PermissionDenied
+
+        # Indexed by (farm, sequence): one page of the log, whatever its size
+        page = Paginator(FarmChange.objects.filter(farm=farm).order_by("-sequence"), 50).get_page(request.GET.get("p"))
+
+        date = parse_date(request.GET.get("date") or "")
+        state = None
+        if date is not None:
+            # End of the given day
+            end = timezone.make_aware(datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time()))
+            state = changelog.state_at(farm.pk, end)
+
+        # Names of the municipalities in the page
+        municipality_ids = {value for change in page for value in change.diff.get("municipality", []) if value}
+        if state:
+            municipality_ids.add(state.get("municipality"))
+        municipalities = dict(Municipality.objects.filter(pk__in=municipality_ids).values_list("pk", "name"))
+
+        fields = {field.name: field for field in changelog.tracked_fields()}
+
+        def label(name):
+            return strip_tags(fields[name].verbose_name) if name in fields else name
+
+        def display(name, value):
+            if name == "municipality" and value is not None:
+                return municipalities.get(value, value)
+            if isinstance(value, bool):
+                return "Oui" if value else "Non"
+            return "-" if value in (None, "") else value
+
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.opts,
+            object=farm,
+            title="Historique : {0}".format(farm),
+            page=page,
+            changes=[(change, [(label(name), display(name, old), display(name, new))
+                               for name, (old, new) in change.diff.items()])
+                     for change in page],
+            date=date,
+            state=[(label(name), display(name, value)) for name, value in state.items()] if state else None,
+            **(extra_context or {}),
+        )
+
+        return TemplateResponse(request, "admin/census/farm_history.html", context)
+
 admin.site.register(Farm, FarmAdmin)
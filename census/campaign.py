@@ -0,0 +1,239 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+
+from census import changelog
+from census.models import Farm, Municipality, ExpiringUniqueEditLink, CampaignDelivery, MailBucket
+from census.tokens import make_edit_token
+from census.delivery import send_emails, sent_last_day
+
+"""
+    Throttled and resumable sending of the yearly campaigns.
+
+    Every farm (or municipality) handled by a campaign gets a CampaignDelivery row. A row is created with the "pending"
+    status *before* the e-mail is sent and switched to "sent" right after, so that a crash between the two never leads
+    to a second e-mail: pending rows are not retried automatically and have to be checked by hand.
+
+    The quotas are those of the mail account. The rate (CAMPAIGN_RATE_PER_MINUTE, with bursts of CAMPAIGN_BURST) is a
+    token bucket kept in the database, so that it holds across the chunks of a job and the `run_jobs` workers; the
+    daily quota counts every e-mail sent in the last 24 hours (census.delivery.sent_last_day), not only the campaigns.
+    Campaign jobs are also run one at a time (see census.jobs.claim_job).
+"""
+
+class TokenBucket:
+    # Classic token bucket: `rate` tokens are added per second, up to `capacity`. Its state is a MailBucket row, locked
+    # while it is updated, so that every sender (chunks of a job, `run_jobs` workers) draws from the same bucket.
+    def __init__(self, name, rate, capacity, clock=time.time, sleep=time.sleep):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+
+    def take(self, tokens=1):
+        # Takes the tokens if they are available, else returns the number of seconds to wait for them
+        MailBucket.objects.get_or_create(name=self.name, defaults={"tokens": self.capacity, "updated": self.clock()})
+
+        with transaction.atomic():
+            bucket = MailBucket.objects.select_for_update().get(name=self.name)
+            now = self.clock()
+            available = min(self.capacity, bucket.tokens + max(0, now - bucket.updated) * self.rate)
+
+            delay = 0 if available >= tokens else (tokens - available) / self.rate
+            bucket.tokens = available - tokens if delay == 0 else available
+            bucket.updated = now
+            bucket.save(update_fields=["tokens", "updated"])
+
+        return delay
+
+    def consume(self, tokens=1):
+        # Block until enough tokens are available
+        while (delay := self.take(tokens)) > 0:
+            self.sleep(delay)
+
+def absolute_url(base_url, path):
+    return base_url.rstrip("/") + path
+
+def new_edit_url(farm, base_url, days=21):
+    return absolute_url(base_url, reverse("census:update", args=(make_edit_token(farm, days=days),)))
+
+def revoke_edit_links(farm):
+    changelog.update(Farm.objects.filter(pk=farm.pk), edit_token_generation=F("edit_token_generation") + 1)
+    ExpiringUniqueEditLink.objects.filter(farm=farm).delete()
+
+    farm.refresh_from_db(fields=["edit_token_generation"])
+
+"""
+    Messages of each campaign. A builder returns the arguments of send_email(), or None if the target must be skipped.
+"""
+def campaign_message(farm, base_url):
+    # Only send to farm with no known end_year
+    if farm.end_year is not None:
+        return None
+
+    # Revoke the existing links pointing to the same farm (if any)
+    revoke_edit_links(farm)
+
+    context = {
+        'farm': farm,
+        'home_url': absolute_url(base_url, reverse("census:index")),
+        'unique_edit_url': new_edit_url(farm, base_url),
+    }
+
+    return (farm.email_list(),
+            "Le recensement {0} du maraîchage diversifié".format(settings.CENSUS_YEAR),
+            "campaign",
+            context)
+
+def reminder_message(farm, base_url):
+    # Only send to farm with no known end_year and not yet edited by user
+    if farm.end_year is not None or farm.edited_by_user:
+        return None
+
+    # Don't delete the existing links: people might still use the old link and get an error (it happened)
+    farm_count_mun = Farm.objects.filter(public=True, end_year=None, edited_by_user=True,
+                                         municipality_id=farm.municipality_id).count()
+
+    farm_count_province = Farm.objects.filter(public=True, end_year=None, edited_by_user=True,
+                                              municipality__province=farm.municipality.province).count()
+
+    context = {
+        'farm': farm,
+        'home_url': absolute_url(base_url, reverse("census:index")),
+        'unique_edit_url': new_edit_url(farm, base_url),
+        'farm_count_mun': farm_count_mun,
+        'farm_count_province': farm_count_province,
+    }
+
+    return (farm.email_list(),
+            "RAPPEL : recensement {0} du maraîchage diversifié".format(settings.CENSUS_YEAR),
+            "reminder",
+            context)
+
+def campaign_municipality_message(mun, base_url):
+    farm_count = Farm.objects.filter(public=True, end_year=None, municipality_id=mun.id).count()
+
+    context = {
+        'home_url': absolute_url(base_url, reverse("census:index")),
+        'listing_url': absolute_url(base_url, reverse("census:listing")),
+        'map_url': absolute_url(base_url, reverse("census:map")),
+        'farm_count': farm_count,
+    }
+
+    return (mun.email_list(),
+            "Recensement {0} du maraîchage diversifié : appel aux communes".format(settings.CENSUS_YEAR),
+            "campaign_municipality",
+            context)
+
+# kind: (model, message builder, name of the CampaignDelivery foreign key)
+CAMPAIGNS = {
+    "campaign": (Farm, campaign_message, "farm"),
+    "reminder": (Farm, reminder_message, "farm"),
+    "campaign_municipality": (Municipality, campaign_municipality_message, "municipality"),
+}
+
+def default_campaign_name(kind):
+    return "{0}-{1}".format(kind, settings.CENSUS_YEAR)
+
+class CampaignReport:
+    def __init__(self):
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+        self.already_done = 0
+        self.remaining = 0
+        self.quota_reached = False
+
+    def __str__(self):
+        return ("{0} envoyé(s), {1} ignoré(s), {2} échec(s), {3} déjà traité(s), {4} restant(s)"
+                .format(self.sent, self.skipped, self.failed, self.already_done, self.remaining))
+
+class CampaignSender:
+    def __init__(self, kind, base_url, campaign=None, rate_per_minute=None, burst=None, daily_quota=None,
+                 bucket=None, concurrency=None):
+        self.model, self.build_message, self.target_field = CAMPAIGNS[kind]
+        self.kind = kind
+        self.base_url = base_url
+        self.campaign = campaign or default_campaign_name(kind)
+
+        rate_per_minute = rate_per_minute or settings.CAMPAIGN_RATE_PER_MINUTE
+        burst = burst or settings.CAMPAIGN_BURST
+        self.daily_quota = daily_quota or settings.CAMPAIGN_DAILY_QUOTA
+
+        # Shared by all the campaigns, as the quotas are the mail provider's
+        self.bucket = bucket or TokenBucket("campaign", rate_per_minute / 60, burst)
+
+        # Messages are sent by batches of `concurrency` messages, in parallel
+        self.concurrency = concurrency or settings.EMAIL_CONCURRENCY
+
+    def processed_ids(self):
+        # sent, skipped and pending targets are never processed again, failed ones are retried
+        return set(CampaignDelivery.objects
+                   .filter(campaign=self.campaign)
+                   .exclude(status="failed")
+                   .values_list(self.target_field + "_id", flat=True))
+
+    def deliver(self, batch, report, log=None):
+        results = send_emails([message for _, _, message in batch], self.concurrency)
+
+        for (target, delivery, _), result in zip(batch, results):
+            if result.ok:
+                delivery.status = "sent"
+                report.sent += 1
+            else:
+                delivery.status = "failed"
+                delivery.error = (str(type(result.error).__name__) + ": " + str(result.error)
+                                  if result.error is not None else "Message refusé")
+                report.failed += 1
+
+            delivery.save()
+
+            if log is not None:
+                log("{0} : {1}".format(target, delivery.get_status_display()))
+
+    def run(self, queryset, log=None):
+        report = CampaignReport()
+
+        done = self.processed_ids()
+        targets = [target for target in queryset.order_by("pk") if target.pk not in done]
+        report.already_done = queryset.count() - len(targets)
+
+        sent_today = sent_last_day()
+        batch = []
+
+        for i, target in enumerate(targets):
+            if sent_today + len(batch) >= self.daily_quota:
+                report.quota_reached = True
+                report.remaining = len(targets) - i
+                break
+
+            with transaction.atomic():
+                message = self.build_message(target, self.base_url)
+
+            if message is None or len(message[0]) == 0:
+                CampaignDelivery.objects.update_or_create(campaign=self.campaign,
+                                                          **{self.target_field: target},
+                                                          defaults={"status": "skipped", "error": ""})
+                report.skipped += 1
+                continue
+
+            delivery, _ = CampaignDelivery.objects.update_or_create(campaign=self.campaign,
+                                                                    **{self.target_field: target},
+                                                                    defaults={"status": "pending", "error": ""})
+
+            self.bucket.consume()
+            batch.append((target, delivery, message))
+
+            if len(batch) >= self.concurrency:
+                self.deliver(batch, report, log)
+                # Counted again, with the e-mails sent meanwhile by the other workers and the rest of the platform
+                sent_today = sent_last_day()
+                batch = []
+
+        if batch:
+            self.deliver(batch, report, log)
+
+        return report
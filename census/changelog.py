@@ -0,0 +1,156 @@
+import contextlib
+import contextvars
+import decimal
+
+from django.db import models, transaction
+from django.db.models import Max
+from django.dispatch import Signal
+from django.utils import timezone
+
+from census.models import Farm, FarmChange, FarmCheckpoint
+from census.utils import display_value
+
+"""
+    Change log of the farms.
+
+    Every change of a farm is stored as a FarmChange with only the fields that changed ({field: [old, new]}), who made
+    it and from where (edit link, admin, import, bulk action...). The changes of a farm are numbered (sequence), and
+    every CHECKPOINT_EVERY changes the full state of the farm is stored as a FarmCheckpoint. The state of a farm at a
+    given date is then rebuilt from the last checkpoint before that date and at most CHECKPOINT_EVERY - 1 changes.
+
+    Farm.save() is logged by census.signals, with the source set by change_source() around the save. Bulk operations
+    have to log their changes themselves: see update() and record().
+
+    Once logged, the changes are sent with the farms_logged signal (diffs: {farm pk: {field: [old, new]}}), to which
+    the derived data (indicators, statistics, see census.signals) subscribe.
+"""
+
+CHECKPOINT_EVERY = 20
+
+# Not worth logging (edit_token_generation is: its increments are the revocations of the edit links)
+IGNORED_FIELDS = ("last_update",)
+
+farms_logged = Signal()
+
+_source = contextvars.ContextVar("farm_change_source", default=("system", ""))
+
+@contextlib.contextmanager
+def change_source(source, actor=""):
+    # Source and author of the farm changes logged in this block
+    token = _source.set((source, str(actor or "")))
+    try:
+        yield
+    finally:
+        _source.reset(token)
+
+def tracked_fields():
+    return [field for field in Farm._meta.concrete_fields
+            if not field.primary_key and field.name not in IGNORED_FIELDS]
+
+def json_value(field, value):
+    # Same representation for the values read from the database and the values set on an instance
+    if value is not None and isinstance(field, models.DecimalField):
+        value = field.to_python(value)
+        return format(value.quantize(decimal.Decimal(1).scaleb(-field.decimal_places)), "f")
+    return display_value(value)
+
+def instance_state(farm):
+    return {field.name: json_value(field, getattr(farm, field.attname)) for field in tracked_fields()}
+
+def database_states(pks):
+    # {pk: state} of the farms, as stored in the database (one query)
+    fields = tracked_fields()
+    rows = Farm.objects.filter(pk__in=pks).values_list("pk", *[field.attname for field in fields])
+    return {row[0]: {field.name: json_value(field, value) for field, value in zip(fields, row[1:])} for row in rows}
+
+def diff(before, after):
+    return {name: [before.get(name), value] for name, value in after.items() if before.get(name) != value}
+
+def record_created(farms, source=None, actor=None):
+    # Change 0 and first checkpoint of new farms
+    default_source, default_actor = _source.get()
+    source, actor = source or default_source, actor if actor is not None else default_actor
+    now = timezone.now()
+
+    changes, checkpoints = [], []
+    for farm in farms:
+        state = instance_state(farm)
+        changes.append(FarmChange(farm_id=farm.pk, sequence=0, date=now, source=source, actor=actor,
+                                  diff={name: [None, value] for name, value in state.items()
+                                        if value not in (None, "")}))
+        checkpoints.append(FarmCheckpoint(farm_id=farm.pk, sequence=0, date=now, state=state))
+
+    FarmChange.objects.bulk_create(changes)
+    FarmCheckpoint.objects.bulk_create(checkpoints)
+
+    farms_logged.send(sender=Farm, diffs={change.farm_id: change.diff for change in changes})
+
+def record(diffs, source=None, actor=None):
+    # diffs: {farm pk: {field: [old, new]}}, for changes already written to the database
+    diffs = {pk: changes for pk, changes in diffs.items() if changes}
+    if not diffs:
+        return
+
+    default_source, default_actor = _source.get()
+    source, actor = source or default_source, actor if actor is not None else default_actor
+    now = timezone.now()
+
+    with transaction.atomic():
+        # The farm rows are locked until the changes are written, so that concurrent saves of a farm get successive
+        # sequence numbers (in the order of the pks, not to deadlock)
+        list(Farm.objects.select_for_update().filter(pk__in=diffs).order_by("pk").values_list("pk", flat=True))
+
+        last = dict(FarmChange.objects.filter(farm__in=diffs).values("farm").annotate(last=Max("sequence"))
+                    .values_list("farm", "last"))
+
+        changes = [FarmChange(farm_id=pk, sequence=last.get(pk, 0) + 1, date=now, source=source, actor=actor,
+                              diff=changes)
+                   for pk, changes in diffs.items()]
+        FarmChange.objects.bulk_create(changes)
+
+        # The checkpoints are the states after the changes, that is the current states
+        due = [change for change in changes if change.sequence % CHECKPOINT_EVERY == 0]
+        if due:
+            states = database_states([change.farm_id for change in due])
+            FarmCheckpoint.objects.bulk_create([FarmCheckpoint(farm_id=change.farm_id, sequence=change.sequence,
+                                                               date=now, state=states[change.farm_id])
+                                                for change in due if change.farm_id in states])
+
+    farms_logged.send(sender=Farm, diffs=diffs)
+
+def update(queryset, source=None, actor=None, **values):
+    # QuerySet.update() of farms, with the changes logged (a few queries, whatever the number of farms)
+    with transaction.atomic():
+        pks = list(queryset.values_list("pk", flat=True))
+        before = database_states(pks)
+        count = Farm.objects.filter(pk__in=pks).update(**values)
+
+        if any(hasattr(value, "resolve_expression") for value in values.values()):
+            # F() and other expressions: the new values are read back
+            states = database_states(pks)
+            diffs = {pk: diff(state, {name: states[pk][name] for name in values if name in state})
+                     for pk, state in before.items() if pk in states}
+        else:
+            fields = {field.name: field for field in tracked_fields()}
+            after = {name: json_value(fields[name], value) for name, value in values.items() if name in fields}
+            diffs = {pk: diff(state, after) for pk, state in before.items()}
+        record(diffs, source, actor)
+
+    return count
+
+def state_at(farm_id, date):
+    # State of the farm at the given date, None if it didn't exist yet (or wasn't logged yet)
+    checkpoint = (FarmCheckpoint.objects.filter(farm_id=farm_id, date__lte=date)
+                  .order_by("-sequence")
+                  .first())
+    if checkpoint is None:
+        return None
+
+    state = dict(checkpoint.state)
+    for changes in (FarmChange.objects.filter(farm_id=farm_id, sequence__gt=checkpoint.sequence, date__lte=date)
+                    .order_by("sequence")
+                    .values_list("diff", flat=True)):
+        for name, (old, new) in changes.items():
+            state[name] = new
+
+    return state
@@ -0,0 +1,333 @@
+import datetime
+import logging
+import queue
+import random
+import smtplib
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from census.models import MailVolume
+from census.utils import build_email
+
+"""
+    Delivery layer around the SMTP backend.
+
+    - every send is timed and counted per template (see `manage.py mail_stats`),
+    - transient failures (timeouts, disconnections, 4xx answers) are retried a few times with a jittered backoff;
+      during a user request (queue_on_failure), a single short attempt is made and the message queued if it fails,
+    - other failures (refused recipient, authentication...) are neither retried nor queued,
+    - a circuit breaker stops talking to the mail host after EMAIL_BREAKER_THRESHOLD consecutive failures, for
+      EMAIL_BREAKER_COOLDOWN seconds, so that user requests fail fast (or get their e-mail queued) instead of waiting
+      on TCP timeouts.
+
+    Metrics and breaker state live in the cache, shared between the workers if CACHES points to a shared cache. With a
+    cache of a single process (the default LocMemCache), each worker has its own breaker and `manage.py mail_stats`
+    can't see the metrics: it refuses to run.
+
+    The number of e-mails sent, on the other hand, is counted per hour in the database (MailVolume), whatever the
+    cache: campaigns, edit links, digests and queued messages all go through the same account, and the daily quota of
+    the provider (see census.campaign) is on all of them.
+"""
+
+logger = logging.getLogger(__name__)
+
+class MailUnavailable(Exception):
+    # The mail host is considered down (open circuit breaker or all retries failed)
+    pass
+
+class MailRejected(Exception):
+    # The message was refused for good (recipient refused, authentication failed...): trying later won't help
+    pass
+
+"""
+    Metrics
+"""
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+def _incr(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+def record(template, ok, duration):
+    templates = cache.get("mail:templates", set())
+    if template not in templates:
+        cache.set("mail:templates", templates | {template}, timeout=None)
+
+    _incr("mail:{0}:{1}".format(template, "success" if ok else "failure"))
+
+    bucket = next(b for b in LATENCY_BUCKETS if duration <= b)
+    _incr("mail:{0}:latency:{1}".format(template, bucket))
+
+    if ok:
+        count_sent()
+
+def shared_cache():
+    # False for the caches of a single process, where the metrics and breaker of each worker are its own, and other
+    # processes (manage.py mail_stats) can't see them
+    backend = settings.CACHES["default"]["BACKEND"]
+    return not backend.endswith((".LocMemCache", ".DummyCache"))
+
+def mail_metrics():
+    metrics = {}
+
+    for template in sorted(cache.get("mail:templates", set())):
+        metrics[template] = {
+            "success": cache.get("mail:{0}:success".format(template), 0),
+            "failure": cache.get("mail:{0}:failure".format(template), 0),
+            "latency": {b: cache.get("mail:{0}:latency:{1}".format(template, b), 0) for b in LATENCY_BUCKETS},
+        }
+
+    return metrics
+
+"""
+    Volume
+"""
+def count_sent(count=1, now=None):
+    hour = (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+    if MailVolume.objects.filter(hour=hour).update(count=F("count") + count):
+        return
+
+    try:
+        with transaction.atomic():
+            MailVolume.objects.create(hour=hour, count=count)
+    except IntegrityError:
+        # Created by another process in the meantime
+        MailVolume.objects.filter(hour=hour).update(count=F("count") + count)
+        return
+
+    # First e-mail of the hour: forget the old hours
+    MailVolume.objects.filter(hour__lt=hour - datetime.timedelta(days=2)).delete()
+
+def sent_last_day(now=None):
+    # Whole hours: the hour that started 24 hours ago is counted entirely, so that the quota is never exceeded
+    now = now or timezone.now()
+    start = (now - datetime.timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+    return MailVolume.objects.filter(hour__gte=start).aggregate(count=Sum("count"))["count"] or 0
+
+"""
+    Circuit breaker
+"""
+def breaker_open():
+    return cache.get("mail:breaker:open_until", 0) > time.time()
+
+def breaker_success():
+    cache.delete_many(["mail:breaker:failures", "mail:breaker:open_until"])
+
+def breaker_failure():
+    cache.add("mail:breaker:failures", 0, timeout=None)
+    failures = cache.incr("mail:breaker:failures")
+
+    if failures >= settings.EMAIL_BREAKER_THRESHOLD:
+        # After the cooldown, the next message is a trial: one more failure re-opens the breaker
+        cache.set("mail:breaker:open_until", time.time() + settings.EMAIL_BREAKER_COOLDOWN, timeout=None)
+        logger.warning("Mail host unavailable, circuit breaker open for %s s", settings.EMAIL_BREAKER_COOLDOWN)
+
+"""
+    Retries
+"""
+def is_transient(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # Disconnections, connection errors and timeouts
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+def backoff(attempt):
+    # "Full jitter": uniform in [0, base * 2^attempt]
+    return random.uniform(0, settings.EMAIL_RETRY_BASE_DELAY * 2 ** attempt)
+
+def send_with_retries(message, connection=None, attempts=None, timeout=None):
+    # Returns the connection to reuse for the next message (None if it had to be dropped). Non-transient failures are
+    # raised as they are.
+    if breaker_open():
+        raise MailUnavailable("Serveur d'e-mails indisponible")
+
+    # At least one attempt, whatever EMAIL_RETRIES
+    attempts = attempts or max(1, settings.EMAIL_RETRIES)
+    for attempt in range(attempts):
+        try:
+            if connection is None:
+                # timeout=None: EMAIL_TIMEOUT
+                connection = get_connection(fail_silently=False, timeout=timeout)
+                connection.open()
+
+            connection.send_messages([message])
+        except Exception as e:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                connection = None
+
+            if not is_transient(e):
+                raise
+
+            breaker_failure()
+            if attempt + 1 == attempts or breaker_open():
+                raise MailUnavailable(str(type(e).__name__) + ": " + str(e)) from e
+
+            time.sleep(backoff(attempt))
+        else:
+            breaker_success()
+            return connection
+
+"""
+    Messages that could not be sent are queued as a background job (see census.jobs), as rendered messages since
+    their context (model instances) is not serializable.
+"""
+def serialize_message(message):
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": message.to,
+        "bcc": message.bcc,
+        "alternatives": [[content, mimetype] for content, mimetype in getattr(message, "alternatives", [])],
+    }
+
+def deserialize_message(data):
+    message = EmailMultiAlternatives(subject=data["subject"],
+                                     body=data["body"],
+                                     from_email=data["from_email"],
+                                     to=data["to"],
+                                     bcc=data["bcc"])
+
+    for content, mimetype in data["alternatives"]:
+        message.attach_alternative(content, mimetype)
+
+    return message
+
+def queue_message(message, template):
+    # Imported here since census.jobs depends on the campaign sender, which depends on this module
+    from census.jobs import enqueue
+
+    return enqueue("send_email", message=serialize_message(message), template=template)
+
+def send_email(to, subject, template, context, queue_on_failure=False):
+    # Returns "sent", "queued" or None (no recipient). Raises MailUnavailable if the message could not be sent (the
+    # mail host is down), MailRejected if it was refused.
+    email = build_email(to, subject, template, context)
+    if email is None:
+        return None
+
+    started = time.perf_counter()
+
+    try:
+        if queue_on_failure:
+            # During a user request: one short attempt, the workers take care of the retries
+            connection = send_with_retries(email, attempts=1, timeout=settings.EMAIL_SYNC_TIMEOUT)
+        else:
+            connection = send_with_retries(email)
+    except MailUnavailable:
+        record(template, False, time.perf_counter() - started)
+        logger.exception("Could not send %s e-mail to %s", template, to)
+
+        if queue_on_failure:
+            queue_message(email, template)
+            return "queued"
+        raise
+    except Exception as e:
+        # Not transient: neither retried nor queued
+        record(template, False, time.perf_counter() - started)
+        logger.exception("%s e-mail to %s refused", template, to)
+        raise MailRejected(str(type(e).__name__) + ": " + str(e)) from e
+
+    if connection is not None:
+        connection.close()
+
+    record(template, True, time.perf_counter() - started)
+    return "sent"
+
+"""
+    Parallel delivery of a batch of e-mails over a small pool of SMTP connections.
+
+    Each worker thread opens its own connection and reuses it for all the messages it picks from the shared queue,
+    so the time spent waiting on the SMTP server overlaps between messages. The results are returned in the order of
+    the messages, whatever the order in which they were actually sent.
+"""
+
+class DeliveryResult:
+    def __init__(self, index, message):
+        self.index = index
+        self.message = message
+        self.ok = False
+        self.error = None
+        self.duration = None
+
+    def __repr__(self):
+        return "<DeliveryResult {0} {1}>".format(self.index, "ok" if self.ok else repr(self.error))
+
+def _worker(pending, results):
+    connection = None
+
+    try:
+        while True:
+            try:
+                index, message = pending.get_nowait()
+            except queue.Empty:
+                return
+
+            result = results[index]
+            started = time.perf_counter()
+
+            try:
+                connection = send_with_retries(message, connection)
+                result.ok = True
+            except Exception as e:
+                result.error = e
+                connection = None
+
+            result.duration = time.perf_counter() - started
+    finally:
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+def send_messages_parallel(messages, concurrency=None):
+    concurrency = concurrency or settings.EMAIL_CONCURRENCY
+
+    results = [DeliveryResult(i, message) for i, message in enumerate(messages)]
+
+    pending = queue.Queue()
+    for i, message in enumerate(messages):
+        pending.put((i, message))
+
+    workers = min(concurrency, len(messages))
+    if workers > 0:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smtp") as executor:
+            for _ in range(workers):
+                executor.submit(_worker, pending, results)
+
+    return results
+
+def send_emails(batch, concurrency=None):
+    # batch: list of send_email() arguments, i.e. (to, subject, template, context)
+    # Templates are rendered here, in the calling thread: they may hit the database (e.g. farm.municipality.name)
+    messages = [build_email(*args) for args in batch]
+
+    sendable = [(args[2], message) for args, message in zip(batch, messages) if message is not None]
+    results = send_messages_parallel([message for _, message in sendable], concurrency)
+
+    for (template, _), result in zip(sendable, results):
+        record(template, result.ok, result.duration)
+
+    # Keep one result per item of the batch, None for the items without recipient
+    results = iter(results)
+    return [next(results) if message is not None else None for message in messages]
@@ -0,0 +1,264 @@
+import itertools
+import math
+import re
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from census.geo import EARTH_RADIUS
+from census.models import Farm, Municipality
+from census.text import words
+
+"""
+    Batch detection of duplicate farms.
+
+    Comparing every farm with every other one is quadratic, so candidate pairs are generated first, with indexes that
+    only put together farms with something in common:
+    - farms of the same or of a neighbouring municipality (centroids closer than NEIGHBOUR_DISTANCE, or overlapping
+      bounding boxes) with similar names, through an inverted index of the rarest trigrams of the names per
+      municipality (prefix filtering, see candidate_pairs()). Words such as "ferme" or "jardin" are ignored,
+    - farms with the same normalized website or Facebook page, or the same phone number,
+    - farms less than GPS_DISTANCE apart, through a grid of cells of about that size.
+
+    Each candidate pair is then scored on these four signals, and the pairs above a threshold are returned, best first.
+"""
+
+# km
+NEIGHBOUR_DISTANCE = 10
+GPS_DISTANCE = 0.5
+
+
+# Inverted lists (and groups of identical URLs, phones or grid cells) longer than that are ignored
+MAX_POSTING = 200
+
+# Words too common in farm names to tell them apart
+STOP_WORDS = {"a", "au", "aux", "d", "de", "des", "du", "en", "et", "l", "la", "le", "les", "sur",
+              "ferme", "jardin", "jardins", "potager", "potagers", "maraichage", "maraicher", "maraichere", "asbl",
+              "srl", "sprl", "scrl"}
+
+# The same website or phone number is enough for the default threshold (0.5), a name must be very similar
+WEIGHTS = {
+    "name": 0.6,
+    "url": 0.5,
+    "phone": 0.5,
+    "gps": 0.2,
+}
+
+"""
+    Normalization
+"""
+def name_trigrams(name):
+    text = " ".join(word for word in words(name or "") if word not in STOP_WORDS)
+    text = " {0} ".format(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)} if text.strip() else set()
+
+def normalize_url(url):
+    # "https://www.Ferme.be/accueil/?utm=x" -> "ferme.be/accueil"
+    if not url:
+        return None
+    parts = urlsplit(url.strip() if "//" in url else "//" + url.strip())
+    host = parts.netloc.lower().split("@")[-1].split(":")[0]
+    host = re.sub(r"^(www|m|fr-fr|fr-be|web)\.", "", host)
+    path = parts.path.rstrip("/")
+    if "facebook.com" in host:
+        # Only the page name counts: facebook.com/LaFerme/about -> facebook.com/laferme
+        path = "/" + path.strip("/").split("/")[0] if path.strip("/") else ""
+    return (host + path.lower()) or None
+
+def parse_coordinates(text):
+    # "latitude, longitude" -> (latitude, longitude), None if missing or invalid
+    try:
+        latitude, longitude = (float(part) for part in (text or "").replace(";", ",").split(","))
+    except ValueError:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+def distance(a, b):
+    # Haversine distance (km)
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(h))
+
+def jaccard(a, b):
+    common = len(a & b)
+    return common / (len(a) + len(b) - common) if common else 0
+
+"""
+    Blocking
+"""
+def neighbours(municipalities):
+    # {municipality id: set of the ids of itself and its neighbouring municipalities}
+    result = {m.pk: {m.pk} for m in municipalities}
+
+    located = [(m.pk, parse_coordinates(m.GPS_coordinates), m.bbox) for m in municipalities]
+    located = [(pk, coordinates, bbox) for pk, coordinates, bbox in located if coordinates is not None]
+    if not located:
+        return result
+
+    ids = np.array([pk for pk, _, _ in located])
+    points = np.radians(np.array([coordinates for _, coordinates, _ in located]))
+
+    # Pairwise haversine distances between the centroids (a few hundred municipalities)
+    lat, lon = points[:, 0][:, None], points[:, 1][:, None]
+    h = np.sin((lat.T - lat) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lon.T - lon) / 2) ** 2
+    close = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(h, 0, 1))) <= NEIGHBOUR_DISTANCE
+
+    # Overlapping bounding boxes: municipalities that touch each other, whatever their size
+    boxes = np.array([bbox if bbox else [np.nan] * 4 for _, _, bbox in located], dtype=float)
+    overlap = ((boxes[:, 0][:, None] <= boxes[:, 2][None, :]) & (boxes[:, 2][:, None] >= boxes[:, 0][None, :]) &
+               (boxes[:, 1][:, None] <= boxes[:, 3][None, :]) & (boxes[:, 3][:, None] >= boxes[:, 1][None, :]))
+
+    for i, j in zip(*np.nonzero(close | overlap)):
+        result[int(ids[i])].add(int(ids[j]))
+
+    return result
+
+class Candidate:
+    def __init__(self, row):
+        self.pk, self.name, self.municipality_id, website, fb_page, phone, coordinates = row
+        self.trigrams = name_trigrams(self.name)
+        self.urls = {url for url in (normalize_url(website), normalize_url(fb_page)) if url}
+        self.phone = str(phone) if phone else None
+        self.coordinates = parse_coordinates(coordinates)
+
+class DuplicatePair:
+    def __init__(self, first, second, score, reasons):
+        self.first = first
+        self.second = second
+        self.score = score
+        self.reasons = reasons
+
+    def __str__(self):
+        return "{0} (n° {1}) / {2} (n° {3}) : {4:.0%} ({5})".format(
+            self.first.name, self.first.pk, self.second.name, self.second.pk, self.score, ", ".join(self.reasons))
+
+class DuplicateDetector:
+    def __init__(self, threshold=0.5):
+        self.threshold = threshold
+
+    def load(self):
+        farms = Farm.objects.values_list("pk", "name", "municipality_id", "website", "fb_page", "phone",
+                                         "GPS_coordinates").order_by("pk")
+        return [Candidate(row) for row in farms]
+
+    def name_similarity(self):
+        # Any other signal makes a pair a candidate by itself: the names only need to find the pairs whose name
+        # alone reaches the threshold
+        return self.threshold / WEIGHTS["name"]
+
+    def pairs_sharing(self, groups):
+        # Pairs of indexes within each group of farms sharing a key
+        for members in groups.values():
+            if 1 < len(members) <= MAX_POSTING:
+                yield from itertools.combinations(members, 2)
+
+    def candidate_pairs(self, farms, neighbourhood):
+        pairs = set()
+
+        # Names, blocked by municipality, with prefix filtering: two sets with a Jaccard similarity of at least s share
+        # at least one of the first len - ceil(s * len) + 1 trigrams of each set, in any global order. With the rarest
+        # trigrams first, only short inverted lists are built and read, and the common trigrams are never compared.
+        similarity = self.name_similarity()
+        if similarity <= 1:
+            frequency = Counter(trigram for farm in farms for trigram in farm.trigrams)
+
+            prefixes = []
+            for farm in farms:
+                ordered = sorted(farm.trigrams, key=lambda trigram: (frequency[trigram], trigram))
+                prefixes.append(ordered[:len(ordered) - math.ceil(similarity * len(ordered)) + 1])
+
+            # {(municipality, trigram): [indexes]}
+            postings = defaultdict(list)
+            for i, farm in enumerate(farms):
+                for trigram in prefixes[i]:
+                    postings[(farm.municipality_id, trigram)].append(i)
+
+            for i, farm in enumerate(farms):
+                found = set()
+                for municipality in neighbourhood.get(farm.municipality_id, {farm.municipality_id}):
+                    for trigram in prefixes[i]:
+                        posting = postings.get((municipality, trigram), ())
+                        if len(posting) <= MAX_POSTING:
+                            found.update(j for j in posting if j > i)
+
+                pairs.update((i, j) for j in found
+                             if jaccard(farm.trigrams, farms[j].trigrams) >= similarity)
+
+        # Identical URLs and phones, anywhere
+        urls, phones = defaultdict(list), defaultdict(list)
+        for i, farm in enumerate(farms):
+            for url in farm.urls:
+                urls[url].append(i)
+            if farm.phone:
+                phones[farm.phone].append(i)
+
+        pairs.update(self.pairs_sharing(urls))
+        pairs.update(self.pairs_sharing(phones))
+
+        # Close locations: each farm is compared to the farms of its cell and of the 8 cells around it. Cells are at
+        # least GPS_DISTANCE wide everywhere: their width in longitude is the one needed at the highest latitude.
+        located = [(i, farm.coordinates) for i, farm in enumerate(farms) if farm.coordinates]
+        size = GPS_DISTANCE / (math.radians(1) * EARTH_RADIUS)
+        cells = defaultdict(list)
+        if located:
+            highest = max(abs(latitude) for _, (latitude, _) in located)
+            size_longitude = size / max(math.cos(math.radians(highest)), 0.01)
+            for i, (latitude, longitude) in located:
+                cells[(math.floor(latitude / size), math.floor(longitude / size_longitude))].append(i)
+
+        for (x, y), members in cells.items():
+            if len(members) > MAX_POSTING:
+                continue
+            for dx, dy in itertools.product((-1, 0, 1), repeat=2):
+                for i in members:
+                    for j in cells.get((x + dx, y + dy), ()):
+                        if i < j:
+                            pairs.add((i, j))
+
+        return pairs
+
+    def score(self, first, second):
+        score, reasons = 0, []
+
+        similarity = jaccard(first.trigrams, second.trigrams)
+        if similarity > 0:
+            score += WEIGHTS["name"] * similarity
+            reasons.append("nom similaire à {0:.0%}".format(similarity))
+
+        if first.urls & second.urls:
+            score += WEIGHTS["url"]
+            reasons.append("même site web ou page Facebook")
+
+        if first.phone and first.phone == second.phone:
+            score += WEIGHTS["phone"]
+            reasons.append("même téléphone")
+
+        if first.coordinates and second.coordinates:
+            d = distance(first.coordinates, second.coordinates)
+            if d < GPS_DISTANCE:
+                score += WEIGHTS["gps"] * (1 - d / GPS_DISTANCE)
+                reasons.append("à {0:.0f} m".format(d * 1000))
+
+        return min(score, 1), reasons
+
+    def run(self, farm_ids=None):
+        # Ranked pairs; with farm_ids, only the pairs involving at least one of these farms
+        farms = self.load()
+        neighbourhood = neighbours(list(Municipality.objects.only("pk", "GPS_coordinates", "bbox")))
+        farm_ids = set(farm_ids) if farm_ids is not None else None
+
+        results = []
+        for i, j in self.candidate_pairs(farms, neighbourhood):
+            first, second = farms[i], farms[j]
+            if farm_ids is not None and first.pk not in farm_ids and second.pk not in farm_ids:
+                continue
+
+            score, reasons = self.score(first, second)
+            if score >= self.threshold:
+                results.append(DuplicatePair(first, second, score, reasons))
+
+        results.sort(key=lambda pair: (-pair.score, pair.first.pk, pair.second.pk))
+        return results
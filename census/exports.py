@@ -0,0 +1,136 @@
+import csv
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from census.models import Municipality, Farm, MarketGardener
+
+"""
+    Streaming exports (CSV or JSON Lines) of the farms, market gardeners and municipalities.
+
+    Rows are read with iterator(chunk_size=...), so that only one chunk of objects is in memory at a time. The
+    municipality of a farm (or the farm of a market gardener) comes with the same query through select_related(), and
+    the market gardeners of a chunk of farms are fetched with one query per chunk (prefetch_related() is applied to each
+    chunk by iterator()). Rows are written as soon as they are built, either in a StreamingHttpResponse or in a file.
+
+    Columns are named after the fields, as in the exports of django-import-export, so that a CSV export can be imported
+    again (see census.importer).
+"""
+
+class Echo:
+    # File-like object that returns what is written, for csv.writer
+    def write(self, value):
+        return value
+
+def field_columns(model, exclude=()):
+    return [field for field in model._meta.concrete_fields if field.name not in exclude]
+
+def plain(value):
+    # JSON serializable value (phone numbers, decimals, dates...)
+    if value is None or isinstance(value, (bool, int, float, str, list, dict)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+class Export:
+    model = None
+    exclude = ()
+    select_related = ()
+    prefetch_related = ()
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+        self.fields = field_columns(self.model, self.exclude)
+
+    def columns(self):
+        return [field.name for field in self.fields] + [name for name, _ in self.extra_columns()]
+
+    def extra_columns(self):
+        # (column name, function of the object)
+        return []
+
+    def values(self, obj):
+        values = []
+        for field in self.fields:
+            if field.is_relation:
+                # Name of the related object, already fetched by select_related()
+                related = getattr(obj, field.name)
+                values.append(str(related) if related is not None else None)
+            else:
+                values.append(plain(getattr(obj, field.attname)))
+
+        return values + [plain(function(obj)) for _, function in self.extra_columns()]
+
+    def queryset(self, queryset=None):
+        queryset = queryset if queryset is not None else self.model.objects.all()
+        return (queryset.select_related(*self.select_related)
+                .prefetch_related(*self.prefetch_related)
+                .order_by("pk"))
+
+    def rows(self, queryset=None):
+        for obj in self.queryset(queryset).iterator(chunk_size=self.chunk_size):
+            yield self.values(obj)
+
+    def csv_lines(self, queryset=None):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.columns())
+        for row in self.rows(queryset):
+            yield writer.writerow(["" if value is None else
+                                   json.dumps(value) if isinstance(value, (list, dict)) else value for value in row])
+
+    def jsonl_lines(self, queryset=None):
+        columns = self.columns()
+        for row in self.rows(queryset):
+            yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+
+    def lines(self, format, queryset=None):
+        return self.csv_lines(queryset) if format == "csv" else self.jsonl_lines(queryset)
+
+class MunicipalityExport(Export):
+    model = Municipality
+
+class FarmExport(Export):
+    model = Farm
+    # Internal state of the edit links
+    exclude = ("edit_token_generation",)
+    select_related = ("municipality",)
+    prefetch_related = ("marketgardener_set",)
+
+    def extra_columns(self):
+        return [("market_gardeners", self.gardeners)]
+
+    def gardeners(self, farm):
+        # all() to use the market gardeners prefetched for the chunk
+        return "; ".join("{0} {1}{2}".format(g.firstname, g.lastname, " <{0}>".format(g.email) if g.email else "")
+                         for g in farm.marketgardener_set.all())
+
+class MarketGardenerExport(Export):
+    model = MarketGardener
+    select_related = ("farm", "farm__municipality")
+
+    def extra_columns(self):
+        return [("municipality", lambda gardener: gardener.farm.municipality.name)]
+
+EXPORTS = {
+    "farm": (FarmExport, "fermes"),
+    "gardener": (MarketGardenerExport, "maraichers"),
+    "municipality": (MunicipalityExport, "communes"),
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/jsonl; charset=utf-8",
+}
+
+def streaming_response(kind, format, queryset=None):
+    export_class, filename = EXPORTS[kind]
+
+    response = StreamingHttpResponse(export_class().lines(format, queryset), content_type=CONTENT_TYPES[format])
+    response["Content-Disposition"] = 'attachment; filename="{0}.{1}"'.format(filename, format)
+    return response
@@ -16,13 +16,6 @@ class EmailForm(forms.Form):
             visible.field.widget.attrs['class'] = 'form-control'
             visible.field.widget.attrs['placeholder'] = 'Adresse e-mail de la ferme'
 
-    # Check if the given email address matches one in a given list
-    def check_match(self, email_list):
-        if self.cleaned_data['email'] in email_list:
-            return True
-        else:
-            return False
-
 class FarmForm(ModelForm):
     class Meta:
         model = Farm
@@ -0,0 +1,253 @@
+import json
+import math
+
+import numpy as np
+
+from django.db import transaction
+
+from census import indicators, statistics
+from census.models import Municipality
+from census.text import name_key
+
+"""
+    Loading of the municipalities from a GeoJSON file (e.g. the Belgian municipalities from Statbel or OpenDataSoft).
+
+    The file is read incrementally: the features are decoded one by one with JSONDecoder.raw_decode() from a small
+    buffer, so that the whole FeatureCollection (tens of MB with the full resolution geometries) is never in memory.
+
+    For each feature, the centroid, area and bounding box are computed with numpy on the arrays of coordinates (shoelace
+    formula on each ring, holes counting negatively). Features are matched to the municipalities by their name, ignoring
+    case, accents and punctuation (see census.text.name_key), then the matched municipalities are updated with a single
+    bulk_update(), in one transaction.
+"""
+
+# Mean radius of the Earth (km)
+EARTH_RADIUS = 6371.0088
+
+class GeoJSONError(Exception):
+    pass
+
+"""
+    Streaming decoder
+"""
+def iter_features(stream, chunk_size=1 << 16):
+    # Yields the features of a FeatureCollection (or of a top-level array of features)
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    size = chunk_size
+
+    def fill():
+        # Each read is twice as large as the previous one, so that a feature larger than chunk_size is decoded again
+        # O(log n) times, not once per chunk
+        nonlocal buffer, eof, size
+        data = stream.read(size)
+        if not data:
+            eof = True
+        buffer += data
+        size *= 2
+
+    # Find the beginning of the array of features
+    while True:
+        stripped = buffer.lstrip()
+        if stripped.startswith("["):
+            start = len(buffer) - len(stripped) + 1
+            break
+
+        key = buffer.find('"features"')
+        if key != -1:
+            start = buffer.find("[", key)
+            if start != -1:
+                start += 1
+                break
+
+        if eof:
+            raise GeoJSONError("Aucune liste de « features » dans le fichier.")
+        fill()
+
+    buffer = buffer[start:]
+
+    while True:
+        # Skip the separators
+        position = 0
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        buffer = buffer[position:]
+
+        if not buffer:
+            if eof:
+                raise GeoJSONError("Fin de fichier inattendue.")
+            fill()
+            continue
+
+        if buffer[0] == "]":
+            return
+
+        try:
+            feature, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            # Incomplete feature: read more, unless there is nothing left to read
+            if eof:
+                raise GeoJSONError("JSON invalide : {0}".format(e))
+            fill()
+            continue
+
+        buffer = buffer[end:]
+        size = chunk_size
+        yield feature
+
+"""
+    Geometry
+"""
+def polygons(geometry):
+    # List of polygons, each one a list of rings (n x 2 arrays of longitude, latitude), the first one being the exterior
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        return [[np.asarray(ring, dtype=float)[:, :2] for ring in geometry["coordinates"]]]
+    if geometry["type"] == "MultiPolygon":
+        return [[np.asarray(ring, dtype=float)[:, :2] for ring in polygon] for polygon in geometry["coordinates"]]
+    if geometry["type"] == "GeometryCollection":
+        return [polygon for part in geometry["geometries"] for polygon in polygons(part)]
+    return []
+
+def ring_moments(ring):
+    # Signed area and first moments of a ring (shoelace formula), in the units of its coordinates
+    x, y = ring[:, 0], ring[:, 1]
+    x1, y1 = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y1 - x1 * y
+
+    area = cross.sum() / 2
+    return area, ((x + x1) * cross).sum() / 6, ((y + y1) * cross).sum() / 6
+
+class Shape:
+    def __init__(self, geometry):
+        rings = [(i, ring) for polygon in polygons(geometry) for i, ring in enumerate(polygon) if len(ring) >= 3]
+        if not rings:
+            raise GeoJSONError("Géométrie vide ou non surfacique.")
+
+        points = np.concatenate([ring for _, ring in rings])
+        self.bbox = [float(v) for v in (*points.min(axis=0), *points.max(axis=0))]
+
+        # Local equirectangular projection (in km) around the middle of the bounding box: precise enough for a
+        # municipality, and the area is directly in km²
+        lat0 = math.radians((self.bbox[1] + self.bbox[3]) / 2)
+        lon0 = (self.bbox[0] + self.bbox[2]) / 2
+        scale = np.array([math.cos(lat0), 1]) * math.radians(1) * EARTH_RADIUS
+
+        area, mx, my = 0, 0, 0
+        for i, ring in rings:
+            a, x, y = ring_moments((ring - [lon0, 0]) * scale)
+            # Exterior rings count positively, holes negatively, whatever their orientation in the file
+            sign = 1 if i == 0 else -1
+            if a < 0:
+                a, x, y = -a, -x, -y
+            area, mx, my = area + sign * a, mx + sign * x, my + sign * y
+
+        if area <= 0:
+            raise GeoJSONError("Surface nulle.")
+
+        self.area = area
+        self.centroid = (float(my / area / scale[1]), float(mx / area / scale[0] + lon0))
+
+    def coordinates(self):
+        # Format of Municipality.GPS_coordinates: "latitude, longitude"
+        return "{0:.6f}, {1:.6f}".format(*self.centroid)
+
+"""
+    Loader
+"""
+class LoadReport:
+    def __init__(self):
+        self.features = 0
+        self.updated = []
+        self.unmatched = []
+        self.duplicates = []
+        self.errors = []
+        # Municipalities of the database without feature
+        self.missing = []
+
+    def __str__(self):
+        return "{0} feature(s), {1} commune(s) mise(s) à jour, {2} non trouvée(s), {3} erreur(s)".format(
+            self.features, len(self.updated), len(self.unmatched), len(self.errors))
+
+def property_value(properties, name):
+    value = properties.get(name)
+    # Some exports (e.g. OpenDataSoft) give lists of values
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+class MunicipalityLoader:
+    def __init__(self, name_properties, area_property=None, population_property=None, compute_area=True,
+                 dry_run=False):
+        self.name_properties = name_properties
+        self.area_property = area_property
+        self.population_property = population_property
+        self.compute_area = compute_area
+        self.dry_run = dry_run
+
+    def match(self, properties, municipalities):
+        # The first name (in the order of the properties, e.g. French then Dutch) that matches a municipality
+        names = [property_value(properties, name) for name in self.name_properties]
+        names = [str(name) for name in names if name]
+
+        for name in names:
+            municipality = municipalities.get(name_key(name))
+            if municipality is not None:
+                return municipality, names
+        return None, names
+
+    def update(self, municipality, properties, shape):
+        municipality.GPS_coordinates = shape.coordinates()
+        municipality.bbox = shape.bbox
+
+        area = property_value(properties, self.area_property) if self.area_property else None
+        if area is None and self.compute_area:
+            area = shape.area
+        if area is not None:
+            municipality.area = round(float(area), 2)
+
+        population = property_value(properties, self.population_property) if self.population_property else None
+        if population is not None:
+            municipality.population = int(population)
+
+    def run(self, stream):
+        report = LoadReport()
+        municipalities = {name_key(m.name): m for m in Municipality.objects.all()}
+        matched = {}
+
+        for feature in iter_features(stream):
+            report.features += 1
+            properties = feature.get("properties") or {}
+
+            municipality, names = self.match(properties, municipalities)
+            label = " / ".join(names) or "feature n° {0}".format(report.features)
+
+            if municipality is None:
+                report.unmatched.append(label)
+                continue
+
+            if municipality.pk in matched:
+                report.duplicates.append("{0} (déjà trouvée : {1})".format(label, matched[municipality.pk]))
+                continue
+
+            try:
+                self.update(municipality, properties, Shape(feature.get("geometry")))
+            except (GeoJSONError, KeyError, IndexError, TypeError, ValueError) as e:
+                report.errors.append("{0} : {1}".format(label, e))
+                continue
+
+            matched[municipality.pk] = label
+            report.updated.append(municipality)
+
+        report.missing = [m.name for key, m in sorted(municipalities.items()) if m.pk not in matched]
+
+        if not self.dry_run:
+            with transaction.atomic():
+                Municipality.objects.bulk_update(report.updated, ["GPS_coordinates", "bbox", "area", "population"],
+                                                 batch_size=500)
+                indicators.refresh([municipality.pk for municipality in report.updated])
+            statistics.bump_version()
+
+        return report
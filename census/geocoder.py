@@ -0,0 +1,366 @@
+import csv
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Q
+
+from census import changelog
+from census.models import Farm, GeocodeCache
+from census.text import name_key
+
+"""
+    Offline geocoding of the addresses of the farms, against a local gazetteer: a CSV file with one row per address
+    (street, house number, municipality, latitude and longitude), such as the export of the Belgian address register
+    (BeST, https://opendata.bosa.be), whose column names are the defaults.
+
+    Only the farms with an address and without GPS coordinates are geocoded, in one pass:
+    - the address is split into street and house number, and normalized (no case, accents or punctuation, common
+      abbreviations expanded): the result is cached in GeocodeCache under the municipality, street and number, so
+      that an address is only looked up once,
+    - the gazetteer is read once, keeping only the municipalities of the farms to geocode, into an index of the
+      normalized streets of each municipality, with an inverted index of their trigrams,
+    - the street is found exactly, or else among the streets sharing the most trigrams with it (SequenceMatcher
+      similarity above MIN_STREET_SIMILARITY), then the house number: exactly, without its letter (12 for 12A), or the
+      nearest number of the street, or else the middle of the street.
+
+    The confidence of a match is the similarity of the street times a factor for the house number (see NUMBER_SCORES).
+    The coordinates are written to the farms (and logged by census.changelog) above a minimum confidence.
+"""
+
+# Columns of the BeST address export
+STREET_COLUMNS = ["streetname_fr", "streetname_nl", "streetname_de"]
+NUMBER_COLUMN = "house_number"
+MUNICIPALITY_COLUMNS = ["municipality_name_fr", "municipality_name_nl", "municipality_name_de"]
+LATITUDE_COLUMN = "EPSG:4326_lat"
+LONGITUDE_COLUMN = "EPSG:4326_lon"
+
+MIN_STREET_SIMILARITY = 0.8
+
+# Streets compared with SequenceMatcher, among those sharing the most trigrams with the address
+CANDIDATES = 10
+
+NUMBER_SCORES = {
+    "exact": 1.0,
+    # 12A found as 12, or 12 as 12A
+    "base": 0.95,
+    # Nearest number of the street, minus NEAREST_PENALTY per number of difference
+    "nearest": 0.9,
+    # No number in the address, or no number on the street: middle of the street
+    "street": 0.6,
+}
+NEAREST_PENALTY = 0.01
+
+MIN_CONFIDENCE = 0.7
+
+ABBREVIATIONS = {
+    "r": "rue",
+    "av": "avenue",
+    "ave": "avenue",
+    "bd": "boulevard",
+    "bld": "boulevard",
+    "chee": "chaussee",
+    "chauss": "chaussee",
+    "pl": "place",
+    "sq": "square",
+    "rte": "route",
+    "imp": "impasse",
+    "st": "saint",
+    "ste": "sainte",
+    "str": "straat",
+    "stwg": "steenweg",
+}
+
+"""
+    Normalization
+"""
+# Box of an apartment: "12 bte 3", "12/3", "12 bus 4"
+BOX = re.compile(r"(\d[a-z]?)\s*(/|\b(bte|bt|boite|boîte|bus|b)\b\.?)\s*\w+\s*$", re.IGNORECASE)
+NUMBER_END = re.compile(r"^(?P<street>.*?\D)\s*,?\s*(?P<number>\d+)\s*(?P<letter>[a-z])?$", re.IGNORECASE)
+NUMBER_START = re.compile(r"^(?P<number>\d+)\s*(?P<letter>[a-z])?\s*[,\s]\s*(?P<street>\D.*)$", re.IGNORECASE)
+POSTCODE = re.compile(r"\s*,?\s*\b\d{4}\b\D*$")
+
+def street_key(street):
+    # "Av. de l'Église" -> "avenue de l eglise"
+    return " ".join(ABBREVIATIONS.get(word, word) for word in name_key(street or "").split())
+
+def number_key(number):
+    # "12 A" -> "12a"
+    return re.sub(r"\W", "", str(number or "")).lower()
+
+def parse_address(address):
+    # (street, house number) of "Rue de Fer 12A, 5000 Namur", "12 rue de Fer" or "Rue de Fer", number "" if none
+    address = (address or "").strip()
+    parts = [part.strip() for part in address.split(",") if part.strip()]
+    if len(parts) > 1 and parts[0].isdigit():
+        # "12, rue de Fer, 5000 Namur"
+        street = "{0} {1}".format(parts[0], parts[1])
+    elif parts:
+        street = parts[0]
+    else:
+        return "", ""
+
+    street = POSTCODE.sub("", street) or street
+    street = BOX.sub(r"\1", street)
+
+    match = NUMBER_END.match(street) or NUMBER_START.match(street)
+    if match:
+        return match.group("street").strip(" ,"), match.group("number") + (match.group("letter") or "")
+    return street.strip(" ,"), ""
+
+def cache_key(municipality_id, street, number):
+    return "{0}|{1}|{2}".format(municipality_id, street_key(street), number_key(number))
+
+def trigrams(key):
+    text = " {0} ".format(key)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def base_number(number):
+    digits = re.match(r"\d+", number)
+    return int(digits.group()) if digits else None
+
+"""
+    Gazetteer
+"""
+class Street:
+    def __init__(self, name):
+        self.name = name
+        # {number key: (latitude, longitude)}
+        self.numbers = {}
+        self.points = []
+
+    def add(self, number, latitude, longitude):
+        self.numbers.setdefault(number_key(number), (latitude, longitude))
+        self.points.append((latitude, longitude))
+
+    def middle(self):
+        return (sum(lat for lat, _ in self.points) / len(self.points),
+                sum(lon for _, lon in self.points) / len(self.points))
+
+    def locate(self, number):
+        # (latitude, longitude, number factor, number found) of a house number of the street
+        number = number_key(number)
+        if number in self.numbers:
+            return (*self.numbers[number], NUMBER_SCORES["exact"], number)
+
+        base = base_number(number)
+        if base is not None:
+            numbered = [(base_number(key), key) for key in self.numbers if base_number(key) is not None]
+            if numbered:
+                gap, key = min((abs(value - base), key) for value, key in numbered)
+                if gap == 0:
+                    return (*self.numbers[key], NUMBER_SCORES["base"], key)
+                factor = max(NUMBER_SCORES["street"], NUMBER_SCORES["nearest"] - NEAREST_PENALTY * gap)
+                return (*self.numbers[key], factor, key)
+
+        return (*self.middle(), NUMBER_SCORES["street"], "")
+
+class Match:
+    def __init__(self, latitude, longitude, confidence, matched):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.confidence = confidence
+        # Address of the gazetteer that was used
+        self.matched = matched
+
+    def coordinates(self):
+        return "{0:.6f}, {1:.6f}".format(self.latitude, self.longitude)
+
+    def __str__(self):
+        return "{0} ({1}, {2:.0%})".format(self.matched, self.coordinates(), self.confidence)
+
+class Gazetteer:
+    def __init__(self, street_columns=STREET_COLUMNS, number_column=NUMBER_COLUMN,
+                 municipality_columns=MUNICIPALITY_COLUMNS, latitude_column=LATITUDE_COLUMN,
+                 longitude_column=LONGITUDE_COLUMN, delimiter=","):
+        self.street_columns = street_columns
+        self.number_column = number_column
+        self.municipality_columns = municipality_columns
+        self.latitude_column = latitude_column
+        self.longitude_column = longitude_column
+        self.delimiter = delimiter
+
+        # {municipality id: {street key: Street}}, {municipality id: {trigram: street keys}}
+        self.streets = defaultdict(dict)
+        self.trigrams = defaultdict(lambda: defaultdict(set))
+        self.rows = 0
+
+    def load(self, stream, municipalities):
+        # Reads the addresses of the given municipalities ({name key: municipality id}) only
+        reader = csv.DictReader(stream, delimiter=self.delimiter)
+        missing = [column for column in [self.number_column, self.latitude_column, self.longitude_column]
+                   if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError("Colonne(s) absente(s) du répertoire : " + ", ".join(missing))
+
+        names, keys = {}, {}
+        for row in reader:
+            self.rows += 1
+
+            municipality_id = None
+            for column in self.municipality_columns:
+                name = row.get(column)
+                if name:
+                    if name not in names:
+                        names[name] = municipalities.get(name_key(name))
+                    municipality_id = names[name]
+                    if municipality_id is not None:
+                        break
+            if municipality_id is None:
+                continue
+
+            try:
+                latitude, longitude = float(row[self.latitude_column]), float(row[self.longitude_column])
+            except (TypeError, ValueError):
+                continue
+
+            # Every language of the street name leads to the same Street
+            streets = self.streets[municipality_id]
+            found = [row.get(column) for column in self.street_columns if row.get(column)]
+            street = None
+            for name in found:
+                if name not in keys:
+                    keys[name] = street_key(name)
+                street = street or streets.get(keys[name])
+            if not found:
+                continue
+            if street is None:
+                street = Street(found[0])
+            for name in found:
+                if keys[name] and keys[name] not in streets:
+                    streets[keys[name]] = street
+                    for trigram in trigrams(keys[name]):
+                        self.trigrams[municipality_id][trigram].add(keys[name])
+
+            street.add(row.get(self.number_column), latitude, longitude)
+
+        return self
+
+    def find_street(self, municipality_id, street):
+        # (Street, similarity) of the street of an address, None if not found
+        key = street_key(street)
+        streets = self.streets.get(municipality_id, {})
+        if not key or not streets:
+            return None
+        if key in streets:
+            return streets[key], 1.0
+
+        index = self.trigrams[municipality_id]
+        shared = Counter(candidate for trigram in trigrams(key) for candidate in index.get(trigram, ()))
+        best = None
+        for candidate, _ in shared.most_common(CANDIDATES):
+            similarity = SequenceMatcher(None, key, candidate).ratio()
+            if similarity >= MIN_STREET_SIMILARITY and (best is None or similarity > best[1]):
+                best = (streets[candidate], similarity)
+        return best
+
+    def geocode(self, municipality_id, address):
+        street, number = parse_address(address)
+        found = self.find_street(municipality_id, street)
+        if found is None:
+            return None
+
+        street, similarity = found
+        latitude, longitude, factor, number = street.locate(number)
+        return Match(latitude, longitude, round(similarity * factor, 3), "{0} {1}".format(street.name, number).strip())
+
+    def __contains__(self, municipality_id):
+        return municipality_id in self.streets
+
+"""
+    Batch
+"""
+class GeocodeReport:
+    def __init__(self):
+        # [(farm, Match)]
+        self.matches = []
+        # [(farm, reason)]
+        self.unmatched = []
+        self.cached = 0
+        self.updated = 0
+
+    def __str__(self):
+        return "{0} ferme(s) localisée(s) dont {1} depuis le cache, {2} non trouvée(s), {3} mise(s) à jour".format(
+            len(self.matches), self.cached, len(self.unmatched), self.updated)
+
+class BatchGeocoder:
+    def __init__(self, gazetteer=None, min_confidence=MIN_CONFIDENCE, refresh=False, dry_run=False):
+        self.gazetteer = gazetteer or Gazetteer()
+        self.min_confidence = min_confidence
+        # Ignore the cached results
+        self.refresh = refresh
+        self.dry_run = dry_run
+
+    def farms(self):
+        # Farms with an address and without coordinates
+        return list(Farm.objects.exclude(address__isnull=True).exclude(address="")
+                    .filter(Q(GPS_coordinates__isnull=True) | Q(GPS_coordinates="")).select_related("municipality"))
+
+    def run(self, stream, farms=None):
+        # stream: the gazetteer, only read if some addresses aren't in the cache
+        report = GeocodeReport()
+        farms = self.farms() if farms is None else list(farms)
+        keys = {farm.pk: cache_key(farm.municipality_id, *parse_address(farm.address)) for farm in farms}
+
+        cached = {} if self.refresh else {entry.key: entry for entry in GeocodeCache.objects.filter(
+            key__in=set(keys.values()))}
+        results = {}
+        for key, entry in cached.items():
+            results[key] = Match(entry.latitude, entry.longitude, entry.confidence, entry.matched) \
+                if entry.latitude is not None else None
+
+        pending = [farm for farm in farms if keys[farm.pk] not in results]
+        if pending:
+            municipalities = {name_key(farm.municipality.name): farm.municipality_id for farm in pending}
+            self.gazetteer.load(stream, municipalities)
+
+        entries = []
+        for farm in pending:
+            if keys[farm.pk] in results:
+                continue
+            if farm.municipality_id not in self.gazetteer:
+                report.unmatched.append((farm, "commune absente du répertoire"))
+                continue
+            match = self.gazetteer.geocode(farm.municipality_id, farm.address)
+            results[keys[farm.pk]] = match
+            # Addresses not found are cached too (--refresh to look them up again)
+            entries.append(GeocodeCache(key=keys[farm.pk], latitude=match.latitude if match else None,
+                                        longitude=match.longitude if match else None,
+                                        confidence=match.confidence if match else 0,
+                                        matched=match.matched[:300] if match else ""))
+
+        changed = []
+        for farm in farms:
+            if keys[farm.pk] not in results:
+                continue
+            match = results[keys[farm.pk]]
+            if match is None:
+                report.unmatched.append((farm, "rue non trouvée"))
+                continue
+            report.matches.append((farm, match))
+            report.cached += keys[farm.pk] in cached
+            if match.confidence >= self.min_confidence:
+                changed.append((farm, match))
+
+        if not self.dry_run:
+            with transaction.atomic():
+                GeocodeCache.objects.bulk_create(entries, batch_size=500, update_conflicts=True,
+                                                 unique_fields=["key"],
+                                                 update_fields=["latitude", "longitude", "confidence", "matched",
+                                                                "updated"])
+                self.write(changed)
+            report.updated = len(changed)
+
+        return report
+
+    def write(self, changed):
+        field = Farm._meta.get_field("GPS_coordinates")
+        diffs = {}
+        for farm, match in changed:
+            diffs[farm.pk] = {"GPS_coordinates": [changelog.json_value(field, farm.GPS_coordinates),
+                                                  match.coordinates()]}
+            farm.GPS_coordinates = match.coordinates()
+
+        Farm.objects.bulk_update([farm for farm, _ in changed], ["GPS_coordinates"], batch_size=500)
+        changelog.record(diffs, "system", "geocode")
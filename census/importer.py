@@ -0,0 +1,341 @@
+import csv
+import itertools
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from census import changelog, indicators, search, statistics, terms
+from census.models import Municipality, Farm, ContactEmail
+from census.text import fold
+from census.utils import display_value
+
+"""
+    Fast import of large CSV files (same columns as the exports of django-import-export: one column per field, named
+    after the field, the municipality of a farm by its name).
+
+    The file is read chunk by chunk. For each chunk:
+    - the rows are converted and validated in Python, the municipalities being resolved from a map loaded once,
+    - the unique fields are checked with one query per field (and against the previous rows of the file),
+    - the rows to update are loaded with one query and compared with the file, which gives the diff,
+    - unless it is a dry run, the chunk is written with bulk_create()/bulk_update() in its own transaction.
+
+    A dry run is thus the same pass without the writes. Rows with errors are skipped and reported, the others are
+    imported.
+"""
+
+class RowResult:
+    NEW = "new"
+    UPDATE = "update"
+    SKIP = "skip"
+    ERROR = "error"
+
+    def __init__(self, line, action, instance=None, changes=None, errors=None, old=None):
+        self.line = line
+        self.action = action
+        self.instance = instance
+        # Existing instance, for an update
+        self.old = old
+        self.changes = changes or {}
+        self.errors = errors or []
+
+    def __repr__(self):
+        return "<RowResult line {0} {1}>".format(self.line, self.action)
+
+class ImportReport:
+    def __init__(self, keep_rows=500):
+        self.counts = {RowResult.NEW: 0, RowResult.UPDATE: 0, RowResult.SKIP: 0, RowResult.ERROR: 0}
+        self.rows = []
+        self.keep_rows = keep_rows
+        self.unknown_columns = []
+
+    def add(self, result):
+        self.counts[result.action] += 1
+
+        # Keep the diff of the first rows, and every error
+        if result.action == RowResult.ERROR or (result.action != RowResult.SKIP and len(self.rows) < self.keep_rows):
+            self.rows.append(result)
+
+    @property
+    def errors(self):
+        return [row for row in self.rows if row.action == RowResult.ERROR]
+
+    def __str__(self):
+        return "{0} nouveau(x), {1} modifié(s), {2} inchangé(s), {3} erreur(s)".format(
+            self.counts[RowResult.NEW], self.counts[RowResult.UPDATE], self.counts[RowResult.SKIP],
+            self.counts[RowResult.ERROR])
+
+class BulkImporter:
+    model = None
+
+    # Fields checked for uniqueness (empty values are not checked, as in the partial unique constraints of Farm)
+    unique_fields = ()
+
+    # Field used to find the row to update when the file has no "id" column (or an empty one)
+    natural_key = None
+
+    def __init__(self, dry_run=True, batch_size=500, keep_rows=500, actor=""):
+        self.dry_run = dry_run
+        self.actor = actor
+        self.batch_size = batch_size
+        self.keep_rows = keep_rows
+
+        self.fields = {field.name: field for field in self.model._meta.concrete_fields
+                       if field.editable and not field.primary_key}
+        self.seen = {name: {} for name in self.unique_fields}
+
+    def prepare(self):
+        # Maps loaded once for the whole file
+        pass
+
+    def display(self, field, value):
+        # Value shown in the diff, value being the raw attribute (the primary key for a foreign key)
+        return display_value(value)
+
+    def convert(self, field, value):
+        if value == "" or value is None:
+            if field.null:
+                return None
+            if field.has_default():
+                return field.get_default()
+            return ""
+        if isinstance(field, models.JSONField):
+            # Written with json.dumps() by census.exports
+            try:
+                return json.loads(value)
+            except ValueError:
+                raise ValidationError("JSON invalide.")
+        return field.to_python(value)
+
+    def build(self, line, row, columns, existing):
+        # Returns (instance, errors), on a copy of the existing instance for an update
+        errors = []
+
+        if existing is not None:
+            instance = self.model(**{f.attname: getattr(existing, f.attname) for f in self.model._meta.concrete_fields})
+            instance._state.adding = False
+        else:
+            instance = self.model()
+
+        for name in columns:
+            field = self.fields[name]
+            try:
+                value = self.convert(field, row[name])
+            except ValidationError as e:
+                errors += ["{0} : {1}".format(field.verbose_name, message) for message in e.messages]
+                continue
+            setattr(instance, field.attname, value)
+
+        # Only the columns of the file are validated. Foreign keys are checked by the maps of prepare(), not by a
+        # query per row. Empty values are accepted as in the admin (e.g. farms without e-mail address), the database
+        # still refuses them where they are not nullable.
+        exclude = [name for name, field in self.fields.items()
+                   if name not in columns or field.is_relation or getattr(instance, field.attname) in (None, "")]
+
+        try:
+            instance.clean_fields(exclude=exclude)
+        except ValidationError as e:
+            for name, messages in e.message_dict.items():
+                label = self.fields[name].verbose_name if name in self.fields else name
+                errors += ["{0} : {1}".format(label, message) for message in messages]
+
+        return instance, errors
+
+    def check_unique(self, results):
+        # One query per unique field for the whole chunk
+        valid = [result for result in results if result.action != RowResult.ERROR]
+
+        for name in self.unique_fields:
+            attname = self.fields[name].attname
+            values = [(str(getattr(r.instance, attname)), r) for r in valid
+                      if getattr(r.instance, attname) not in (None, "")]
+            if not values:
+                continue
+
+            existing = dict((str(value), pk) for value, pk in
+                            self.model.objects.filter(**{attname + "__in": {value for value, _ in values}})
+                            .values_list(attname, "pk"))
+
+            for value, result in values:
+                if value in existing and existing[value] != result.instance.pk:
+                    result.errors.append("{0} : « {1} » est déjà utilisé par {2} n° {3}.".format(
+                        self.fields[name].verbose_name, value, self.model._meta.verbose_name, existing[value]))
+                elif value in self.seen[name]:
+                    result.errors.append("{0} : « {1} » est déjà utilisé à la ligne {2} du fichier.".format(
+                        self.fields[name].verbose_name, value, self.seen[name][value]))
+                else:
+                    self.seen[name][value] = result.line
+
+        for result in valid:
+            if result.errors:
+                result.action = RowResult.ERROR
+
+    def lookup(self, rows):
+        # {line: existing instance} for the rows of the chunk that update an existing object (one or two queries)
+        by_id = {line: row["id"] for line, row in rows if row.get("id")}
+        by_key = {line: row[self.natural_key] for line, row in rows
+                  if not row.get("id") and self.natural_key and row.get(self.natural_key)}
+
+        found = {}
+
+        ids = self.model.objects.in_bulk([pk for pk in by_id.values() if pk.isdigit()])
+        for line, pk in by_id.items():
+            found[line] = ids.get(int(pk)) if pk.isdigit() else None
+
+        if by_key:
+            keys = self.model.objects.in_bulk(list(by_key.values()), field_name=self.natural_key)
+            for line, key in by_key.items():
+                found[line] = keys.get(key)
+
+        return found
+
+    def process_chunk(self, chunk, columns, report):
+        existing = self.lookup(chunk)
+        results = []
+
+        for line, row in chunk:
+            if row.get("id") and existing.get(line) is None:
+                results.append(RowResult(line, RowResult.ERROR, errors=["Aucun objet avec l'identifiant {0}.".format(row["id"])]))
+                continue
+
+            instance, errors = self.build(line, row, columns, existing.get(line))
+            if errors:
+                results.append(RowResult(line, RowResult.ERROR, instance, errors=errors))
+                continue
+
+            old = existing.get(line)
+            if old is None:
+                results.append(RowResult(line, RowResult.NEW, instance,
+                                         changes={name: (None, self.display(self.fields[name],
+                                                                            getattr(instance, self.fields[name].attname)))
+                                                  for name in columns}))
+                continue
+
+            changes = {}
+            for name in columns:
+                field = self.fields[name]
+                before, after = getattr(old, field.attname), getattr(instance, field.attname)
+                if before != after:
+                    changes[name] = (self.display(field, before), self.display(field, after))
+
+            results.append(RowResult(line, RowResult.UPDATE if changes else RowResult.SKIP, instance, changes=changes,
+                                     old=old))
+
+        self.check_unique(results)
+
+        if not self.dry_run:
+            self.write(results)
+
+        for result in results:
+            report.add(result)
+
+    def write(self, results):
+        created = [r.instance for r in results if r.action == RowResult.NEW]
+        updated = [r for r in results if r.action == RowResult.UPDATE]
+
+        # bulk_update() doesn't handle auto_now fields
+        now = timezone.now()
+        auto_now = [f for f in self.model._meta.concrete_fields if getattr(f, "auto_now", False)]
+        for result in updated:
+            for field in auto_now:
+                setattr(result.instance, field.attname, now)
+
+        fields = sorted({self.fields[name].attname for r in updated for name in r.changes} |
+                        {field.attname for field in auto_now}) if updated else []
+
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(created)
+                if updated:
+                    self.model.objects.bulk_update([r.instance for r in updated], fields)
+                self.after_write([r for r in results if r.action in (RowResult.NEW, RowResult.UPDATE)])
+        except IntegrityError as e:
+            # Something the checks above could not see (e.g. a concurrent change): the whole chunk is rejected
+            for result in results:
+                if result.action in (RowResult.NEW, RowResult.UPDATE):
+                    result.action = RowResult.ERROR
+                    result.errors.append("Erreur d'intégrité, lot annulé : {0}".format(e))
+
+    def after_write(self, results):
+        # The bulk operations don't send the signals that maintain the derived tables
+        pass
+
+    def run(self, stream):
+        report = ImportReport(self.keep_rows)
+        reader = csv.DictReader(stream)
+
+        header = reader.fieldnames or []
+        columns = [name for name in header if name in self.fields]
+        report.unknown_columns = [name for name in header if name not in self.fields and name != "id"]
+
+        self.prepare()
+
+        # Line 1 is the header
+        rows = zip(itertools.count(2), reader)
+        while True:
+            chunk = list(itertools.islice(rows, self.batch_size))
+            if not chunk:
+                break
+            self.process_chunk(chunk, columns, report)
+
+        return report
+
+class MunicipalityImporter(BulkImporter):
+    model = Municipality
+    unique_fields = ("name",)
+    natural_key = "name"
+
+    def after_write(self, results):
+        for result in results:
+            ContactEmail.sync_municipality(result.instance)
+        indicators.refresh([result.instance.pk for result in results])
+        statistics.bump_version()
+
+        # The documents of the farms contain the name of their municipality
+        search.index_farms(Farm.objects.filter(municipality__in=[r.instance.pk for r in results])
+                           .values_list("pk", flat=True))
+
+class FarmImporter(BulkImporter):
+    model = Farm
+    unique_fields = ("email", "phone", "website", "fb_page")
+
+    def prepare(self):
+        names = Municipality.objects.values_list("pk", "name")
+        self.municipalities = {fold(name).strip(): pk for pk, name in names}
+        self.municipality_names = dict(names)
+
+    def display(self, field, value):
+        if field.name == "municipality":
+            return self.municipality_names.get(value)
+        return super().display(field, value)
+
+    def convert(self, field, value):
+        if field.name == "municipality":
+            pk = self.municipalities.get(fold(value or "").strip())
+            if pk is None:
+                raise ValidationError("Commune inconnue : « {0} ».".format(value))
+            return pk
+        return super().convert(field, value)
+
+    def build(self, line, row, columns, existing):
+        instance, errors = super().build(line, row, columns, existing)
+        if existing is None and "municipality" not in columns:
+            errors.append("La colonne « municipality » est obligatoire pour une nouvelle ferme.")
+        return instance, errors
+
+    def after_write(self, results):
+        farms = [result.instance for result in results]
+        ContactEmail.sync_farms(farms)
+        search.index_farms([farm.pk for farm in farms])
+        terms.index_farms([farm.pk for farm in farms])
+
+        changelog.record_created([r.instance for r in results if r.old is None], "import", self.actor)
+        changelog.record({r.instance.pk: changelog.diff(changelog.instance_state(r.old),
+                                                        changelog.instance_state(r.instance))
+                          for r in results if r.old is not None}, "import", self.actor)
+
+IMPORTERS = {
+    "farm": FarmImporter,
+    "municipality": MunicipalityImporter,
+}
@@ -0,0 +1,157 @@
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from census import statistics
+from census.models import Farm, Municipality, MunicipalityIndicator
+
+"""
+    Density indicators of the municipalities, for the map.
+
+    Each municipality has a MunicipalityIndicator with the number and total area of its active public farms (those of
+    the map) and three indicators: farms per km², farms per 10 000 inhabitants and vegetable hectares per inhabitant.
+    The rows are refreshed for the municipalities concerned by each change: the farms_logged signal of census.changelog
+    for the farms (whatever the way they were changed), census.signals for the deleted farms and the municipalities,
+    the importer and the GeoJSON loader. Refreshing a municipality is one aggregate query on its farms and one upsert.
+
+    The map reads them from a compact JSON document (see payload()), with the class breaks of each indicator (quantiles
+    and Jenks natural breaks) computed once and cached until the next change of the data.
+"""
+
+# (field, label, unit shown on the map), SCALE converting the stored values to that unit
+INDICATORS = (
+    ("farms_per_km2", "Fermes par km²", "fermes/km²"),
+    ("farms_per_10000", "Fermes pour 10 000 habitants", "fermes/10 000 hab."),
+    ("hectares_per_capita", "Surface maraîchère par habitant", "m²/hab."),
+)
+
+SCALE = {"hectares_per_capita": 10000}
+
+CLASSES = 5
+
+# Farms on the map
+MAP_FARMS = Q(farm__public=True, farm__end_year=None)
+
+"""
+    Maintenance
+"""
+def refresh(municipality_ids=None):
+    # Recomputes the indicators of the given municipalities (all of them by default)
+    municipalities = Municipality.objects.all()
+    if municipality_ids is not None:
+        municipalities = municipalities.filter(pk__in={pk for pk in municipality_ids if pk is not None})
+
+    rows = municipalities.annotate(farms=Count("farm", filter=MAP_FARMS),
+                                   vegetable_area=Sum("farm__area", filter=MAP_FARMS)).values_list(
+        "pk", "area", "population", "farms", "vegetable_area")
+
+    indicators = []
+    for pk, area, population, farms, vegetable_area in rows:
+        vegetable_area = float(vegetable_area or 0)
+        indicators.append(MunicipalityIndicator(
+            municipality_id=pk,
+            farms=farms,
+            vegetable_area=vegetable_area,
+            farms_per_km2=farms / float(area) if area else None,
+            farms_per_10000=farms * 10000 / population if population else None,
+            hectares_per_capita=vegetable_area / population if population else None,
+        ))
+
+    MunicipalityIndicator.objects.bulk_create(
+        indicators, batch_size=500, update_conflicts=True, unique_fields=["municipality"],
+        update_fields=["farms", "vegetable_area", "farms_per_km2", "farms_per_10000", "hectares_per_capita",
+                       "updated"])
+
+def farms_changed(diffs):
+    # diffs: {farm pk: {field: [old, new]}} of census.changelog, the farms being already saved
+    if not any(name in changes for changes in diffs.values()
+               for name in ("municipality", "public", "end_year", "area")):
+        return
+
+    municipalities = set(Farm.objects.filter(pk__in=diffs).values_list("municipality", flat=True))
+    municipalities.update(changes["municipality"][0] for changes in diffs.values() if "municipality" in changes)
+    refresh(municipalities)
+
+"""
+    Class breaks
+"""
+def quantile_breaks(values, classes=CLASSES):
+    # Upper bounds of the classes, with about as many municipalities in each
+    return sorted(set(np.quantile(values, np.linspace(0, 1, classes + 1)[1:]).tolist()))
+
+def jenks_breaks(values, classes=CLASSES):
+    # Fisher-Jenks natural breaks: the classes minimizing the sum of the squared deviations within each class, by
+    # dynamic programming on the sorted values (each step is vectorized over the possible starts of the last class)
+    values = np.sort(np.asarray(values, dtype=float))
+    n = len(values)
+    classes = min(classes, len(np.unique(values)))
+    if classes <= 1:
+        return [float(values[-1])] if n else []
+
+    sums = np.concatenate(([0], np.cumsum(values)))
+    squares = np.concatenate(([0], np.cumsum(values ** 2)))
+
+    def deviation(starts, end):
+        # Sum of the squared deviations of values[start:end], for each start
+        count = end - starts
+        total = sums[end] - sums[starts]
+        return squares[end] - squares[starts] - total ** 2 / count
+
+    # cost[k, i]: best cost of values[:i] in k + 1 classes, start[k, i]: start of the last of these classes
+    cost = np.full((classes, n + 1), np.inf)
+    start = np.zeros((classes, n + 1), dtype=np.int64)
+    cost[0, 1:] = deviation(np.zeros(n, dtype=np.int64), np.arange(1, n + 1))
+
+    for k in range(1, classes):
+        for i in range(k + 1, n + 1):
+            starts = np.arange(k, i)
+            candidates = cost[k - 1, starts] + deviation(starts, i)
+            best = np.argmin(candidates)
+            cost[k, i], start[k, i] = candidates[best], starts[best]
+
+    breaks, end = [], n
+    for k in range(classes - 1, -1, -1):
+        breaks.append(float(values[end - 1]))
+        end = start[k, end]
+
+    return sorted(breaks)
+
+"""
+    Map
+"""
+def compute_payload():
+    columns = ["id", "name", "province", "coordinates", "farms"] + [field for field, _, _ in INDICATORS]
+    rows = (MunicipalityIndicator.objects.select_related("municipality").order_by("municipality__name")
+            .values_list("municipality_id", "municipality__name", "municipality__province",
+                         "municipality__GPS_coordinates", "farms", *[field for field, _, _ in INDICATORS]))
+
+    municipalities = []
+    for row in rows:
+        values = [None if value is None else float("{0:.4g}".format(value * SCALE.get(field, 1)))
+                  for (field, _, _), value in zip(INDICATORS, row[5:])]
+        municipalities.append(list(row[:5]) + values)
+
+    indicators = {}
+    for i, (field, label, unit) in enumerate(INDICATORS, start=5):
+        # The municipalities without farms are a class of their own on the map
+        values = [row[i] for row in municipalities if row[i] is not None and row[4] > 0]
+        indicators[field] = {
+            "label": label,
+            "unit": unit,
+            "breaks": {
+                "quantiles": [float("{0:.4g}".format(value)) for value in quantile_breaks(values)] if values else [],
+                "jenks": [float("{0:.4g}".format(value)) for value in jenks_breaks(values)] if values else [],
+            },
+        }
+
+    return {"columns": columns, "indicators": indicators, "municipalities": municipalities}
+
+def payload():
+    key = "indicators:{0}".format(statistics.data_version())
+    result = cache.get(key)
+    if result is None:
+        result = compute_payload()
+        cache.set(key, result, timeout=settings.STATISTICS_CACHE_TIMEOUT)
+    return result
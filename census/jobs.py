@@ -0,0 +1,176 @@
+import datetime
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from census.campaign import CampaignSender, new_edit_url
+from census.delivery import MailUnavailable, deserialize_message, record, send_email, send_with_retries
+from census.models import ContactEmail, Farm, Municipality, MarketGardener, Job
+from census.resources import FarmResource, MunicipalityResource, MarketGardenerResource
+
+"""
+    Lightweight background jobs, stored in the database and processed by `manage.py run_jobs`.
+
+    A job holds the primary keys of the objects to process. The worker processes them chunk by chunk and saves the
+    progress after each chunk, so that a job interrupted by a crash (or a deploy) resumes where it stopped.
+"""
+
+class JobDeferred(Exception):
+    # Raised by a handler to put the job back in the queue until a given date
+    def __init__(self, run_after, reason):
+        super().__init__(reason)
+        self.run_after = run_after
+
+def enqueue(kind, pks=None, user=None, **params):
+    # pks=None: a job processing its parameters only (e.g. an e-mail to send), run as a single chunk
+    pks = list(pks) if pks is not None else None
+    return Job.objects.create(kind=kind,
+                              payload=dict(params, pks=pks),
+                              total=len(pks) if pks is not None else 1,
+                              created_by=user)
+
+"""
+    Handlers: handler(job, pks) processes a chunk of primary keys (None for the jobs without) and updates job.result.
+"""
+def add_counts(job, counts):
+    for key, value in counts.items():
+        job.result[key] = job.result.get(key, 0) + value
+
+def campaign_handler(job, pks):
+    sender = CampaignSender(job.kind, base_url=job.payload["base_url"])
+    report = sender.run(sender.model.objects.filter(pk__in=pks))
+
+    add_counts(job, {
+        "sent": report.sent,
+        "skipped": report.skipped,
+        "failed": report.failed,
+    })
+
+    # The deliveries are checkpointed by the sender: the chunk is simply processed again later
+    if report.quota_reached:
+        raise JobDeferred(timezone.now() + datetime.timedelta(hours=1), "Quota journalier d'envoi atteint")
+
+def export_handler(resource_class, model, filename):
+    def handler(job, pks):
+        dataset = resource_class().export(model.objects.filter(pk__in=pks).order_by("pk"))
+        job.result_file = dataset.csv.encode("utf-8")
+        job.result_filename = filename
+        add_counts(job, {"rows": len(dataset)})
+
+    return handler
+
+def send_email_handler(job, pks):
+    # The (rendered) message queued by census.delivery.queue_message()
+    started = timezone.now()
+
+    try:
+        connection = send_with_retries(deserialize_message(job.payload["message"]))
+    except MailUnavailable as e:
+        raise JobDeferred(timezone.now() + datetime.timedelta(seconds=settings.EMAIL_BREAKER_COOLDOWN), str(e))
+
+    if connection is not None:
+        connection.close()
+
+    record(job.payload.get("template", "unknown"), True, (timezone.now() - started).total_seconds())
+    add_counts(job, {"sent": 1})
+
+def edit_links_handler(job, pks):
+    # Edit links of the farms of an address (see EditLinksView), looked up and sent here so that the answer of the form
+    # is the same, and as fast, whether the address is known or not
+    email = job.payload["email"]
+    farms = list(ContactEmail.farms_for(email).select_related("municipality").order_by("name"))
+    if not farms:
+        add_counts(job, {"unknown": 1})
+        return
+
+    context = {
+        "links": [(farm, new_edit_url(farm, job.payload["base_url"], days=1)) for farm in farms],
+    }
+
+    try:
+        send_email([email], "Modifier vos fermes : vos liens uniques", "edit_links", context)
+    except MailUnavailable as e:
+        raise JobDeferred(timezone.now() + datetime.timedelta(seconds=settings.EMAIL_BREAKER_COOLDOWN), str(e))
+
+    add_counts(job, {"sent": 1})
+
+# kind: (handler, chunk size)
+# Exports are written in a single chunk, since the file is built in one go
+HANDLERS = {
+    "campaign": (campaign_handler, 25),
+    "reminder": (campaign_handler, 25),
+    "campaign_municipality": (campaign_handler, 25),
+    "export_farms": (export_handler(FarmResource, Farm, "fermes.csv"), None),
+    "export_municipalities": (export_handler(MunicipalityResource, Municipality, "communes.csv"), None),
+    "export_gardeners": (export_handler(MarketGardenerResource, MarketGardener, "maraichers.csv"), None),
+    "send_email": (send_email_handler, 1),
+    "edit_links": (edit_links_handler, 1),
+}
+
+# Jobs sending through the token bucket and daily quota of the campaigns: one at a time, whatever the number of workers
+SERIAL_KINDS = ("campaign", "reminder", "campaign_municipality")
+
+def claim_job():
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=settings.JOB_STALE_AFTER)
+    claimable = Q(status="queued", run_after__lte=now) | Q(status="running", heartbeat__lt=stale)
+
+    with transaction.atomic():
+        # Waits for the other workers claiming a serial job, then checks that none is already running
+        list(Job.objects.select_for_update().filter(kind__in=SERIAL_KINDS, status__in=["queued", "running"])
+             .values_list("pk", flat=True))
+        serial_running = Job.objects.filter(kind__in=SERIAL_KINDS, status="running", heartbeat__gte=stale).exists()
+
+        # skip_locked lets several workers run side by side (ignored on SQLite)
+        jobs = Job.objects.select_for_update(skip_locked=True).filter(claimable)
+        if serial_running:
+            jobs = jobs.exclude(kind__in=SERIAL_KINDS)
+        job = jobs.order_by("created").first()
+
+        if job is None:
+            return None
+
+        job.status = "running"
+        job.started = job.started or now
+        job.heartbeat = now
+        job.save(update_fields=["status", "started", "heartbeat"])
+
+    return job
+
+def run_job(job):
+    handler, chunk_size = HANDLERS[job.kind]
+    pks = job.payload.get("pks")
+    chunk_size = chunk_size or max(len(pks or []), 1)
+    chunks, failed_chunks = 0, 0
+
+    while job.processed < job.total:
+        chunk = pks[job.processed:job.processed + chunk_size] if pks is not None else None
+
+        try:
+            handler(job, chunk)
+        except JobDeferred as e:
+            job.status = "queued"
+            job.run_after = e.run_after
+            job.errors.append({"pks": chunk, "error": str(e)})
+            job.save()
+            return job
+        except Exception as e:
+            failed_chunks += 1
+            job.errors.append({"pks": chunk,
+                               "error": str(type(e).__name__) + ": " + str(e),
+                               "traceback": traceback.format_exc()})
+
+        chunks += 1
+        job.processed += len(chunk) if chunk is not None else 1
+        job.heartbeat = timezone.now()
+        job.save()
+
+    # Only fail if nothing could be processed at all
+    job.status = "failed" if chunks > 0 and failed_chunks == chunks else "done"
+    job.finished = timezone.now()
+    job.save()
+
+    return job
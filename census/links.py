@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+import ssl
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.encoding import iri_to_uri
+from django.utils import timezone
+
+from census.models import Farm, LinkStatus, OtherLinks
+
+"""
+    Liveness of the links of the farms: websites, Facebook pages and other links (OtherLinks).
+
+    Each distinct URL has a LinkStatus with the result of its last check. `manage.py check_links` checks the links never
+    checked or checked more than LINK_CHECK_INTERVAL_DAYS ago, all at once on an asyncio event loop:
+    - at most LINK_CHECK_CONCURRENCY connections are open at the same time, and LINK_CHECK_PER_HOST per host, so that
+      a site with many links (e.g. facebook.com) isn't hammered,
+    - a link is first requested with HEAD, then with GET if the server refuses HEAD, answers with an error, drops the
+      connection or doesn't answer in time (many servers don't implement HEAD properly); redirections are followed up
+      to MAX_REDIRECTS,
+    - every request is bounded by LINK_CHECK_TIMEOUT seconds.
+
+    The HTTP client is a minimal HTTP/1.1 one on asyncio streams, reading the status line and the headers only: the
+    links are mostly on different hosts, so connections are not kept alive.
+"""
+
+MAX_REDIRECTS = 5
+
+USER_AGENT = "mgcensus-link-checker/1.0"
+
+REDIRECTIONS = (301, 302, 303, 307, 308)
+
+class Result:
+    def __init__(self, url, status=None, error=""):
+        self.url = url
+        self.status = status
+        self.error = error
+
+    @property
+    def alive(self):
+        return self.status is not None and 200 <= self.status < 400
+
+    def __repr__(self):
+        return "<Result {0} {1}>".format(self.url, self.status or self.error)
+
+"""
+    HTTP
+"""
+async def request(method, url, timeout):
+    # (status, Location header) of one request, without following redirections
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("Lien invalide")
+
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    # Non-ASCII characters: percent-encoded in the path ("nos-légumes" -> "nos-l%C3%A9gumes"), IDNA in the host name
+    path = iri_to_uri((parts.path or "/") + ("?" + parts.query if parts.query else ""))
+    hostname = parts.hostname.encode("idna").decode("ascii")
+    host = hostname if parts.port is None else "{0}:{1}".format(hostname, parts.port)
+
+    async with asyncio.timeout(timeout):
+        reader, writer = await asyncio.open_connection(hostname, port,
+                                                       ssl=ssl.create_default_context() if secure else None,
+                                                       server_hostname=hostname if secure else None)
+        try:
+            writer.write("{0} {1} HTTP/1.1\r\nHost: {2}\r\nUser-Agent: {3}\r\nAccept: */*\r\nConnection: close\r\n\r\n"
+                         .format(method, path, host, USER_AGENT).encode("ascii"))
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("Connexion fermée sans réponse")
+            try:
+                status = int(status_line.split()[1])
+            except (IndexError, ValueError):
+                raise ValueError("Réponse HTTP invalide")
+
+            location = None
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "location":
+                    location = value.strip()
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                # Reset by the server, TLS shutdown refused...
+                pass
+
+    return status, location
+
+async def check_url(url, connections, hosts, timeout):
+    # Result of a link, following its redirections; connections bounds the requests in flight, hosts those per host
+    current = url
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            hostname = urlsplit(current).hostname or ""
+            if hostname not in hosts:
+                hosts[hostname] = asyncio.Semaphore(settings.LINK_CHECK_PER_HOST)
+
+            # Waiting for the host first, not to hold a connection slot while waiting
+            async with hosts[hostname], connections:
+                try:
+                    status, location = await request("HEAD", current, timeout)
+                except OSError:
+                    # Including the timeouts: some servers drop or never answer HEAD requests
+                    status, location = None, None
+                if status is None or status >= 400:
+                    status, location = await request("GET", current, timeout)
+
+            if status not in REDIRECTIONS or not location:
+                return Result(url, status)
+            current = urljoin(current, location)
+
+        return Result(url, status, "Trop de redirections")
+    except TimeoutError:
+        return Result(url, error="Délai dépassé")
+    except (OSError, ValueError, UnicodeError) as e:
+        return Result(url, error=(str(e) or e.__class__.__name__)[:255])
+
+async def check_urls(urls, concurrency=None, timeout=None):
+    # Results of the links, in the same order
+    connections = asyncio.Semaphore(concurrency or settings.LINK_CHECK_CONCURRENCY)
+    hosts = {}
+    timeout = timeout or settings.LINK_CHECK_TIMEOUT
+    return await asyncio.gather(*(check_url(url, connections, hosts, timeout) for url in urls))
+
+"""
+    Statuses
+"""
+def farm_links():
+    # Every link of the farms
+    urls = set()
+    for website, fb_page in Farm.objects.values_list("website", "fb_page"):
+        urls.update(url.strip() for url in (website, fb_page) if url and url.strip())
+    urls.update(url.strip() for url in OtherLinks.objects.values_list("link", flat=True) if url.strip())
+    return {url for url in urls if len(url) <= 500}
+
+def sync():
+    # One LinkStatus per link of the farms, those of links no longer used being deleted
+    urls = farm_links()
+    known = set(LinkStatus.objects.values_list("url", flat=True))
+
+    LinkStatus.objects.bulk_create([LinkStatus(url=url) for url in urls - known], batch_size=500,
+                                   ignore_conflicts=True)
+    LinkStatus.objects.filter(url__in=known - urls).delete()
+
+def stale(now=None):
+    limit = (now or timezone.now()) - datetime.timedelta(days=settings.LINK_CHECK_INTERVAL_DAYS)
+    return LinkStatus.objects.filter(Q(checked__isnull=True) | Q(checked__lt=limit))
+
+def check(statuses=None, concurrency=None, timeout=None):
+    # Checks the given LinkStatus (the stale ones by default) and saves the results
+    statuses = list(stale() if statuses is None else statuses)
+    results = asyncio.run(check_urls([status.url for status in statuses], concurrency, timeout))
+
+    now = timezone.now()
+    for status, result in zip(statuses, results):
+        status.status = result.status
+        status.alive = result.alive
+        status.error = result.error
+        status.failures = 0 if result.alive else status.failures + 1
+        status.checked = now
+
+    LinkStatus.objects.bulk_update(statuses, ["status", "alive", "error", "failures", "checked"], batch_size=500)
+    return statuses
+
+def dead_farms(failures=2):
+    # Active farms whose website and Facebook page (those they have) are both dead for that many checks in a row
+    dead = set(LinkStatus.objects.filter(alive=False, failures__gte=failures).values_list("url", flat=True))
+    farms = []
+    for farm in Farm.objects.filter(end_year=None).only("pk", "name", "website", "fb_page"):
+        urls = [url.strip() for url in (farm.website, farm.fb_page) if url and url.strip()]
+        if urls and all(url in dead for url in urls):
+            farms.append(farm)
+    return farms
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from census.importer import IMPORTERS
+
+class Command(BaseCommand):
+    help = "Fast import of a CSV file of farms or municipalities (see census.importer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTERS))
+        parser.add_argument("file")
+        parser.add_argument("--dry-run", action="store_true", help="Only validate the file and show the changes.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--encoding", default="utf-8-sig")
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options["kind"]](dry_run=options["dry_run"], batch_size=options["batch_size"])
+        started = time.monotonic()
+
+        try:
+            with open(options["file"], newline="", encoding=options["encoding"]) as stream:
+                report = importer.run(stream)
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(e)
+
+        if report.unknown_columns:
+            self.stdout.write(self.style.WARNING("Colonnes ignorées : " + ", ".join(report.unknown_columns)))
+
+        for row in report.errors:
+            self.stdout.write(self.style.ERROR("Ligne {0} : {1}".format(row.line, " ; ".join(row.errors))))
+
+        if options["verbosity"] > 1:
+            for row in report.rows:
+                if row.action != "error":
+                    self.stdout.write("Ligne {0} ({1}) : {2}".format(row.line, row.action, row.changes))
+
+        self.stdout.write(self.style.SUCCESS("{0}{1} en {2:.1f} s.".format(
+            "[simulation] " if options["dry_run"] else "", report, time.monotonic() - started)))
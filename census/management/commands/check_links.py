@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from census import links
+from census.models import LinkStatus
+
+class Command(BaseCommand):
+    help = "Check the websites, Facebook pages and other links of the farms not checked recently (see census.links)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Check every link, even those checked recently.")
+        parser.add_argument("--concurrency", type=int, help="Default: LINK_CHECK_CONCURRENCY")
+        parser.add_argument("--timeout", type=float, help="Seconds, default: LINK_CHECK_TIMEOUT")
+        parser.add_argument("--dead", action="store_true",
+                            help="List the active farms whose links are all dead (probably stopped).")
+
+    def handle(self, *args, **options):
+        links.sync()
+
+        started = time.monotonic()
+        statuses = links.check(LinkStatus.objects.all() if options["all"] else None, options["concurrency"],
+                               options["timeout"])
+        elapsed = time.monotonic() - started
+
+        for status in statuses:
+            if not status.alive:
+                self.stdout.write("{0} : {1}".format(status.url, status.status or status.error))
+
+        if options["dead"]:
+            for farm in links.dead_farms():
+                self.stdout.write("Liens morts : {0} (#{1})".format(farm.name, farm.pk))
+
+        self.stdout.write(self.style.SUCCESS("{0} lien(s) vérifié(s) en {1:.1f} s, {2} mort(s).".format(
+            len(statuses), elapsed, sum(not status.alive for status in statuses))))
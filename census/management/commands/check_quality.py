@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from census import changelog, quality
+from census.models import Farm
+
+class Command(BaseCommand):
+    help = "List the farms with implausible values, with the reasons (see census.quality)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rule", action="append", choices=[rule.code for rule in quality.RULES],
+                            help="Only this rule (can be repeated).")
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument("--flag", action="store_true", help="Flag the farms found.")
+
+    def handle(self, *args, **options):
+        rules = [rule for rule in quality.RULES if not options["rule"] or rule.code in options["rule"]]
+        started = time.monotonic()
+        suggestions = quality.run(rules=rules)
+        elapsed = time.monotonic() - started
+
+        for suggestion in suggestions[:options["limit"]]:
+            self.stdout.write(str(suggestion))
+
+        for rule in rules:
+            count = sum(rule.code in suggestion.codes for suggestion in suggestions)
+            if count:
+                self.stdout.write("{0} : {1} ferme(s)".format(rule.label, count))
+
+        if options["flag"]:
+            flagged = changelog.update(Farm.objects.filter(pk__in=[s.pk for s in suggestions], flagged=False),
+                                       "system", "check_quality", flagged=True)
+            self.stdout.write("{0} ferme(s) signalée(s).".format(flagged))
+
+        self.stdout.write(self.style.SUCCESS("{0} ferme(s) aux données suspectes trouvée(s) en {1:.2f} s.".format(
+            len(suggestions), elapsed)))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from census.snapshots import available_years, compare
+
+class Command(BaseCommand):
+    help = "Compare the census of two years, from their snapshots (see manage.py snapshot)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("before", type=int)
+        parser.add_argument("after", type=int)
+        parser.add_argument("--limit", type=int, default=20, help="Number of farms listed per change.")
+
+    def handle(self, *args, **options):
+        try:
+            diff = compare(options["before"], options["after"])
+        except FileNotFoundError:
+            raise CommandError("Recensements disponibles : {0}".format(
+                ", ".join(str(year) for year in available_years()) or "aucun"))
+
+        names = dict(zip(diff.after["farm_id"].tolist(), diff.after["farm_name"].tolist()))
+        names.update(zip(diff.before["farm_id"].tolist(), diff.before["farm_name"].tolist()))
+        limit = options["limit"]
+
+        def farms(ids):
+            listed = ", ".join(names[pk] for pk in ids[:limit].tolist())
+            return listed + (" ..." if len(ids) > limit else "")
+
+        self.stdout.write("{0} -> {1} : {2} -> {3} ferme(s)".format(diff.before.year, diff.after.year,
+                                                                    len(diff.before), len(diff.after)))
+        self.stdout.write("Nouvelles : {0}. {1}".format(len(diff.new), farms(diff.new)))
+        self.stdout.write("Arrêtées : {0}. {1}".format(len(diff.stopped), farms(diff.stopped)))
+        self.stdout.write("Supprimées : {0}. {1}".format(len(diff.removed), farms(diff.removed)))
+
+        for column, label in (("farm_area", "Surface (ha)"), ("farm_fte", "ETP"), ("farm_ftev", "ETP bénévoles")):
+            ids, old, new = diff.changes(column)
+            before, after = diff.totals(column)
+            self.stdout.write("{0} : total des fermes actives {1:.1f} -> {2:.1f}, {3} ferme(s) modifiée(s)".format(
+                label, before, after, len(ids)))
+            for pk, a, b in list(zip(ids.tolist(), old.tolist(), new.tolist()))[:limit]:
+                self.stdout.write("    {0} : {1} -> {2}".format(names[pk], a, b))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from census import changelog
+from census.duplicates import DuplicateDetector
+from census.models import Farm
+
+class Command(BaseCommand):
+    help = "List the pairs of farms that are probably duplicates, best first (see census.duplicates)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threshold", type=float, default=0.5, help="Minimum score, between 0 and 1.")
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument("--flag", action="store_true", help="Flag the farms of the pairs found.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        pairs = DuplicateDetector(threshold=options["threshold"]).run()
+        elapsed = time.monotonic() - started
+
+        for pair in pairs[:options["limit"]]:
+            self.stdout.write(str(pair))
+
+        if options["flag"]:
+            ids = {farm.pk for pair in pairs for farm in (pair.first, pair.second)}
+            flagged = changelog.update(Farm.objects.filter(pk__in=ids, flagged=False), "system", "find_duplicates",
+                                       flagged=True)
+            self.stdout.write("{0} ferme(s) signalée(s).".format(flagged))
+
+        self.stdout.write(self.style.SUCCESS("{0} doublon(s) potentiel(s) trouvé(s) en {1:.1f} s.".format(
+            len(pairs), elapsed)))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from census import geocoder
+
+class Command(BaseCommand):
+    help = ("Fill in the GPS coordinates of the farms with an address and without coordinates, from a local CSV "
+            "gazetteer of the addresses such as the BeST export (see census.geocoder).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("file")
+        parser.add_argument("--street-column", action="append", dest="street_columns",
+                            help="Column holding the street name, can be repeated (one per language). Default: "
+                                 + ", ".join(geocoder.STREET_COLUMNS) + ".")
+        parser.add_argument("--number-column", default=geocoder.NUMBER_COLUMN)
+        parser.add_argument("--municipality-column", action="append", dest="municipality_columns",
+                            help="Column holding the name of the municipality, can be repeated. Default: "
+                                 + ", ".join(geocoder.MUNICIPALITY_COLUMNS) + ".")
+        parser.add_argument("--latitude-column", default=geocoder.LATITUDE_COLUMN)
+        parser.add_argument("--longitude-column", default=geocoder.LONGITUDE_COLUMN)
+        parser.add_argument("--delimiter", default=",")
+        parser.add_argument("--min-confidence", type=float, default=geocoder.MIN_CONFIDENCE,
+                            help="Below that confidence (between 0 and 1), the coordinates are only reported.")
+        parser.add_argument("--refresh", action="store_true", help="Ignore the addresses already geocoded.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        gazetteer = geocoder.Gazetteer(street_columns=options["street_columns"] or geocoder.STREET_COLUMNS,
+                                       number_column=options["number_column"],
+                                       municipality_columns=options["municipality_columns"]
+                                       or geocoder.MUNICIPALITY_COLUMNS,
+                                       latitude_column=options["latitude_column"],
+                                       longitude_column=options["longitude_column"],
+                                       delimiter=options["delimiter"])
+        batch = geocoder.BatchGeocoder(gazetteer, min_confidence=options["min_confidence"],
+                                       refresh=options["refresh"], dry_run=options["dry_run"])
+        started = time.monotonic()
+
+        try:
+            with open(options["file"], encoding="utf-8-sig", newline="") as stream:
+                report = batch.run(stream)
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            raise CommandError(e)
+
+        for farm, match in report.matches:
+            if match.confidence < options["min_confidence"]:
+                self.stdout.write(self.style.WARNING("À vérifier : {0} (#{1}), « {2} » -> {3}".format(
+                    farm.name, farm.pk, farm.address, match)))
+            elif options["verbosity"] > 1:
+                self.stdout.write("{0} (#{1}), « {2} » -> {3}".format(farm.name, farm.pk, farm.address, match))
+        for farm, reason in report.unmatched:
+            self.stdout.write("Non trouvée : {0} (#{1}), « {2} » : {3}".format(farm.name, farm.pk, farm.address,
+                                                                             reason))
+
+        self.stdout.write(self.style.SUCCESS("{0}{1}, {2} adresse(s) lue(s) en {3:.1f} s.".format(
+            "[simulation] " if options["dry_run"] else "", report, gazetteer.rows, time.monotonic() - started)))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from census.geo import GeoJSONError, MunicipalityLoader
+
+class Command(BaseCommand):
+    help = ("Update the coordinates (centroid), bounding box, area and population of the municipalities from a GeoJSON "
+            "file of the Belgian municipalities (see census.geo).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("file")
+        parser.add_argument("--name-property", action="append", dest="name_properties",
+                            help="Property holding the name of the municipality, can be repeated (e.g. French then "
+                                 "Dutch name). Default: mun_name_fr, mun_name_nl, mun_name_de, name.")
+        parser.add_argument("--area-property", help="Property holding the area in km² (default: computed from the "
+                                                    "geometry).")
+        parser.add_argument("--keep-area", action="store_true", help="Don't compute the area from the geometry.")
+        parser.add_argument("--population-property", help="Property holding the population (default: unchanged).")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        loader = MunicipalityLoader(options["name_properties"] or ["mun_name_fr", "mun_name_nl", "mun_name_de", "name"],
+                                    area_property=options["area_property"],
+                                    population_property=options["population_property"],
+                                    compute_area=not options["keep_area"],
+                                    dry_run=options["dry_run"])
+        started = time.monotonic()
+
+        try:
+            with open(options["file"], encoding="utf-8") as stream:
+                report = loader.run(stream)
+        except (OSError, UnicodeDecodeError, GeoJSONError) as e:
+            raise CommandError(e)
+
+        for label in report.unmatched:
+            self.stdout.write(self.style.WARNING("Aucune commune pour : " + label))
+        for label in report.duplicates:
+            self.stdout.write(self.style.WARNING("Doublon ignoré : " + label))
+        for error in report.errors:
+            self.stdout.write(self.style.ERROR(error))
+        if report.missing:
+            self.stdout.write(self.style.WARNING("Communes sans feature : " + ", ".join(report.missing)))
+
+        if options["verbosity"] > 1:
+            for municipality in report.updated:
+                self.stdout.write("{0} : {1} ({2} km²)".format(municipality.name, municipality.GPS_coordinates,
+                                                                 municipality.area))
+
+        self.stdout.write(self.style.SUCCESS("{0}{1} en {2:.1f} s.".format(
+            "[simulation] " if options["dry_run"] else "", report, time.monotonic() - started)))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from census.delivery import LATENCY_BUCKETS, breaker_open, mail_metrics, shared_cache
+
+class Command(BaseCommand):
+    help = "Show the e-mail delivery counters and latency histograms, per template."
+
+    def handle(self, *args, **options):
+        if not shared_cache():
+            raise CommandError("Les compteurs sont dans le cache de chaque processus ({0}) : ils ne sont pas visibles "
+                               "d'ici. Configurez un cache partagé (CACHE_BACKEND, CACHE_LOCATION).".format(
+                                   settings.CACHES["default"]["BACKEND"]))
+
+        if breaker_open():
+            self.stdout.write(self.style.WARNING("Circuit breaker ouvert : serveur d'e-mails considéré indisponible."))
+
+        for template, metrics in mail_metrics().items():
+            self.stdout.write("{0} : {1} succès, {2} échec(s)".format(template, metrics["success"], metrics["failure"]))
+
+            for bucket in LATENCY_BUCKETS:
+                count = metrics["latency"][bucket]
+                self.stdout.write("    <= {0:>4} s : {1:6d} {2}".format(bucket, count, "#" * min(count, 60)))
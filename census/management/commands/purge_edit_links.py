@@ -0,0 +1,42 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from census.models import ExpiringUniqueEditLink
+
+class Command(BaseCommand):
+    help = "Delete the edit links expired for more than the grace window, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-days", type=int, default=settings.EDIT_LINK_GRACE_DAYS,
+                            help="Keep the links expired for less than that many days.")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Rows deleted per statement, to keep each lock short.")
+        parser.add_argument("--pause", type=float, default=0,
+                            help="Seconds to wait between two batches.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options["grace_days"])
+        started = time.perf_counter()
+        deleted = 0
+
+        while True:
+            # Served by the index on expiration_date
+            pks = list(ExpiringUniqueEditLink.objects
+                       .filter(expiration_date__lt=cutoff)
+                       .values_list("pk", flat=True)[:options["batch_size"]])
+
+            if not pks:
+                break
+
+            count, _ = ExpiringUniqueEditLink.objects.filter(pk__in=pks).delete()
+            deleted += count
+
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS("{0} lien(s) supprimé(s) en {1:.2f} s (expirés avant le {2:%d/%m/%Y %H:%M})."
+                                             .format(deleted, time.perf_counter() - started, cutoff)))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from census.models import Farm, MarketGardener, Municipality, ContactEmail, normalize_email
+
+class Command(BaseCommand):
+    help = "Rebuild the normalized contact table from the farms, market gardeners and municipalities."
+
+    def handle(self, *args, **options):
+        contacts = []
+
+        for pk, email in Farm.objects.exclude(email=None).exclude(email="").values_list("pk", "email"):
+            contacts.append(ContactEmail(source="farm", farm_id=pk, email=normalize_email(email)))
+
+        for pk, farm_id, email in (MarketGardener.objects.exclude(email=None).exclude(email="")
+                                   .values_list("pk", "farm_id", "email")):
+            contacts.append(ContactEmail(source="gardener", gardener_id=pk, farm_id=farm_id,
+                                         email=normalize_email(email)))
+
+        for municipality in Municipality.objects.all():
+            contacts += [ContactEmail(source="municipality", municipality=municipality, email=normalize_email(email))
+                         for email in municipality.email_list() if email]
+
+        with transaction.atomic():
+            ContactEmail.objects.all().delete()
+            ContactEmail.objects.bulk_create(contacts, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS("{0} adresse(s) indexée(s).".format(len(contacts))))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from census import statistics
+from census.indicators import refresh
+from census.models import MunicipalityIndicator
+
+class Command(BaseCommand):
+    help = "Recompute the density indicators of all the municipalities."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            refresh()
+        statistics.bump_version()
+
+        self.stdout.write(self.style.SUCCESS("{0} commune(s) mise(s) à jour.".format(
+            MunicipalityIndicator.objects.count())))
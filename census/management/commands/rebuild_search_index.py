@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from census.models import SearchDocument
+from census.search import rebuild
+
+class Command(BaseCommand):
+    help = "Rebuild the documents of the admin full-text search from the farms and market gardeners."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild()
+
+        self.stdout.write(self.style.SUCCESS("{0} document(s) indexé(s).".format(SearchDocument.objects.count())))
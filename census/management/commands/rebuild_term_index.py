@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from census.models import FarmTerm
+from census.terms import rebuild
+
+class Command(BaseCommand):
+    help = "Rebuild the index of the terms of the free-text answers of the farms."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild()
+
+        self.stdout.write(self.style.SUCCESS("{0} terme(s) indexé(s).".format(FarmTerm.objects.count())))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from census.jobs import claim_job, run_job
+
+class Command(BaseCommand):
+    help = "Process the background jobs (admin actions, campaigns, e-mails of the public forms)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Process the queued jobs and exit instead of waiting for new ones (e.g. from cron).")
+        parser.add_argument("--poll", type=float, default=5,
+                            help="Seconds to wait between two checks of the queue.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_job()
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+                continue
+
+            self.stdout.write("{0} : démarrage ({1}/{2})".format(job, job.processed, job.total))
+            job = run_job(job)
+            self.stdout.write("{0} : {1} ({2}/{3}, {4} erreur(s))".format(job, job.get_status_display(),
+                                                                         job.processed, job.total, len(job.errors)))
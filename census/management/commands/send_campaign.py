@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from census.campaign import CAMPAIGNS, CampaignSender
+
+class Command(BaseCommand):
+    help = "Send (or resume) a campaign, throttled to the quotas of the mail provider."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=CAMPAIGNS.keys())
+        parser.add_argument("--campaign",
+                            help="Name of the campaign used to checkpoint the deliveries (default: <kind>-<year>).")
+        parser.add_argument("--base-url", default=settings.CENSUS_BASE_URL,
+                            help="Base URL of the platform, used in the links of the e-mails.")
+        parser.add_argument("--ids", type=int, nargs="+",
+                            help="Only send to these farms (or municipalities).")
+        parser.add_argument("--rate-per-minute", type=int)
+        parser.add_argument("--burst", type=int)
+        parser.add_argument("--daily-quota", type=int)
+
+    def handle(self, *args, **options):
+        sender = CampaignSender(options["kind"],
+                                base_url=options["base_url"],
+                                campaign=options["campaign"],
+                                rate_per_minute=options["rate_per_minute"],
+                                burst=options["burst"],
+                                daily_quota=options["daily_quota"])
+
+        queryset = sender.model.objects.all()
+        if options["ids"]:
+            queryset = queryset.filter(pk__in=options["ids"])
+
+        self.stdout.write("Campagne " + sender.campaign)
+        report = sender.run(queryset, log=self.stdout.write)
+
+        if report.quota_reached:
+            self.stdout.write(self.style.WARNING("Quota journalier atteint, relancez la commande plus tard."))
+
+        self.stdout.write(self.style.SUCCESS(str(report)))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from census.notifications import send_digest
+
+class Command(BaseCommand):
+    help = "Send the digest of the farm creations and edits since the last digest (to be run periodically, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default=settings.CENSUS_BASE_URL,
+                            help="Base URL of the platform, used in the links to the admin.")
+
+    def handle(self, *args, **options):
+        count = send_digest(options["base_url"])
+
+        if count == 0:
+            self.stdout.write("Rien à envoyer.")
+        else:
+            self.stdout.write(self.style.SUCCESS("Digest envoyé ({0} ferme(s)).".format(count)))
@@ -0,0 +1,27 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from census.snapshots import snapshot_path, write_snapshot
+
+class Command(BaseCommand):
+    help = "Freeze the census of a year (farms, municipalities, market gardener counts) in a compressed file " \
+           "(see census.snapshots). To run at the end of the campaign."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, default=settings.CENSUS_YEAR)
+        parser.add_argument("--output", help="Default: SNAPSHOT_DIR/census-<year>.npz")
+        parser.add_argument("--force", action="store_true", help="Replace the existing snapshot of that year.")
+
+    def handle(self, *args, **options):
+        path = options["output"] or snapshot_path(options["year"])
+
+        if os.path.exists(path) and not options["force"]:
+            raise CommandError("Le recensement {0} est déjà figé dans {1} (--force pour le remplacer).".format(
+                options["year"], path))
+
+        path, count = write_snapshot(options["year"], path)
+
+        self.stdout.write(self.style.SUCCESS("{0} ferme(s) figée(s) dans {1} ({2} ko).".format(
+            count, path, os.path.getsize(path) // 1024)))
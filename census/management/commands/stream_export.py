@@ -0,0 +1,46 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from census.exports import EXPORTS
+
+class Command(BaseCommand):
+    help = "Streaming export of the farms, market gardeners or municipalities to a gzip-compressed CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--output", help="Output file (default: <kind>.<format>.gz). Not compressed unless it ends "
+                                             "with .gz.")
+        parser.add_argument("--public", action="store_true", help="Only the public farms.")
+        parser.add_argument("--consent", action="store_true", help="Only the farms that gave their consent.")
+        parser.add_argument("--chunk-size", type=int)
+
+    def handle(self, *args, **options):
+        export_class, filename = EXPORTS[options["kind"]]
+        export = export_class(chunk_size=options["chunk_size"])
+        output = options["output"] or "{0}.{1}.gz".format(filename, options["format"])
+
+        filters = {name: True for name in ("public", "consent") if options[name]}
+        if filters and options["kind"] == "municipality":
+            raise CommandError("--public et --consent ne s'appliquent qu'aux fermes et aux maraîcher·ères.")
+        if options["kind"] == "gardener":
+            filters = {"farm__" + name: value for name, value in filters.items()}
+
+        queryset = export.model.objects.filter(**filters)
+        opener = gzip.open if output.endswith(".gz") else open
+        started = time.monotonic()
+        count = 0
+
+        with opener(output, "wt", encoding="utf-8", newline="") as stream:
+            for line in export.lines(options["format"], queryset):
+                stream.write(line)
+                count += 1
+
+        # The CSV header is not a row
+        if options["format"] == "csv":
+            count -= 1
+
+        self.stdout.write(self.style.SUCCESS("{0} ligne(s) exportée(s) dans {1} en {2:.1f} s.".format(
+            count, output, time.monotonic() - started)))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from census.survival import GROUPS, MILESTONES, analyze
+
+class Command(BaseCommand):
+    help = "Survival of the farms (Kaplan-Meier) and yearly cohorts of installations and cessations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Year of observation (CENSUS_YEAR by default).")
+        parser.add_argument("--by", choices=list(GROUPS), help="Survival per province or production mode.")
+        parser.add_argument("--curve", action="store_true", help="Full survival curve of all the farms.")
+        parser.add_argument("--cohorts", action="store_true", help="Installations and cessations per year.")
+
+    def percent(self, value):
+        return "-" if value is None else "{0:.0%}".format(value)
+
+    def handle(self, *args, **options):
+        result = analyze(options["year"])
+
+        self.stdout.write("Observation en {0}, {1} ferme(s) sans années d'installation et de fin cohérentes "
+                          "ignorée(s).".format(result["year"], result["excluded"]))
+
+        header = "{0:<20} {1:>7} {2:>7} ".format("", "Fermes", "Arrêts")
+        header += " ".join("{0:>7}".format("{0} an{1}".format(years, "s" if years > 1 else "")) for years in MILESTONES)
+        self.stdout.write(header + " {0:>8}".format("Médiane"))
+
+        curves = [dict(result["all"], name="Ensemble")]
+        if options["by"]:
+            curves += result[options["by"]]
+
+        for curve in curves:
+            line = "{0:<20} {1:>7} {2:>7} ".format((curve["name"] or "Inconnu")[:20], curve["farms"], curve["stopped"])
+            line += " ".join("{0:>7}".format(self.percent(value)) for value in curve["milestones"])
+            median = "{0} ans".format(curve["median"]) if curve["median"] is not None else "-"
+            self.stdout.write(line + " {0:>8}".format(median))
+
+        if options["curve"]:
+            self.stdout.write("\n{0:>6} {1:>8} {2:>7} {3:>8} {4:>15}".format(
+                "Années", "À risque", "Arrêts", "Survie", "IC 95 %"))
+            curve = result["all"]
+            for row in zip(curve["years"], curve["at_risk"], curve["events"], curve["survival"], curve["low"],
+                           curve["high"]):
+                self.stdout.write("{0:>6} {1:>8} {2:>7} {3:>8} {4:>7} - {5:>5}".format(
+                    row[0], row[1], row[2], self.percent(row[3]), self.percent(row[4]), self.percent(row[5])))
+
+        if options["cohorts"]:
+            self.stdout.write("\n{0:>6} {1:>13} {2:>7} {3:>8} {4:>16}".format(
+                "Année", "Installations", "Arrêts", "Actives", "Encore actives*"))
+            for row in result["cohorts"]:
+                self.stdout.write("{year:>6} {installed:>13} {stopped:>7} {active:>8} {still_active:>16}".format(**row))
+            self.stdout.write("* parmi les fermes installées cette année-là")
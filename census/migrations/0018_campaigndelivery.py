@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-19 14:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0017_municipality_alt_email_municipality_alt_email2_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CampaignDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("campaign", models.CharField(max_length=100, verbose_name="Campagne")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En cours"),
+                            ("sent", "Envoyé"),
+                            ("skipped", "Ignoré"),
+                            ("failed", "Échec"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Statut",
+                    ),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Erreur")),
+                ("date", models.DateTimeField(auto_now=True, verbose_name="Date")),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.farm",
+                        verbose_name="Ferme",
+                    ),
+                ),
+                (
+                    "municipality",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.municipality",
+                        verbose_name="Commune",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Envoi de campagne",
+                "verbose_name_plural": "Envois de campagne",
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("farm__isnull", False)),
+                        fields=("campaign", "farm"),
+                        name="campaign_farm_unique",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("municipality__isnull", False)),
+                        fields=("campaign", "municipality"),
+                        name="campaign_municipality_unique",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 6.0 on 2026-10-19 14:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0018_campaigndelivery"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("campaign", "Campagne annuelle (fermes)"),
+                            ("reminder", "Rappel (fermes)"),
+                            ("campaign_municipality", "Campagne annuelle (communes)"),
+                            ("export_farms", "Export des fermes"),
+                            ("export_municipalities", "Export des communes"),
+                            ("export_gardeners", "Export des maraîcher·ères"),
+                        ],
+                        max_length=50,
+                        verbose_name="Type",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "En attente"),
+                            ("running", "En cours"),
+                            ("done", "Terminée"),
+                            ("failed", "Échec"),
+                        ],
+                        default="queued",
+                        max_length=10,
+                        verbose_name="Statut",
+                    ),
+                ),
+                ("payload", models.JSONField(default=dict, verbose_name="Paramètres")),
+                ("total", models.IntegerField(default=0, verbose_name="Total")),
+                ("processed", models.IntegerField(default=0, verbose_name="Traités")),
+                (
+                    "errors",
+                    models.JSONField(blank=True, default=list, verbose_name="Erreurs"),
+                ),
+                (
+                    "result",
+                    models.JSONField(blank=True, default=dict, verbose_name="Résultat"),
+                ),
+                (
+                    "result_file",
+                    models.BinaryField(blank=True, null=True, verbose_name="Fichier"),
+                ),
+                (
+                    "result_filename",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Nom du fichier"
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Créée le"),
+                ),
+                (
+                    "run_after",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Pas avant"
+                    ),
+                ),
+                (
+                    "started",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Démarrée le"
+                    ),
+                ),
+                (
+                    "finished",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Terminée le"
+                    ),
+                ),
+                (
+                    "heartbeat",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Dernier signe de vie"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Créée par",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tâche",
+                "verbose_name_plural": "Tâches",
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0019_job"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="job",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("campaign", "Campagne annuelle (fermes)"),
+                    ("reminder", "Rappel (fermes)"),
+                    ("campaign_municipality", "Campagne annuelle (communes)"),
+                    ("export_farms", "Export des fermes"),
+                    ("export_municipalities", "Export des communes"),
+                    ("export_gardeners", "Export des maraîcher·ères"),
+                    ("send_email", "Envoi d'e-mail en attente"),
+                ],
+                max_length=50,
+                verbose_name="Type",
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 6.0 on 2026-10-19 14:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0020_alter_job_kind"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("new_farm", "Nouvelle ferme"),
+                            ("farm_updated", "Ferme modifiée"),
+                        ],
+                        max_length=20,
+                        verbose_name="Type",
+                    ),
+                ),
+                (
+                    "diff",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Changements"
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Date"),
+                ),
+                (
+                    "sent",
+                    models.DateTimeField(
+                        blank=True, db_index=True, null=True, verbose_name="Envoyée le"
+                    ),
+                ),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.farm",
+                        verbose_name="Ferme",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Notification",
+                "verbose_name_plural": "Notifications",
+            },
+        ),
+    ]
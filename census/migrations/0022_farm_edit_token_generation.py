@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-19 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0021_notificationevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="farm",
+            name="edit_token_generation",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Génération des liens d'édition"
+            ),
+        ),
+    ]
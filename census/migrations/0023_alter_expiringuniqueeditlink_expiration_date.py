@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0022_farm_edit_token_generation"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="expiringuniqueeditlink",
+            name="expiration_date",
+            field=models.DateTimeField(db_index=True, verbose_name="Date d'expiration"),
+        ),
+    ]
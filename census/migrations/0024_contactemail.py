@@ -0,0 +1,110 @@
+# Generated by Django 6.0 on 2026-10-19 14:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Municipalities are indexed by `manage.py rebuild_contacts`
+    ContactEmail = apps.get_model("census", "ContactEmail")
+    Farm = apps.get_model("census", "Farm")
+    MarketGardener = apps.get_model("census", "MarketGardener")
+
+    contacts = [
+        ContactEmail(source="farm", farm_id=pk, email=email.strip().lower())
+        for pk, email in Farm.objects.exclude(email=None)
+        .exclude(email="")
+        .values_list("pk", "email")
+    ]
+    contacts += [
+        ContactEmail(
+            source="gardener",
+            gardener_id=pk,
+            farm_id=farm_id,
+            email=email.strip().lower(),
+        )
+        for pk, farm_id, email in MarketGardener.objects.exclude(email=None)
+        .exclude(email="")
+        .values_list("pk", "farm_id", "email")
+    ]
+
+    ContactEmail.objects.bulk_create(contacts, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0023_alter_expiringuniqueeditlink_expiration_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContactEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "email",
+                    models.CharField(
+                        db_index=True,
+                        max_length=254,
+                        verbose_name="Adresse e-mail (normalisée)",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("farm", "Ferme"),
+                            ("gardener", "Maraîcher·ère"),
+                            ("municipality", "Commune"),
+                        ],
+                        max_length=20,
+                        verbose_name="Source",
+                    ),
+                ),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.farm",
+                        verbose_name="Ferme",
+                    ),
+                ),
+                (
+                    "gardener",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.marketgardener",
+                        verbose_name="Maraîcher·ère",
+                    ),
+                ),
+                (
+                    "municipality",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.municipality",
+                        verbose_name="Commune",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Adresse de contact",
+                "verbose_name_plural": "Adresses de contact",
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-19 15:02
+
+from django.db import migrations, models
+
+# Municipality.email and Municipality.alt_email were added by hand to the production database (their AddField
+# operations are commented out in 0014-0017). Bring them into the migration state, and only create the columns
+# on databases that don't have them yet (e.g. the test database).
+FIELDS = {
+    "email": models.EmailField(
+        blank=True,
+        help_text="Permet de contacter les communes pour améliorer le recensement.",
+        max_length=250,
+        null=True,
+        verbose_name="Adresse e-mail",
+    ),
+    "alt_email": models.EmailField(
+        blank=True,
+        help_text="Au cas où une 2e adresse semble pertinente.",
+        max_length=250,
+        null=True,
+        verbose_name="Adresse e-mail alternative",
+    ),
+}
+
+
+def add_missing_columns(apps, schema_editor):
+    Municipality = apps.get_model("census", "Municipality")
+    table = Municipality._meta.db_table
+
+    with schema_editor.connection.cursor() as cursor:
+        columns = {
+            column.name
+            for column in schema_editor.connection.introspection.get_table_description(
+                cursor, table
+            )
+        }
+
+    for name, field in FIELDS.items():
+        if name not in columns:
+            field = field.clone()
+            field.set_attributes_from_name(name)
+            field.model = Municipality
+            schema_editor.add_field(Municipality, field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0024_contactemail"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name="municipality",
+                    name=name,
+                    field=field.clone(),
+                )
+                for name, field in FIELDS.items()
+            ],
+            database_operations=[
+                migrations.RunPython(add_missing_columns, migrations.RunPython.noop),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0025_municipality_email_alt_email_state"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="farm",
+            index=models.Index(
+                fields=["last_update", "id"], name="farm_last_update_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="marketgardener",
+            index=models.Index(fields=["lastname", "id"], name="gardener_lastname_idx"),
+        ),
+    ]
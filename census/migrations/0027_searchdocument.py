@@ -0,0 +1,162 @@
+# Generated by Django 6.0 on 2026-10-19 14:24
+
+import unicodedata
+
+from django.db import migrations, models, transaction
+
+LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss"})
+
+
+def fold(text):
+    # Copy of census.text.fold()
+    text = unicodedata.normalize("NFKD", text.lower().translate(LIGATURES))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE census_search_fts USING fts5(content, content='census_searchdocument', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER census_search_ai AFTER INSERT ON census_searchdocument BEGIN "
+    "INSERT INTO census_search_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER census_search_ad AFTER DELETE ON census_searchdocument BEGIN "
+    "INSERT INTO census_search_fts(census_search_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER census_search_au AFTER UPDATE ON census_searchdocument BEGIN "
+    "INSERT INTO census_search_fts(census_search_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO census_search_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS census_search_ai",
+    "DROP TRIGGER IF EXISTS census_search_ad",
+    "DROP TRIGGER IF EXISTS census_search_au",
+    "DROP TABLE IF EXISTS census_search_fts",
+]
+
+POSTGRES_INSTALL = [
+    "CREATE INDEX census_search_tsv ON census_searchdocument USING GIN (to_tsvector('simple', content))",
+]
+
+POSTGRES_TRIGRAM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX census_search_trgm ON census_searchdocument USING GIN (content gin_trgm_ops)",
+]
+
+
+def install(apps, schema_editor):
+    # See census.search: the backend is chosen at runtime depending on what could be installed here
+    connection = schema_editor.connection
+
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            if "ENABLE_FTS5" in {row[0] for row in cursor.fetchall()}:
+                for sql in SQLITE_INSTALL:
+                    schema_editor.execute(sql)
+
+    elif connection.vendor == "postgresql":
+        for sql in POSTGRES_INSTALL:
+            schema_editor.execute(sql)
+
+        # pg_trgm may not be available (or the user not allowed to install it)
+        try:
+            with transaction.atomic(using=connection.alias):
+                for sql in POSTGRES_TRIGRAM:
+                    schema_editor.execute(sql)
+        except Exception:
+            pass
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in SQLITE_UNINSTALL:
+            schema_editor.execute(sql)
+
+
+def backfill(apps, schema_editor):
+    # Same documents as census.search.farm_document() and gardener_document()
+    SearchDocument = apps.get_model("census", "SearchDocument")
+    Farm = apps.get_model("census", "Farm")
+    MarketGardener = apps.get_model("census", "MarketGardener")
+
+    gardeners = {}
+    for gardener in MarketGardener.objects.select_related("farm"):
+        gardeners.setdefault(gardener.farm_id, []).append(gardener)
+
+    documents = []
+    for farm in Farm.objects.select_related("municipality"):
+        parts = [farm.name, farm.address, farm.municipality.name, farm.email]
+        for gardener in gardeners.get(farm.pk, []):
+            parts += [gardener.firstname, gardener.lastname, gardener.email]
+        documents.append(
+            SearchDocument(
+                kind="farm",
+                object_id=farm.pk,
+                content=fold(" ".join(part for part in parts if part)),
+            )
+        )
+
+    for farm_gardeners in gardeners.values():
+        for gardener in farm_gardeners:
+            parts = [
+                gardener.firstname,
+                gardener.lastname,
+                gardener.email,
+                gardener.farm.name,
+            ]
+            documents.append(
+                SearchDocument(
+                    kind="gardener",
+                    object_id=gardener.pk,
+                    content=fold(" ".join(part for part in parts if part)),
+                )
+            )
+
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0026_admin_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("farm", "Ferme"), ("gardener", "Maraîcher·ère")],
+                        max_length=20,
+                        verbose_name="Type",
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.PositiveBigIntegerField(verbose_name="Identifiant"),
+                ),
+                ("content", models.TextField(verbose_name="Contenu")),
+            ],
+            options={
+                "verbose_name": "Document de recherche",
+                "verbose_name_plural": "Documents de recherche",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "object_id"), name="search_document_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(install, uninstall),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
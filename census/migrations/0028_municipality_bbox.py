@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0027_searchdocument"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="municipality",
+            name="bbox",
+            field=models.JSONField(
+                blank=True,
+                help_text="Rectangle englobant la commune (longitude et latitude minimales puis maximales).",
+                null=True,
+                verbose_name="Emprise",
+            ),
+        ),
+    ]
@@ -0,0 +1,159 @@
+# Generated by Django 6.0 on 2026-10-19 14:39
+
+import decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def json_value(field, value):
+    # Copy of census.changelog.json_value()
+    if isinstance(value, decimal.Decimal):
+        return format(
+            value.quantize(decimal.Decimal(1).scaleb(-field.decimal_places)), "f"
+        )
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def backfill(apps, schema_editor):
+    # First checkpoint of the existing farms: their history starts now (see census.changelog)
+    Farm = apps.get_model("census", "Farm")
+    FarmCheckpoint = apps.get_model("census", "FarmCheckpoint")
+
+    fields = [
+        field
+        for field in Farm._meta.concrete_fields
+        if not field.primary_key
+        and field.name not in ("last_update", "edit_token_generation")
+    ]
+    now = django.utils.timezone.now()
+
+    for start in range(0, Farm.objects.count(), 1000):
+        rows = Farm.objects.order_by("pk").values_list(
+            "pk", *[field.attname for field in fields]
+        )[start : start + 1000]
+        FarmCheckpoint.objects.bulk_create(
+            [
+                FarmCheckpoint(
+                    farm_id=row[0],
+                    sequence=0,
+                    date=now,
+                    state={
+                        field.name: json_value(field, value)
+                        for field, value in zip(fields, row[1:])
+                    },
+                )
+                for row in rows
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0028_municipality_bbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FarmChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sequence", models.PositiveIntegerField(verbose_name="N°")),
+                (
+                    "date",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Date"
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("user", "Lien d'édition"),
+                            ("admin", "Administration"),
+                            ("import", "Import"),
+                            ("action", "Action groupée"),
+                            ("system", "Système"),
+                        ],
+                        max_length=10,
+                        verbose_name="Source",
+                    ),
+                ),
+                (
+                    "actor",
+                    models.CharField(blank=True, max_length=150, verbose_name="Auteur"),
+                ),
+                ("diff", models.JSONField(default=dict, verbose_name="Changements")),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.farm",
+                        verbose_name="Ferme",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Modification de ferme",
+                "verbose_name_plural": "Modifications de fermes",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("farm", "sequence"), name="farm_change_sequence_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="FarmCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sequence", models.PositiveIntegerField(verbose_name="N°")),
+                (
+                    "date",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Date"
+                    ),
+                ),
+                ("state", models.JSONField(default=dict, verbose_name="État")),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.farm",
+                        verbose_name="Ferme",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "État de ferme",
+                "verbose_name_plural": "États de fermes",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("farm", "sequence"),
+                        name="farm_checkpoint_sequence_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 6.0 on 2026-10-19 14:45
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copy of census.text.tokens() and its helpers
+
+LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss"})
+
+WORD = re.compile(r"\w+")
+
+STOP_WORDS = frozenset("""
+    a ai aie aient ait alors as au aucun aucune aussi autre autres aux avant avec avoir avons ayant bcp beaucoup bien
+    c ca car ce ceci cela celle celles celui ces cet cette ceux chaque chez ci comme comment d dans de des deja doit
+    donc dont du e elle elles en encore entre est et etaient etait etant ete etre eu eux fait faire faut fois font
+    ici il ils j je jusqu l la le les leur leurs lors lui m ma mais me meme mes moi moins mon n ne ni nos notre nous
+    on ont or ou par parce pas peu peut peuvent plus plutot pour pourquoi qu quand que quel quelle quelles quels qui
+    quoi s sa sans se selon ses si sien soit son sont sous suis sur t ta tant te tes toi ton tous tout toute toutes
+    tres trop tu un une unes uns vers via voire vos votre vous y
+""".split())
+
+
+def fold(text):
+    text = unicodedata.normalize("NFKD", text.lower().translate(LIGATURES))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def stem(word):
+    if len(word) > 5 and word.endswith("aux"):
+        word = word[:-3] + "al"
+    elif len(word) > 3 and word[-1] in "sx":
+        word = word[:-1]
+
+    if len(word) > 4 and word[-1] == "e":
+        word = word[:-1]
+    if len(word) > 4 and word[-1] == word[-2] and word[-1] not in "aeiouy":
+        word = word[:-1]
+
+    return word
+
+
+def tokens(text):
+    for word in WORD.findall(text.lower()):
+        folded = fold(word)
+        if len(folded) >= 3 and not folded.isdigit() and folded not in STOP_WORDS:
+            yield stem(folded), word
+
+
+def backfill(apps, schema_editor):
+    # Same terms as census.terms.document_terms()
+    Farm = apps.get_model("census", "Farm")
+    FarmTerm = apps.get_model("census", "FarmTerm")
+
+    terms = []
+    for farm in Farm.objects.only("research_priorities", "why_no_cover_crop").iterator(
+        chunk_size=500
+    ):
+        for field in ("research_priorities", "why_no_cover_crop"):
+            counts, forms = {}, {}
+            for term, word in tokens(getattr(farm, field) or ""):
+                counts[term] = counts.get(term, 0) + 1
+                forms.setdefault(term, {})
+                forms[term][word] = forms[term].get(word, 0) + 1
+            for term, count in counts.items():
+                terms.append(
+                    FarmTerm(
+                        farm_id=farm.pk,
+                        field=field,
+                        term=term[:100],
+                        word=max(forms[term], key=forms[term].get)[:100],
+                        count=min(count, 32767),
+                    )
+                )
+
+    FarmTerm.objects.bulk_create(terms, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0029_farm_change_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FarmTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "field",
+                    models.CharField(
+                        choices=[
+                            ("research_priorities", "Priorités de la recherche"),
+                            ("why_no_cover_crop", "Pas de couverts végétaux"),
+                        ],
+                        max_length=30,
+                        verbose_name="Champ",
+                    ),
+                ),
+                ("term", models.CharField(max_length=100, verbose_name="Terme")),
+                ("word", models.CharField(max_length=100, verbose_name="Mot")),
+                (
+                    "count",
+                    models.PositiveSmallIntegerField(
+                        default=1, verbose_name="Occurrences"
+                    ),
+                ),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="census.farm",
+                        verbose_name="Ferme",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Terme",
+                "verbose_name_plural": "Termes",
+                "indexes": [
+                    models.Index(fields=["field", "term"], name="farm_term_field_term")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("farm", "field", "term"), name="farm_term_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 6.0 on 2026-10-19 14:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill(apps, schema_editor):
+    # Same indicators as census.indicators.refresh()
+    Municipality = apps.get_model("census", "Municipality")
+    MunicipalityIndicator = apps.get_model("census", "MunicipalityIndicator")
+
+    farms = Q(farm__public=True, farm__end_year=None)
+    rows = Municipality.objects.annotate(
+        farms=Count("farm", filter=farms),
+        vegetable_area=Sum("farm__area", filter=farms),
+    ).values_list("pk", "area", "population", "farms", "vegetable_area")
+
+    indicators = []
+    for pk, area, population, count, vegetable_area in rows:
+        vegetable_area = float(vegetable_area or 0)
+        indicators.append(
+            MunicipalityIndicator(
+                municipality_id=pk,
+                farms=count,
+                vegetable_area=vegetable_area,
+                farms_per_km2=count / float(area) if area else None,
+                farms_per_10000=count * 10000 / population if population else None,
+                hectares_per_capita=(
+                    vegetable_area / population if population else None
+                ),
+            )
+        )
+
+    MunicipalityIndicator.objects.bulk_create(indicators, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0030_farm_term"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MunicipalityIndicator",
+            fields=[
+                (
+                    "municipality",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="indicator",
+                        serialize=False,
+                        to="census.municipality",
+                        verbose_name="Commune",
+                    ),
+                ),
+                (
+                    "farms",
+                    models.PositiveIntegerField(default=0, verbose_name="Fermes"),
+                ),
+                (
+                    "vegetable_area",
+                    models.FloatField(
+                        default=0, verbose_name="Surface maraîchère (ha)"
+                    ),
+                ),
+                (
+                    "farms_per_km2",
+                    models.FloatField(null=True, verbose_name="Fermes par km²"),
+                ),
+                (
+                    "farms_per_10000",
+                    models.FloatField(
+                        null=True, verbose_name="Fermes pour 10 000 habitants"
+                    ),
+                ),
+                (
+                    "hectares_per_capita",
+                    models.FloatField(
+                        null=True, verbose_name="Surface maraîchère par habitant (ha)"
+                    ),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(auto_now=True, verbose_name="Mise à jour"),
+                ),
+            ],
+            options={
+                "verbose_name": "Indicateur de commune",
+                "verbose_name_plural": "Indicateurs de communes",
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
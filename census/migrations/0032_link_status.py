@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-19 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0031_municipality_indicator"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LinkStatus",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "url",
+                    models.CharField(max_length=500, unique=True, verbose_name="Lien"),
+                ),
+                (
+                    "status",
+                    models.PositiveSmallIntegerField(
+                        blank=True, null=True, verbose_name="Statut HTTP"
+                    ),
+                ),
+                ("alive", models.BooleanField(null=True, verbose_name="En ligne")),
+                (
+                    "error",
+                    models.CharField(blank=True, max_length=255, verbose_name="Erreur"),
+                ),
+                (
+                    "failures",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Échecs consécutifs"
+                    ),
+                ),
+                (
+                    "checked",
+                    models.DateTimeField(
+                        blank=True, db_index=True, null=True, verbose_name="Vérifié le"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "État de lien",
+                "verbose_name_plural": "États de liens",
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-19 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0032_link_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeocodeCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        max_length=400, unique=True, verbose_name="Adresse (normalisée)"
+                    ),
+                ),
+                (
+                    "latitude",
+                    models.FloatField(blank=True, null=True, verbose_name="Latitude"),
+                ),
+                (
+                    "longitude",
+                    models.FloatField(blank=True, null=True, verbose_name="Longitude"),
+                ),
+                ("confidence", models.FloatField(default=0, verbose_name="Confiance")),
+                (
+                    "matched",
+                    models.CharField(
+                        blank=True, max_length=300, verbose_name="Adresse trouvée"
+                    ),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(auto_now=True, verbose_name="Mise à jour"),
+                ),
+            ],
+            options={
+                "verbose_name": "Adresse géocodée",
+                "verbose_name_plural": "Adresses géocodées",
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("census", "0034_job_kind_edit_links"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MailBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=50, unique=True, verbose_name="Nom"),
+                ),
+                ("tokens", models.FloatField(verbose_name="Jetons")),
+                ("updated", models.FloatField(verbose_name="Mise à jour")),
+            ],
+            options={
+                "verbose_name": "Débit d'envoi",
+                "verbose_name_plural": "Débits d'envoi",
+            },
+        ),
+        migrations.CreateModel(
+            name="MailVolume",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField(unique=True, verbose_name="Heure")),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="E-mails envoyés"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Volume d'e-mails",
+                "verbose_name_plural": "Volumes d'e-mails",
+            },
+        ),
+    ]
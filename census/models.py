@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.db import models
 from django.db.models import Q
@@ -6,11 +7,6 @@ from phonenumber_field.modelfields import PhoneNumberField
 
 from django.utils import timezone
 
-from string import ascii_letters, digits
-from random import choice
-
-import datetime
-
 class Municipality(models.Model):
     class Meta:
         verbose_name = "Commune"
@@ -45,6 +41,12 @@ class Municipality(models.Model):
                                        verbose_name="Coordonnées GPS",
                                        help_text="latitude, longitude de la commune (tel que fournit dans le .geojson des communes belges).")
 
+    # [min longitude, min latitude, max longitude, max latitude], as in GeoJSON (see manage.py load_municipalities)
+    bbox = models.JSONField(null=True,
+                            blank=True,
+                            verbose_name="Emprise",
+                            help_text="Rectangle englobant la commune (longitude et latitude minimales puis maximales).")
+
     email = models.EmailField(max_length=250,
                               null=True,
                               blank=True,
@@ -301,6 +303,11 @@ class Farm(models.Model):
     def edited_by_user_display(self):
         return self.edited_by_user
 
+    # Incremented to revoke all the edit links sent so far (see census.tokens)
+    edit_token_generation = models.PositiveIntegerField(default=0,
+                                                        editable=False,
+                                                        verbose_name="Génération des liens d'édition")
+
     ADDED_BY = {
         "Staff": "Staff",
         "User": "User"
@@ -356,6 +363,11 @@ class Farm(models.Model):
             )
         ]
 
+        # Keyset pagination of the admin changelist (see census.pagination)
+        indexes = [
+            models.Index(fields=["last_update", "id"], name="farm_last_update_idx"),
+        ]
+
 class OtherLinks(models.Model):
     class Meta:
         verbose_name = "Autre lien"
@@ -410,9 +422,15 @@ class MarketGardener(models.Model):
 
         unique_together = ('firstname', 'lastname')
 
+        # Keyset pagination of the admin changelist (see census.pagination)
+        indexes = [
+            models.Index(fields=["lastname", "id"], name="gardener_lastname_idx"),
+        ]
+
     def __str__(self):
         return self.firstname + " " + self.lastname
 
+# Edit links sent before the signed tokens of census.tokens, kept until they expire
 class ExpiringUniqueEditLink(models.Model):
     class Meta:
         verbose_name = "Lien d'édition"
@@ -423,15 +441,443 @@ class ExpiringUniqueEditLink(models.Model):
     token = models.CharField(max_length=120, null=False, unique=True,
                              verbose_name="Token d'accès unique")
 
-    expiration_date = models.DateTimeField(null=False, verbose_name="Date d'expiration")
+    # Indexed for manage.py purge_edit_links
+    expiration_date = models.DateTimeField(null=False, db_index=True, verbose_name="Date d'expiration")
+
+    def __str__(self):
+        return self.farm.name
+
+class CampaignDelivery(models.Model):
+    class Meta:
+        verbose_name = "Envoi de campagne"
+        verbose_name_plural = "Envois de campagne"
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["campaign", "farm"],
+                condition=Q(farm__isnull=False),
+                name="campaign_farm_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["campaign", "municipality"],
+                condition=Q(municipality__isnull=False),
+                name="campaign_municipality_unique",
+            ),
+        ]
+
+    campaign = models.CharField(max_length=100, verbose_name="Campagne")
+
+    farm = models.ForeignKey(Farm,
+                             on_delete=models.CASCADE,
+                             null=True,
+                             blank=True,
+                             verbose_name="Ferme")
+
+    municipality = models.ForeignKey(Municipality,
+                                     on_delete=models.CASCADE,
+                                     null=True,
+                                     blank=True,
+                                     verbose_name="Commune")
+
+    # A pending delivery might have been sent (e.g. crash right after the SMTP transaction): it is never retried
+    STATUS = {
+        "pending": "En cours",
+        "sent": "Envoyé",
+        "skipped": "Ignoré",
+        "failed": "Échec",
+    }
+
+    status = models.CharField(choices=STATUS,
+                              default="pending",
+                              max_length=10,
+                              verbose_name="Statut")
+
+    error = models.TextField(blank=True, verbose_name="Erreur")
+
+    date = models.DateTimeField(auto_now=True, verbose_name="Date")
+
+    def __str__(self):
+        return self.campaign + " : " + str(self.farm or self.municipality)
+
+# State of a token bucket of census.campaign, shared by all the processes sending through the mail account
+class MailBucket(models.Model):
+    class Meta:
+        verbose_name = "Débit d'envoi"
+        verbose_name_plural = "Débits d'envoi"
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="Nom")
+
+    tokens = models.FloatField(verbose_name="Jetons")
+
+    # Time of the last refill, in seconds since the epoch
+    updated = models.FloatField(verbose_name="Mise à jour")
+
+    def __str__(self):
+        return self.name
+
+# Number of e-mails sent per hour, all kinds together, for the daily quota of the mail provider (see census.delivery)
+class MailVolume(models.Model):
+    class Meta:
+        verbose_name = "Volume d'e-mails"
+        verbose_name_plural = "Volumes d'e-mails"
+
+    hour = models.DateTimeField(unique=True, verbose_name="Heure")
+
+    count = models.PositiveIntegerField(default=0, verbose_name="E-mails envoyés")
+
+    def __str__(self):
+        return "{0} : {1}".format(self.hour, self.count)
+
+class Job(models.Model):
+    class Meta:
+        verbose_name = "Tâche"
+        verbose_name_plural = verbose_name + "s"
+
+    KIND = {
+        "campaign": "Campagne annuelle (fermes)",
+        "reminder": "Rappel (fermes)",
+        "campaign_municipality": "Campagne annuelle (communes)",
+        "export_farms": "Export des fermes",
+        "export_municipalities": "Export des communes",
+        "export_gardeners": "Export des maraîcher·ères",
+        "send_email": "Envoi d'e-mail en attente",
+        "edit_links": "Envoi des liens d'édition",
+    }
+
+    kind = models.CharField(choices=KIND, max_length=50, verbose_name="Type")
+
+    STATUS = {
+        "queued": "En attente",
+        "running": "En cours",
+        "done": "Terminée",
+        "failed": "Échec",
+    }
+
+    status = models.CharField(choices=STATUS, default="queued", max_length=10, verbose_name="Statut")
+
+    # {"pks": [...] or None, ...} + parameters specific to the kind of job
+    payload = models.JSONField(default=dict, verbose_name="Paramètres")
+
+    total = models.IntegerField(default=0, verbose_name="Total")
+
+    processed = models.IntegerField(default=0, verbose_name="Traités")
+
+    errors = models.JSONField(default=list, blank=True, verbose_name="Erreurs")
+
+    result = models.JSONField(default=dict, blank=True, verbose_name="Résultat")
+
+    result_file = models.BinaryField(null=True, blank=True, editable=False, verbose_name="Fichier")
+
+    result_filename = models.CharField(max_length=100, blank=True, verbose_name="Nom du fichier")
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                   on_delete=models.SET_NULL,
+                                   null=True,
+                                   blank=True,
+                                   verbose_name="Créée par")
+
+    created = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+
+    # A job is not picked by a worker before this date (e.g. when the daily sending quota has been reached)
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Pas avant")
+
+    started = models.DateTimeField(null=True, blank=True, verbose_name="Démarrée le")
+
+    finished = models.DateTimeField(null=True, blank=True, verbose_name="Terminée le")
+
+    # Updated after each chunk, allows another worker to take over the job if this one died
+    heartbeat = models.DateTimeField(null=True, blank=True, verbose_name="Dernier signe de vie")
+
+    @admin.display(description="Progression")
+    def progress(self):
+        if self.total == 0:
+            return 100 if self.status == "done" else 0
+        return round(100 * self.processed / self.total)
+
+    def __str__(self):
+        return self.get_kind_display() + " #" + str(self.pk)
+
+class NotificationEvent(models.Model):
+    class Meta:
+        verbose_name = "Notification"
+        verbose_name_plural = verbose_name + "s"
+
+    KIND = {
+        "new_farm": "Nouvelle ferme",
+        "farm_updated": "Ferme modifiée",
+    }
+
+    kind = models.CharField(choices=KIND, max_length=20, verbose_name="Type")
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, verbose_name="Ferme")
+
+    # {field: {"old": ..., "new": ...}}, as computed in FarmUpdateView.form_valid()
+    diff = models.JSONField(default=dict, blank=True, verbose_name="Changements")
+
+    created = models.DateTimeField(auto_now_add=True, verbose_name="Date")
+
+    # Set when the event has been included in a digest (see manage.py send_digest)
+    sent = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name="Envoyée le")
+
+    def __str__(self):
+        return self.get_kind_display() + " : " + self.farm.name
+
+def normalize_email(email):
+    return email.strip().lower()
+
+# Normalized copy of every known e-mail address, kept in sync by census.signals (rebuild: manage.py rebuild_contacts)
+class ContactEmail(models.Model):
+    class Meta:
+        verbose_name = "Adresse de contact"
+        verbose_name_plural = "Adresses de contact"
+
+    email = models.CharField(max_length=254, db_index=True, verbose_name="Adresse e-mail (normalisée)")
+
+    SOURCE = {
+        "farm": "Ferme",
+        "gardener": "Maraîcher·ère",
+        "municipality": "Commune",
+    }
+
+    source = models.CharField(choices=SOURCE, max_length=20, verbose_name="Source")
+
+    # farm is set for the addresses of a farm and of its market gardeners
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Ferme")
+
+    gardener = models.ForeignKey(MarketGardener,
+                                 on_delete=models.CASCADE,
+                                 null=True,
+                                 blank=True,
+                                 verbose_name="Maraîcher·ère")
+
+    municipality = models.ForeignKey(Municipality,
+                                     on_delete=models.CASCADE,
+                                     null=True,
+                                     blank=True,
+                                     verbose_name="Commune")
+
+    @classmethod
+    def sync_farm(cls, farm):
+        cls.objects.filter(source="farm", farm=farm).delete()
+        if farm.email:
+            cls.objects.create(source="farm", farm=farm, email=normalize_email(farm.email))
+
+    @classmethod
+    def sync_farms(cls, farms):
+        # Bulk version of sync_farm()
+        cls.objects.filter(source="farm", farm__in=[farm.pk for farm in farms]).delete()
+        cls.objects.bulk_create([cls(source="farm", farm=farm, email=normalize_email(farm.email))
+                                 for farm in farms if farm.email])
 
     @classmethod
-    def create(cls, farm, days=1):
-        link = cls(farm=farm)
-        link.token = ''.join(choice(ascii_letters + digits) for i in range(60))
-        link.expiration_date = timezone.now() + datetime.timedelta(days=days)
+    def sync_gardener(cls, gardener):
+        cls.objects.filter(source="gardener", gardener=gardener).delete()
+        if gardener.email:
+            cls.objects.create(source="gardener", gardener=gardener, farm_id=gardener.farm_id,
+                               email=normalize_email(gardener.email))
+
+    @classmethod
+    def sync_municipality(cls, municipality):
+        cls.objects.filter(source="municipality", municipality=municipality).delete()
+        cls.objects.bulk_create([cls(source="municipality", municipality=municipality, email=normalize_email(email))
+                                 for email in municipality.email_list() if email])
+
+    @classmethod
+    def farms_for(cls, email):
+        # Farms this address belongs to, directly or through one of their market gardeners
+        return Farm.objects.filter(contactemail__email=normalize_email(email)).distinct()
+
+    def __str__(self):
+        return self.email
+
+# Folded text of a farm or market gardener for the admin search boxes, kept in sync by census.signals and indexed by
+# the database (see census.search and migration 0027)
+class SearchDocument(models.Model):
+    class Meta:
+        verbose_name = "Document de recherche"
+        verbose_name_plural = "Documents de recherche"
+
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="search_document_unique"),
+        ]
+
+    KINDS = {
+        "farm": "Ferme",
+        "gardener": "Maraîcher·ère",
+    }
+
+    kind = models.CharField(choices=KINDS, max_length=20, verbose_name="Type")
+
+    object_id = models.PositiveBigIntegerField(verbose_name="Identifiant")
+
+    content = models.TextField(verbose_name="Contenu")
+
+    def __str__(self):
+        return "{0} {1}".format(self.get_kind_display(), self.object_id)
+
+# Append-only log of the changes of the farms, with the changed fields only (see census.changelog)
+class FarmChange(models.Model):
+    class Meta:
+        verbose_name = "Modification de ferme"
+        verbose_name_plural = "Modifications de fermes"
+
+        constraints = [
+            models.UniqueConstraint(fields=["farm", "sequence"], name="farm_change_sequence_unique"),
+        ]
+
+    SOURCE = {
+        "user": "Lien d'édition",
+        "admin": "Administration",
+        "import": "Import",
+        "action": "Action groupée",
+        "system": "Système",
+    }
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, verbose_name="Ferme")
+
+    # Number of the change for this farm, 0 being the creation
+    sequence = models.PositiveIntegerField(verbose_name="N°")
+
+    date = models.DateTimeField(default=timezone.now, verbose_name="Date")
+
+    source = models.CharField(choices=SOURCE, max_length=10, verbose_name="Source")
+
+    actor = models.CharField(max_length=150, blank=True, verbose_name="Auteur")
+
+    # {field: [old, new]}, with the values of census.changelog.json_value()
+    diff = models.JSONField(default=dict, verbose_name="Changements")
+
+    def __str__(self):
+        return "{0} #{1}".format(self.farm_id, self.sequence)
+
+# Full state of a farm after a given change, every few changes, to rebuild the state at any date quickly
+class FarmCheckpoint(models.Model):
+    class Meta:
+        verbose_name = "État de ferme"
+        verbose_name_plural = "États de fermes"
+
+        constraints = [
+            models.UniqueConstraint(fields=["farm", "sequence"], name="farm_checkpoint_sequence_unique"),
+        ]
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, verbose_name="Ferme")
+
+    # Sequence of the last change included
+    sequence = models.PositiveIntegerField(verbose_name="N°")
+
+    date = models.DateTimeField(default=timezone.now, verbose_name="Date")
+
+    state = models.JSONField(default=dict, verbose_name="État")
+
+    def __str__(self):
+        return "{0} #{1}".format(self.farm_id, self.sequence)
+
+# Terms of the free-text answers of a farm, for the analysis of the answers (see census.terms)
+class FarmTerm(models.Model):
+    class Meta:
+        verbose_name = "Terme"
+        verbose_name_plural = "Termes"
+
+        constraints = [
+            models.UniqueConstraint(fields=["farm", "field", "term"], name="farm_term_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["field", "term"], name="farm_term_field_term"),
+        ]
+
+    FIELDS = {
+        "research_priorities": "Priorités de la recherche",
+        "why_no_cover_crop": "Pas de couverts végétaux",
+    }
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, verbose_name="Ferme")
+
+    field = models.CharField(choices=FIELDS, max_length=30, verbose_name="Champ")
+
+    # Stem of the word (see census.text.tokens)
+    term = models.CharField(max_length=100, verbose_name="Terme")
+
+    # Most frequent form of the term in the answer, for display
+    word = models.CharField(max_length=100, verbose_name="Mot")
+
+    count = models.PositiveSmallIntegerField(default=1, verbose_name="Occurrences")
+
+    def __str__(self):
+        return self.word
+
+# Density indicators of a municipality, kept up to date by census.indicators for the map
+class MunicipalityIndicator(models.Model):
+    class Meta:
+        verbose_name = "Indicateur de commune"
+        verbose_name_plural = "Indicateurs de communes"
+
+    municipality = models.OneToOneField(Municipality,
+                                        on_delete=models.CASCADE,
+                                        primary_key=True,
+                                        related_name="indicator",
+                                        verbose_name="Commune")
+
+    # Active public farms, as on the map
+    farms = models.PositiveIntegerField(default=0, verbose_name="Fermes")
+
+    vegetable_area = models.FloatField(default=0, verbose_name="Surface maraîchère (ha)")
+
+    # None without area or population
+    farms_per_km2 = models.FloatField(null=True, verbose_name="Fermes par km²")
+
+    farms_per_10000 = models.FloatField(null=True, verbose_name="Fermes pour 10 000 habitants")
+
+    hectares_per_capita = models.FloatField(null=True, verbose_name="Surface maraîchère par habitant (ha)")
+
+    updated = models.DateTimeField(auto_now=True, verbose_name="Mise à jour")
+
+    def __str__(self):
+        return str(self.municipality_id)
+
+# Last check of a website, Facebook page or other link of the farms (see census.links)
+class LinkStatus(models.Model):
+    class Meta:
+        verbose_name = "État de lien"
+        verbose_name_plural = "États de liens"
+
+    url = models.CharField(max_length=500, unique=True, verbose_name="Lien")
+
+    # HTTP status of the last answer (after redirections), None if no answer (timeout, DNS, TLS, ...)
+    status = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Statut HTTP")
+
+    # None until checked
+    alive = models.BooleanField(null=True, verbose_name="En ligne")
+
+    error = models.CharField(max_length=255, blank=True, verbose_name="Erreur")
+
+    # Consecutive failed checks
+    failures = models.PositiveSmallIntegerField(default=0, verbose_name="Échecs consécutifs")
+
+    checked = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name="Vérifié le")
+
+    def __str__(self):
+        return self.url
+
+# Result of the geocoding of an address by census.geocoder, keyed by the normalized address
+class GeocodeCache(models.Model):
+    class Meta:
+        verbose_name = "Adresse géocodée"
+        verbose_name_plural = "Adresses géocodées"
+
+    # "<municipality id>|<normalized street>|<house number>"
+    key = models.CharField(max_length=400, unique=True, verbose_name="Adresse (normalisée)")
+
+    # None if the address wasn't found
+    latitude = models.FloatField(null=True, blank=True, verbose_name="Latitude")
+
+    longitude = models.FloatField(null=True, blank=True, verbose_name="Longitude")
+
+    confidence = models.FloatField(default=0, verbose_name="Confiance")
+
+    # Address of the gazetteer that was used
+    matched = models.CharField(max_length=300, blank=True, verbose_name="Adresse trouvée")
 
-        return link
+    updated = models.DateTimeField(auto_now=True, verbose_name="Mise à jour")
 
     def __str__(self):
-        return self.farm.name
\ No newline at end of file
+        return self.key
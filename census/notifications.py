@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from census.campaign import absolute_url
+from census.delivery import send_email
+from census.models import NotificationEvent
+
+"""
+    Digest of the farm creations and user edits, sent periodically to the admin instead of one e-mail per event.
+"""
+
+def coalesce(events):
+    # One entry per farm, in order of first event. A field changed several times keeps its first old value and its
+    # last new value, and is dropped if it came back to its initial value.
+    farms = dict()
+
+    for event in events:
+        entry = farms.setdefault(event.farm_id, {"farm": event.farm, "new": False, "diff": dict(), "count": 0})
+        entry["count"] += 1
+
+        if event.kind == "new_farm":
+            entry["new"] = True
+
+        for field, change in event.diff.items():
+            if field in entry["diff"]:
+                entry["diff"][field]["new"] = change["new"]
+            else:
+                entry["diff"][field] = dict(change)
+
+    for entry in farms.values():
+        entry["diff"] = {field: change for field, change in entry["diff"].items() if change["old"] != change["new"]}
+
+    return list(farms.values())
+
+def send_digest(base_url):
+    # Returns the number of farms in the digest (0 if there was nothing to send)
+    with transaction.atomic():
+        events = list(NotificationEvent.objects
+                      .select_for_update()
+                      .filter(sent=None)
+                      .select_related("farm__municipality")
+                      .order_by("created"))
+
+        if not events:
+            return 0
+
+        entries = coalesce(events)
+        for entry in entries:
+            entry["admin_change_url"] = absolute_url(base_url, reverse("admin:census_farm_change",
+                                                                       args=(entry["farm"].id,)))
+
+        new_count = len([entry for entry in entries if entry["new"]])
+        context = {
+            "entries": entries,
+            "new_count": new_count,
+            "updated_count": len(entries) - new_count,
+        }
+
+        # Raises if the e-mail could not be sent: the events stay pending for the next digest
+        send_email(["antoine.paris@uclouvain.be"],
+                   "Recensement : {0} nouvelle(s) ferme(s), {1} ferme(s) modifiée(s)".format(new_count,
+                                                                                            len(entries) - new_count),
+                   "digest",
+                   context)
+
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).update(sent=timezone.now())
+
+    return len(entries)
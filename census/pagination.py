@@ -0,0 +1,178 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.main import ChangeList, PAGE_VAR
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+"""
+    Admin changelists for large tables.
+
+    - Counts: above settings.ADMIN_EXACT_COUNT_THRESHOLD rows, the count is the estimate of the query planner
+      (PostgreSQL) or an exact count cached for settings.ADMIN_COUNT_CACHE_TIMEOUT seconds (other databases).
+    - Pages: "next" and "previous" links carry the primary key of the last (first) row of the page, and the next page
+      is fetched with a WHERE on the ordering columns instead of an OFFSET, so that page N costs the same as page 1.
+      This only works when the changelist is ordered by plain, non-null columns ending with a unique one (the admin
+      adds the primary key itself); otherwise, e.g. when sorting on a computed column, the usual pages are used.
+"""
+
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+
+def planner_estimate(queryset):
+    # Number of rows the query planner expects, None if the database can't tell
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+class EstimatedCountPaginator(Paginator):
+    estimated = False
+
+    @cached_property
+    def count(self):
+        threshold = settings.ADMIN_EXACT_COUNT_THRESHOLD
+
+        estimate = planner_estimate(self.object_list)
+        if estimate is not None:
+            if estimate < threshold:
+                return super().count
+            self.estimated = True
+            return estimate
+
+        sql, params = self.object_list.query.sql_with_params()
+        key = "admin:count:" + hashlib.md5(repr((sql, params)).encode("utf-8")).hexdigest()
+
+        count = cache.get(key)
+        if count is not None:
+            self.estimated = True
+            return count
+
+        count = super().count
+        if count >= threshold:
+            cache.set(key, count, timeout=settings.ADMIN_COUNT_CACHE_TIMEOUT)
+
+        return count
+
+class KeysetChangeList(ChangeList):
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def keyset_columns(self):
+        # [(field name, descending?)] if the ordering allows to paginate by keyset, else None
+        columns = []
+
+        for part in self.queryset.query.order_by:
+            if not isinstance(part, str) or part == "?":
+                return None
+
+            name = part.lstrip("-")
+            try:
+                field = self.lookup_opts.pk if name == "pk" else self.lookup_opts.get_field(name)
+            except FieldDoesNotExist:
+                # Annotations, related lookups
+                return None
+
+            if not field.concrete or field.null or field.remote_field:
+                return None
+
+            columns.append((field.attname, part.startswith("-")))
+
+            if field.primary_key or field.unique:
+                return columns
+
+        return None
+
+    def keyset_filter(self, columns, row, forward):
+        # Rows after `row` in the ordering (before it if not forward), compared column by column
+        condition = Q()
+        for i, (name, descending) in enumerate(columns):
+            lookup = "lt" if descending == forward else "gt"
+            condition |= Q(**{name: row[name] for name, _ in columns[:i]}, **{name + "__" + lookup: row[name]})
+
+        # Redundant, but gives the database a range on the first column to seek into its index, instead of scanning
+        # it from the start
+        name, descending = columns[0]
+        return Q(**{name + ("__lte" if descending == forward else "__gte"): row[name]}) & condition
+
+    def get_results(self, request):
+        columns = self.keyset_columns()
+
+        self.keyset = (columns is not None and PAGE_VAR not in request.GET and not self.show_all
+                       and not self.list_editable)
+
+        if not self.keyset:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+
+        if self.model_admin.show_full_result_count:
+            full_result_count = self.model_admin.get_paginator(request, self.root_queryset, 1).count
+        else:
+            full_result_count = None
+
+        cursor = request.GET.get(AFTER_VAR) or request.GET.get(BEFORE_VAR)
+        forward = BEFORE_VAR not in request.GET
+
+        try:
+            cursor = self.lookup_opts.pk.to_python(cursor) if cursor else None
+        except ValidationError:
+            # Not a primary key (e.g. an edited URL): first page
+            cursor, forward = None, True
+
+        queryset = self.queryset
+        if cursor:
+            # The cursor row is read without the filters, so that the position is kept if it no longer matches them
+            row = self.model._default_manager.filter(pk=cursor).values(*[name for name, _ in columns]).first()
+            if row is not None:
+                queryset = queryset.filter(self.keyset_filter(columns, row, forward))
+
+        if not forward:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[:self.list_per_page + 1])
+        more = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+        if not forward:
+            rows.reverse()
+
+        self.has_next = more if forward else True
+        self.has_previous = bool(cursor) if forward else more
+
+        if rows:
+            self.next_url = self.get_query_string({AFTER_VAR: rows[-1].pk}, [BEFORE_VAR])
+            self.previous_url = self.get_query_string({BEFORE_VAR: rows[0].pk}, [AFTER_VAR])
+        self.first_url = self.get_query_string(remove=[AFTER_VAR, BEFORE_VAR])
+
+        self.result_count = paginator.count
+        self.estimated_count = paginator.estimated if isinstance(paginator, EstimatedCountPaginator) else False
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.show_admin_actions = not self.show_full_result_count or bool(full_result_count)
+        self.full_result_count = full_result_count
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = self.has_next or self.has_previous
+        self.paginator = paginator
+
+class KeysetPaginationMixin:
+    # For the ModelAdmin of large tables, see above
+    paginator = EstimatedCountPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,204 @@
+import math
+import string
+
+import numpy as np
+
+from django.conf import settings
+
+from census.duplicates import normalize_url, parse_coordinates
+from census.geo import EARTH_RADIUS
+from census.models import Farm
+from census.snapshots import MISSING_YEAR, floats, years
+
+"""
+    Data-quality rules: implausible values of the farms, reported with an explanation so that they can be checked and
+    flagged.
+
+    The columns needed by the rules are read with one query into numpy arrays (see Columns), then each rule of RULES
+    is a declarative check evaluated for all the farms at once: a function of the columns returning a boolean array,
+    and the explanation shown for each farm it matches, formatted with the values of that farm. Only the URLs and
+    coordinates, stored as text, are parsed row by row.
+
+    A farm matching at least one rule is a Suggestion. Nothing is changed by run(): flagging the farms is left to the
+    admin action or to `manage.py check_quality --flag`, through census.changelog.
+"""
+
+# Above this area (ha), the value was probably entered in ares or in m²
+AREA_MAX = 20
+
+# Above these FTE, or FTE per ha, the value was probably a number of people or of hours
+FTE_MAX = 20
+FTE_PER_HA_MAX = 20
+
+# Farms located further than this (km) from the centroid of their municipality, and outside its bounding box extended
+# by GPS_MARGIN (km), are probably in another municipality, or have swapped latitude and longitude
+GPS_MAX_DISTANCE = 15
+GPS_MARGIN = 2
+
+"""
+    Columns
+"""
+def haversine(lat1, lon1, lat2, lon2):
+    # Vectorized haversine distance (km), NaN where a point is missing
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(h))
+
+def coordinates(values):
+    # (latitudes, longitudes, unparseable) of "latitude, longitude" texts, NaN where missing or invalid
+    points = [parse_coordinates(value) for value in values]
+    latitude = np.array([np.nan if point is None else point[0] for point in points], dtype=np.float64)
+    longitude = np.array([np.nan if point is None else point[1] for point in points], dtype=np.float64)
+    invalid = np.array([bool(value and value.strip()) and point is None for value, point in zip(values, points)],
+                       dtype=np.bool_)
+    return latitude, longitude, invalid
+
+class Columns:
+    FIELDS = ("pk", "name", "flagged", "area", "FTE", "FTEv", "start_year", "end_year", "GPS_coordinates", "website",
+              "fb_page", "municipality__name", "municipality__GPS_coordinates", "municipality__bbox")
+
+    def __init__(self, queryset):
+        self.rows = list(queryset.order_by("pk").values_list(*self.FIELDS))
+        columns = dict(zip(self.FIELDS, list(zip(*self.rows)) or [()] * len(self.FIELDS)))
+
+        self.pk = np.array(columns["pk"], dtype=np.int64)
+        self.area = floats(columns["area"])
+        self.FTE = floats(columns["FTE"])
+        self.FTEv = floats(columns["FTEv"])
+        self.start_year = years(columns["start_year"])
+        self.end_year = years(columns["end_year"])
+
+        self.latitude, self.longitude, self.invalid_gps = coordinates(columns["GPS_coordinates"])
+        self.municipality_latitude, self.municipality_longitude, _ = coordinates(
+            columns["municipality__GPS_coordinates"])
+        # [min longitude, min latitude, max longitude, max latitude], NaN if unknown
+        self.bbox = np.array([bbox if bbox and len(bbox) == 4 else [np.nan] * 4
+                              for bbox in columns["municipality__bbox"]], dtype=np.float64).reshape(-1, 4)
+
+        websites = [normalize_url(url) or "" for url in columns["website"]]
+        fb_pages = [normalize_url(url) or "" for url in columns["fb_page"]]
+        self.website = np.array(websites, dtype=np.str_)
+        self.fb_page = np.array(fb_pages, dtype=np.str_)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.FTE_per_ha = self.FTE / self.area
+        self.distance = haversine(self.latitude, self.longitude, self.municipality_latitude,
+                                  self.municipality_longitude)
+
+    def __len__(self):
+        return len(self.pk)
+
+    def values(self, i):
+        # Values of farm i, for the explanations
+        values = dict(zip(self.FIELDS, self.rows[i]))
+        values.update(FTE_per_ha=self.FTE_per_ha[i], distance=self.distance[i], census_year=settings.CENSUS_YEAR)
+        return values
+
+class ExplanationFormatter(string.Formatter):
+    # Missing values are shown as "?", whatever their format ("{area} ha" -> "? ha", not "None ha")
+    def format_field(self, value, format_spec):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return "?"
+        return super().format_field(value, format_spec)
+
+EXPLANATION_FORMATTER = ExplanationFormatter()
+
+def outside_bbox(columns, margin):
+    # Farms located outside the bounding box of their municipality extended by margin (km), False if either is unknown
+    dlat = margin / (EARTH_RADIUS * np.pi / 180)
+    with np.errstate(invalid="ignore"):
+        dlon = dlat / np.cos(np.radians(columns.latitude))
+        inside = ((columns.longitude >= columns.bbox[:, 0] - dlon) & (columns.latitude >= columns.bbox[:, 1] - dlat)
+                  & (columns.longitude <= columns.bbox[:, 2] + dlon) & (columns.latitude <= columns.bbox[:, 3] + dlat))
+    return ~inside & ~np.isnan(columns.bbox[:, 0]) & ~np.isnan(columns.latitude)
+
+def far_from_municipality(columns):
+    with np.errstate(invalid="ignore"):
+        far = columns.distance > GPS_MAX_DISTANCE
+    # Large municipalities: only beyond their bounding box, when it is known
+    return far & (outside_bbox(columns, GPS_MARGIN) | np.isnan(columns.bbox[:, 0]))
+
+"""
+    Rules
+"""
+class Rule:
+    def __init__(self, code, label, check, explanation):
+        self.code = code
+        self.label = label
+        # columns -> boolean array, comparisons with NaN (missing values) being False
+        self.check = check
+        # Formatted with the values of the farm (see Columns.values())
+        self.explanation = explanation
+
+    def explain(self, values):
+        return EXPLANATION_FORMATTER.format(self.explanation, **values)
+
+    def __str__(self):
+        return self.label
+
+RULES = [
+    Rule("area_unit", "Surface en ares ou en m² ?",
+         lambda c: c.area > AREA_MAX,
+         "surface de {area} ha, plus de " + str(AREA_MAX) + " ha : encodée en ares ou en m² ?"),
+    Rule("fte_people", "ETP rémunérés en nombre de personnes ?",
+         lambda c: (c.FTE > FTE_MAX) | ((c.FTE_per_ha > FTE_PER_HA_MAX) & (c.FTE > 1)),
+         "{FTE} ETP rémunérés pour {area} ha : un nombre de personnes ou d'heures ?"),
+    Rule("ftev_people", "ETP bénévoles en nombre de personnes ?",
+         lambda c: c.FTEv > FTE_MAX,
+         "{FTEv} ETP non-rémunérés : un nombre de personnes ou d'heures ?"),
+    Rule("end_before_start", "Fin d'activité avant l'installation",
+         lambda c: (c.start_year != MISSING_YEAR) & (c.end_year != MISSING_YEAR) & (c.end_year < c.start_year),
+         "fin d'activité en {end_year}, avant l'installation en {start_year}"),
+    Rule("future_start", "Installation dans le futur",
+         lambda c: c.start_year > settings.CENSUS_YEAR,
+         "installation en {start_year}, après {census_year}"),
+    Rule("gps_invalid", "Coordonnées GPS illisibles",
+         lambda c: c.invalid_gps,
+         "coordonnées GPS « {GPS_coordinates} » illisibles (attendu : latitude, longitude)"),
+    Rule("gps_far", "Coordonnées GPS hors de la commune",
+         far_from_municipality,
+         "coordonnées GPS à {distance:.0f} km du centre de {municipality__name}"),
+    Rule("website_facebook", "Page Facebook comme site web",
+         lambda c: np.char.find(c.website, "facebook.com") >= 0,
+         "le site web {website} est une page Facebook"),
+    Rule("website_fb_page", "Même adresse en site web et page Facebook",
+         lambda c: (c.website != "") & (c.website == c.fb_page),
+         "même adresse en site web et en page Facebook ({fb_page})"),
+]
+
+class Suggestion:
+    def __init__(self, pk, name, flagged, reasons):
+        self.pk = pk
+        self.name = name
+        # Already flagged
+        self.flagged = flagged
+        # [(rule, explanation)]
+        self.reasons = reasons
+
+    @property
+    def codes(self):
+        return [rule.code for rule, _ in self.reasons]
+
+    def __str__(self):
+        return "{0} (#{1}) : {2}".format(self.name, self.pk, " ; ".join(text for _, text in self.reasons))
+
+def evaluate(columns, rules=RULES):
+    # {rule code: boolean array}
+    return {rule.code: np.asarray(rule.check(columns), dtype=np.bool_) for rule in rules}
+
+def run(queryset=None, rules=RULES):
+    # Suggestions for the farms of the queryset (all of them by default), in the order of their pk
+    columns = Columns(Farm.objects.all() if queryset is None else queryset)
+    if not len(columns):
+        return []
+
+    matches = evaluate(columns, rules)
+    matrix = np.column_stack([matches[rule.code] for rule in rules])
+
+    suggestions = []
+    for i in np.nonzero(matrix.any(axis=1))[0].tolist():
+        values = columns.values(i)
+        reasons = [(rule, rule.explain(values)) for k, rule in enumerate(rules) if matrix[i, k]]
+        suggestions.append(Suggestion(values["pk"], values["name"], values["flagged"], reasons))
+
+    return suggestions
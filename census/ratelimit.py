@@ -0,0 +1,126 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from census.models import normalize_email
+
+"""
+    Sliding-window rate limiting of the public forms, stored in the cache.
+
+    Each (endpoint, key) pair has a counter per fixed window. The number of requests over the last `window` seconds
+    is estimated from the current counter and the previous one, weighted by the part of the previous window that is
+    still in the sliding window. The current counter is incremented first and the value returned by incr() is
+    compared with the limit, so that concurrent requests can't all pass: this costs one get_many() and one incr() per
+    key, and one decr() per key when the request is refused (refused requests don't count).
+
+    The check happens in dispatch(), before any form processing or database query.
+"""
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_rate(rate):
+    # "5/h" -> (5, 3600)
+    limit, period = rate.split("/")
+    return int(limit), PERIODS[period]
+
+def client_ip(request):
+    # Behind RATE_LIMIT_TRUSTED_PROXIES reverse proxies, each one appending the address it received the request from to
+    # X-Forwarded-For, the client is the entry added by the first proxy: that many entries from the right. The entries
+    # further left are set by the client and can't be trusted.
+    proxies = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if proxies:
+        forwarded = [entry.strip() for entry in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+                     if entry.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+# key name: function(request, view kwargs) returning the value to count, or None to not count this request
+KEYS = {
+    "ip": lambda request, kwargs: client_ip(request) or None,
+    "farm": lambda request, kwargs: kwargs.get("pk"),
+    "email": lambda request, kwargs: normalize_email(request.POST.get("email", ""))[:254] or None,
+}
+
+def counter_key(scope, name, value, window, index):
+    # The value is hashed to keep the key short and free of characters some cache backends refuse (e-mails)
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=12).hexdigest()
+    return "rl:{0}:{1}:{2}:{3}:{4}".format(scope, name, window, index, digest)
+
+def increment(key, timeout):
+    # Value of the counter after the increment
+    if cache.add(key, 1, timeout=timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=timeout)
+        return 1
+
+class RateLimiter:
+    def __init__(self, scope, limits=None, clock=time.time):
+        # limits: {key name: "<requests>/<period>"}, taken from settings.RATE_LIMITS by default
+        self.scope = scope
+        self.limits = {name: parse_rate(rate)
+                       for name, rate in (limits if limits is not None else settings.RATE_LIMITS.get(scope, {})).items()}
+        self.clock = clock
+
+    def check(self, request, kwargs=None):
+        # Returns 0 if the request is accepted (and counted), else the number of seconds to wait
+        now = self.clock()
+        counters = []
+
+        for name, (limit, window) in self.limits.items():
+            value = KEYS[name](request, kwargs or {})
+            if value is None:
+                continue
+
+            index = int(now // window)
+            counters.append((limit, window, now - index * window,
+                             counter_key(self.scope, name, value, window, index),
+                             counter_key(self.scope, name, value, window, index - 1)))
+
+        if not counters:
+            return 0
+
+        previous = cache.get_many([c[4] for c in counters])
+
+        retry_after = 0
+        for limit, window, elapsed, current, previous_key in counters:
+            # Kept for two windows, since it is the previous counter during the next one
+            count = increment(current, 2 * window)
+            estimate = previous.get(previous_key, 0) * (1 - elapsed / window) + count
+            if estimate > limit:
+                retry_after = max(retry_after, int(window - elapsed) + 1)
+
+        if retry_after:
+            for counter in counters:
+                try:
+                    cache.decr(counter[3])
+                except ValueError:
+                    pass
+
+        return retry_after
+
+def too_many_requests(retry_after):
+    response = HttpResponse("Trop de demandes : veuillez réessayer plus tard.",
+                            status=429,
+                            content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(retry_after)
+    return response
+
+class RateLimitMixin:
+    # Rate limits the POST requests of a class-based view, see settings.RATE_LIMITS[rate_limit_scope]
+    rate_limit_scope = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if settings.RATE_LIMIT_ENABLED and request.method == "POST":
+            retry_after = RateLimiter(self.rate_limit_scope).check(request, kwargs)
+            if retry_after:
+                return too_many_requests(retry_after)
+
+        return super().dispatch(request, *args, **kwargs)
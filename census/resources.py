@@ -0,0 +1,24 @@
+from import_export import fields, resources
+from import_export.widgets import ForeignKeyWidget
+
+from census.models import Municipality, Farm, MarketGardener
+
+class MunicipalityResource(resources.ModelResource):
+
+    class Meta:
+        model = Municipality
+
+class MarketGardenerResource(resources.ModelResource):
+
+    class Meta:
+        model = MarketGardener
+
+class FarmResource(resources.ModelResource):
+    municipality = fields.Field(
+        column_name='municipality',
+        attribute='municipality',
+        widget=ForeignKeyWidget(Municipality, field='name'))
+
+    class Meta:
+        model = Farm
+        fields = ('municipality',)
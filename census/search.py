@@ -0,0 +1,175 @@
+import functools
+
+from django.contrib.admin.views.main import ORDER_VAR
+from django.db import connection
+from django.db.models import Value, FloatField
+from django.db.models.expressions import RawSQL
+
+from census.models import Farm, MarketGardener, SearchDocument
+from census.text import fold, words
+
+"""
+    Full-text search of the admin search boxes.
+
+    Each farm and market gardener has a SearchDocument holding its folded text (no case, no accents), kept up to date
+    by census.signals. The documents are indexed by the database, depending on what it offers (see migration 0027):
+
+    - SQLite: an FTS5 table kept in sync by triggers, ranked by bm25,
+    - PostgreSQL: a GIN index on the tsvector of the documents, ranked by ts_rank, plus a trigram index (if the
+      pg_trgm extension is available) to find misspelled words,
+    - anything else: a substring search on the documents (a scan, but of a single table, without joins).
+
+    Every word of the search must match (as a prefix). The results are annotated with `search_rank`, higher is better.
+"""
+
+"""
+    Documents
+"""
+def farm_document(farm):
+    parts = [farm.name, farm.address, farm.municipality.name, farm.email]
+    # all() to use the prefetched market gardeners, if any
+    for gardener in farm.marketgardener_set.all():
+        parts += [gardener.firstname, gardener.lastname, gardener.email]
+
+    return fold(" ".join(part for part in parts if part))
+
+def gardener_document(gardener):
+    parts = [gardener.firstname, gardener.lastname, gardener.email, gardener.farm.name]
+    return fold(" ".join(part for part in parts if part))
+
+def index(kind, pk, content):
+    SearchDocument.objects.update_or_create(kind=kind, object_id=pk, defaults={"content": content})
+
+def unindex(kind, pk):
+    SearchDocument.objects.filter(kind=kind, object_id=pk).delete()
+
+def index_farm(farm_id):
+    farm = Farm.objects.select_related("municipality").filter(pk=farm_id).first()
+    if farm is not None:
+        index("farm", farm.pk, farm_document(farm))
+
+def index_gardener(gardener):
+    index("gardener", gardener.pk, gardener_document(gardener))
+
+def index_farms(pks):
+    # Bulk version of index_farm(), also reindexes the market gardeners of the farms (their documents contain the
+    # name of their farm)
+    pks = list(pks)
+
+    farms = Farm.objects.filter(pk__in=pks).select_related("municipality").prefetch_related("marketgardener_set")
+    gardeners = MarketGardener.objects.filter(farm__in=pks).select_related("farm")
+
+    SearchDocument.objects.filter(kind="farm", object_id__in=pks).delete()
+    SearchDocument.objects.filter(kind="gardener", object_id__in=gardeners.values("pk")).delete()
+
+    SearchDocument.objects.bulk_create(
+        [SearchDocument(kind="farm", object_id=farm.pk, content=farm_document(farm)) for farm in farms] +
+        [SearchDocument(kind="gardener", object_id=gardener.pk, content=gardener_document(gardener))
+         for gardener in gardeners],
+        batch_size=500)
+
+def rebuild():
+    SearchDocument.objects.all().delete()
+    index_farms(Farm.objects.values_list("pk", flat=True))
+
+"""
+    Backends: search(queryset, kind, words) filters the queryset and annotates it with search_rank
+"""
+class SubstringBackend:
+    def search(self, queryset, kind, terms):
+        documents = SearchDocument.objects.filter(kind=kind)
+        for term in terms:
+            documents = documents.filter(content__contains=term)
+
+        return (queryset.filter(pk__in=documents.values("object_id"))
+                .annotate(search_rank=Value(0.0, output_field=FloatField())))
+
+class SQLiteBackend:
+    def search(self, queryset, kind, terms):
+        # "ferme"* "namur"*: every word, as a prefix
+        match = " ".join('"{0}"*'.format(term) for term in terms)
+
+        ids = RawSQL("SELECT d.object_id FROM census_search_fts "
+                     "JOIN census_searchdocument d ON d.id = census_search_fts.rowid "
+                     "WHERE census_search_fts MATCH %s AND d.kind = %s", (match, kind))
+
+        # bm25() is lower for better matches
+        rank = RawSQL("SELECT -bm25(census_search_fts) FROM census_search_fts "
+                      "JOIN census_searchdocument d ON d.id = census_search_fts.rowid "
+                      "WHERE census_search_fts MATCH %s AND d.kind = %s AND d.object_id = {0}.{1}"
+                      .format(queryset.model._meta.db_table, queryset.model._meta.pk.column),
+                      (match, kind), output_field=FloatField())
+
+        return queryset.filter(pk__in=ids).annotate(search_rank=rank)
+
+class PostgresBackend:
+    def __init__(self, trigram):
+        self.trigram = trigram
+
+    def search(self, queryset, kind, terms):
+        tsquery = " & ".join(term + ":*" for term in terms)
+        text = " ".join(terms)
+        outer = "{0}.{1}".format(queryset.model._meta.db_table, queryset.model._meta.pk.column)
+
+        if self.trigram:
+            # Also match misspelled words (word_similarity above pg_trgm.word_similarity_threshold)
+            where = "(to_tsvector('simple', content) @@ to_tsquery('simple', %s) OR %s <%% content)"
+            score = "ts_rank(to_tsvector('simple', content), to_tsquery('simple', %s)) + word_similarity(%s, content)"
+            params = (tsquery, text)
+        else:
+            where = "to_tsvector('simple', content) @@ to_tsquery('simple', %s)"
+            score = "ts_rank(to_tsvector('simple', content), to_tsquery('simple', %s))"
+            params = (tsquery,)
+
+        ids = RawSQL("SELECT object_id FROM census_searchdocument WHERE kind = %s AND " + where, (kind,) + params)
+        rank = RawSQL("SELECT " + score + " FROM census_searchdocument WHERE kind = %s AND object_id = " + outer,
+                      params + (kind,), output_field=FloatField())
+
+        return queryset.filter(pk__in=ids).annotate(search_rank=rank)
+
+@functools.cache
+def get_backend():
+    # Depends on what migration 0027 could install in the database
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            if "census_search_fts" in connection.introspection.table_names(cursor):
+                return SQLiteBackend()
+        elif connection.vendor == "postgresql":
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            return PostgresBackend(trigram=cursor.fetchone() is not None)
+
+    return SubstringBackend()
+
+def search(queryset, kind, text):
+    terms = words(text)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return get_backend().search(queryset, kind, terms)
+
+"""
+    Admin
+"""
+class RankedChangeListMixin:
+    # Without an explicit ordering (a click on a column), the results of a search are sorted by relevance
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if "search_rank" in queryset.query.annotations and not self.params.get(ORDER_VAR):
+            queryset = queryset.order_by("-search_rank", "-pk")
+        return queryset
+
+@functools.cache
+def ranked_changelist(changelist_class):
+    return type("Ranked" + changelist_class.__name__, (RankedChangeListMixin, changelist_class), {})
+
+class FullTextSearchMixin:
+    # For a ModelAdmin, replaces the icontains lookups on search_fields (which only enable the search box)
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search(queryset, self.search_kind, search_term), False
+
+    def get_changelist(self, request, **kwargs):
+        return ranked_changelist(super().get_changelist(request, **kwargs))
@@ -0,0 +1,74 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from census import changelog, indicators, search, statistics, terms
+from census.models import Farm, MarketGardener, Municipality, ContactEmail
+
+"""
+    Bulk operations (QuerySet.update(), bulk_create(), ...) don't send these signals: run the matching rebuild
+    command afterwards (rebuild_contacts, rebuild_search_index, rebuild_term_index, rebuild_indicators), and log the
+    changes of the farms with census.changelog.update() or record().
+"""
+
+@receiver(pre_save, sender=Farm)
+def farm_saving(sender, instance, raw=False, **kwargs):
+    # State before the save, for the change log
+    if not raw and instance.pk is not None and not instance._state.adding:
+        instance._changelog_before = changelog.database_states([instance.pk]).get(instance.pk)
+
+@receiver(post_save, sender=Farm)
+def farm_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        before = getattr(instance, "_changelog_before", None)
+
+        # Only when the answers changed
+        if before is None or any(before.get(field) != getattr(instance, field) for field in terms.FIELDS):
+            terms.index_farm(instance)
+
+        if created:
+            changelog.record_created([instance])
+        elif before is not None:
+            changelog.record({instance.pk: changelog.diff(before, changelog.instance_state(instance))})
+        instance._changelog_before = None
+
+        ContactEmail.sync_farm(instance)
+
+        search.index_farm(instance.pk)
+        # The documents of the market gardeners contain the name of their farm
+        for gardener in instance.marketgardener_set.select_related("farm"):
+            search.index_gardener(gardener)
+
+@receiver(changelog.farms_logged, sender=Farm)
+def farms_logged(sender, diffs, **kwargs):
+    # Changes logged by census.changelog, whichever way they were made
+    indicators.farms_changed(diffs)
+    statistics.bump_version()
+
+@receiver(post_delete, sender=Farm)
+def farm_deleted(sender, instance, **kwargs):
+    search.unindex("farm", instance.pk)
+    indicators.refresh([instance.municipality_id])
+    statistics.bump_version()
+
+@receiver(post_save, sender=MarketGardener)
+def gardener_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ContactEmail.sync_gardener(instance)
+
+        search.index_gardener(instance)
+        search.index_farm(instance.farm_id)
+
+@receiver(post_delete, sender=MarketGardener)
+def gardener_deleted(sender, instance, **kwargs):
+    search.unindex("gardener", instance.pk)
+    search.index_farm(instance.farm_id)
+
+@receiver(post_save, sender=Municipality)
+def municipality_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ContactEmail.sync_municipality(instance)
+        indicators.refresh([instance.pk])
+        statistics.bump_version()
+
+        for farm_id in instance.farm_set.values_list("pk", flat=True):
+            search.index_farm(farm_id)
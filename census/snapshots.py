@@ -0,0 +1,171 @@
+import datetime
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models import Count
+
+from census.models import Farm, MarketGardener, Municipality
+
+"""
+    Yearly snapshots of the census.
+
+    At the end of each campaign, `manage.py snapshot` freezes the farms and municipalities in a compressed columnar
+    file (numpy .npz, one array per column) in SNAPSHOT_DIR, named after the year. Columns are typed: decimals are
+    float64 with NaN for missing values, years are int16 with 0 for missing values, choices are int8 codes (-1 for
+    missing values) with the list of the categories stored next to them.
+
+    load() reads a snapshot without touching the database, and compare() diffs two of them.
+"""
+
+MISSING_YEAR = 0
+
+def snapshot_path(year):
+    return os.path.join(settings.SNAPSHOT_DIR, "census-{0}.npz".format(year))
+
+def available_years():
+    if not os.path.isdir(settings.SNAPSHOT_DIR):
+        return []
+    return sorted(int(name[7:11]) for name in os.listdir(settings.SNAPSHOT_DIR)
+                  if name.startswith("census-") and name.endswith(".npz") and name[7:11].isdigit())
+
+def codes(values, categories):
+    index = {category: i for i, category in enumerate(categories)}
+    return np.array([index.get(value, -1) for value in values], dtype=np.int8)
+
+def floats(values):
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+def years(values):
+    return np.array([MISSING_YEAR if value is None else value for value in values], dtype=np.int16)
+
+def strings(values):
+    return np.array(["" if value is None else str(value) for value in values], dtype=np.str_)
+
+"""
+    Writing
+"""
+def collect():
+    # Columns of the census, read with one query per table
+    farm_rows = list(Farm.objects.order_by("pk").values_list(
+        "pk", "name", "municipality_id", "area", "FTE", "FTEv", "production", "start_year", "end_year", "public",
+        "consent", "edited_by_user"))
+    municipality_rows = list(Municipality.objects.order_by("pk").values_list("pk", "name", "province", "area",
+                                                                             "population"))
+    gardeners = dict(MarketGardener.objects.values("farm").annotate(count=Count("pk")).values_list("farm", "count"))
+
+    farm = list(zip(*farm_rows)) or [()] * 12
+    municipality = list(zip(*municipality_rows)) or [()] * 5
+    productions = list(Farm.PRODUCTION)
+    provinces = list(Municipality.PROVINCES)
+
+    return {
+        "farm_id": np.array(farm[0], dtype=np.int64),
+        "farm_name": strings(farm[1]),
+        "farm_municipality": np.array(farm[2], dtype=np.int64),
+        "farm_area": floats(farm[3]),
+        "farm_fte": floats(farm[4]),
+        "farm_ftev": floats(farm[5]),
+        "farm_production": codes(farm[6], productions),
+        "farm_start_year": years(farm[7]),
+        "farm_end_year": years(farm[8]),
+        "farm_public": np.array(farm[9], dtype=np.bool_),
+        "farm_consent": np.array(farm[10], dtype=np.bool_),
+        "farm_edited_by_user": np.array(farm[11], dtype=np.bool_),
+        "farm_gardeners": np.array([gardeners.get(pk, 0) for pk in farm[0]], dtype=np.int16),
+        "municipality_id": np.array(municipality[0], dtype=np.int64),
+        "municipality_name": strings(municipality[1]),
+        "municipality_province": codes(municipality[2], provinces),
+        "municipality_area": floats(municipality[3]),
+        "municipality_population": np.array(municipality[4], dtype=np.int64),
+        "productions": np.array(productions, dtype=np.str_),
+        "provinces": np.array(provinces, dtype=np.str_),
+    }
+
+def write_snapshot(year, path=None):
+    path = path or snapshot_path(year)
+    columns = collect()
+    meta = {"year": year, "created": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+
+    # Written next to the final file and renamed, so that a snapshot is never half written
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".npz", delete=False) as f:
+        try:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), **columns)
+        except BaseException:
+            # e.g. disk full: don't leave the partial file behind
+            f.close()
+            os.remove(f.name)
+            raise
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+    return path, len(columns["farm_id"])
+
+"""
+    Reading
+"""
+class Snapshot:
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.columns = {name: data[name] for name in data.files}
+
+        meta = json.loads(str(self.columns.pop("meta")))
+        self.year = meta["year"]
+        self.created = meta["created"]
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(self.columns["farm_id"])
+
+    def active(self):
+        # Farms still running at the time of the snapshot
+        return self.columns["farm_end_year"] == MISSING_YEAR
+
+    def production(self, code):
+        return self.columns["productions"][code] if code >= 0 else None
+
+def load(year):
+    return Snapshot(snapshot_path(year))
+
+class SnapshotDiff:
+    def __init__(self, before, after):
+        self.before = before
+        self.after = after
+
+        ids_before, ids_after = before["farm_id"], after["farm_id"]
+        self.common, self.index_before, self.index_after = np.intersect1d(ids_before, ids_after,
+                                                                          assume_unique=True, return_indices=True)
+
+        # In the census of the second year only
+        self.new = np.setdiff1d(ids_after, ids_before, assume_unique=True)
+        # Deleted from the database since
+        self.removed = np.setdiff1d(ids_before, ids_after, assume_unique=True)
+        # Still in the census, with an end year set since
+        self.stopped = self.common[before.active()[self.index_before] & ~after.active()[self.index_after]]
+
+    def changes(self, column, tolerance=0):
+        # (ids, old values, new values) of the farms of both years whose column changed
+        old = self.before[column][self.index_before]
+        new = self.after[column][self.index_after]
+
+        if old.dtype.kind == "f":
+            changed = ~(np.isclose(old, new, atol=tolerance, rtol=0) | (np.isnan(old) & np.isnan(new)))
+        else:
+            changed = old != new
+
+        return self.common[changed], old[changed], new[changed]
+
+    def totals(self, column):
+        # Sum of a column over the active farms of each year
+        return (float(np.nansum(self.before[column][self.before.active()])),
+                float(np.nansum(self.after[column][self.after.active()])))
+
+def compare(year_before, year_after):
+    return SnapshotDiff(load(year_before), load(year_after))
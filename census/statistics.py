@@ -0,0 +1,176 @@
+import datetime
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from census.models import Farm, Municipality
+from census.snapshots import codes, floats
+
+"""
+    Statistics of the census: distributions of the area, labour (FTE, FTEv, FTE per ha) and production mode of the
+    active farms (without end year), for the whole census, per province and per municipality.
+
+    The columns are read with one query into numpy arrays, then every aggregate is computed for all the groups at once:
+    the values are sorted by (group, value) and the quantiles of each group are read at the matching positions of the
+    sorted array, sums and counts come from np.bincount().
+
+    The result is cached under the current data version, which is bumped by every change of a farm (the farms_logged
+    signal of census.changelog, whatever the way it was made), the deletion of a farm and the change of a municipality
+    (name or province): the statistics are computed again only when the data changed. With a cache that isn't shared
+    between the workers (the default LocMemCache), the other workers only see a change after
+    settings.STATISTICS_CACHE_TIMEOUT.
+"""
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# Distributions computed for each group (FTE_per_ha is computed per farm)
+COLUMNS = ("area", "FTE", "FTEv", "FTE_per_ha")
+
+VERSION_KEY = "statistics:version"
+
+"""
+    Data version
+"""
+def data_version():
+    # Initialized with the time, so that a version lost by the cache doesn't bring old results back
+    cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+    return cache.get(VERSION_KEY) or 0
+
+def bump_version():
+    # After the commit of the current transaction (right away outside of one): bumped before, a dashboard computed in
+    # between from the old data would be cached under the new version
+    transaction.on_commit(increment_version)
+
+def increment_version():
+    cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted in between
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+"""
+    Computation
+"""
+class CensusColumns:
+    def __init__(self):
+        rows = list(Farm.objects.filter(end_year__isnull=True)
+                    .values_list("municipality_id", "municipality__name", "municipality__province", "area", "FTE",
+                                 "FTEv", "production")
+                    .order_by("municipality_id"))
+        columns = list(zip(*rows)) or [()] * 7
+
+        self.provinces = list(Municipality.PROVINCES)
+        self.productions = list(Farm.PRODUCTION)
+
+        self.municipality = np.array(columns[0], dtype=np.int64)
+        self.municipality_names = dict(zip(columns[0], columns[1]))
+        self.municipality_provinces = dict(zip(columns[0], columns[2]))
+        self.province = codes(columns[2], self.provinces)
+        self.production = codes(columns[6], self.productions)
+
+        self.values = {"area": floats(columns[3]), "FTE": floats(columns[4]), "FTEv": floats(columns[5])}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = self.values["FTE"] / self.values["area"]
+        # No ratio for an area of 0
+        self.values["FTE_per_ha"] = np.where(np.isfinite(ratio), ratio, np.nan)
+
+    def __len__(self):
+        return len(self.municipality)
+
+def grouped_quantiles(groups, values, count):
+    # (quantiles (count x len(QUANTILES)), number of values, sum) of the values of each group 0..count - 1,
+    # ignoring the missing values, with the linear interpolation of np.quantile()
+    known = ~np.isnan(values)
+    groups, values = groups[known], values[known]
+
+    sizes = np.bincount(groups, minlength=count)
+    sums = np.bincount(groups, weights=values, minlength=count)
+
+    values = values[np.lexsort((values, groups))]
+    starts = np.cumsum(sizes) - sizes
+
+    result = np.full((count, len(QUANTILES)), np.nan)
+    filled = sizes > 0
+    for k, q in enumerate(QUANTILES):
+        position = starts[filled] + q * (sizes[filled] - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[filled, k] = values[low] + (values[high] - values[low]) * (position - low)
+
+    return result, sizes, sums
+
+def number(value):
+    # Plain float for the cache and JSON, None for NaN
+    return None if np.isnan(value) else round(float(value), 4)
+
+def summarize(census, groups, count):
+    # One dictionary per group 0..count - 1
+    farms = np.bincount(groups, minlength=count)
+    rows = [{"farms": int(n)} for n in farms]
+
+    for column in COLUMNS:
+        quantiles, sizes, sums = grouped_quantiles(groups, census.values[column], count)
+        for i, row in enumerate(rows):
+            row[column] = {
+                "count": int(sizes[i]),
+                "sum": number(sums[i]),
+                "mean": number(sums[i] / sizes[i]) if sizes[i] else None,
+                "quantiles": [number(value) for value in quantiles[i]],
+                "median": number(quantiles[i][QUANTILES.index(0.5)]),
+            }
+
+    # Labour intensity of the group: total FTE over total area, of the farms with both
+    both = ~np.isnan(census.values["FTE"]) & ~np.isnan(census.values["area"])
+    fte = np.bincount(groups[both], weights=census.values["FTE"][both], minlength=count)
+    area = np.bincount(groups[both], weights=census.values["area"][both], minlength=count)
+    for i, row in enumerate(rows):
+        row["FTE_per_ha_overall"] = number(fte[i] / area[i]) if area[i] > 0 else None
+
+    # Production modes, the last one being "unknown" (code -1)
+    labels = census.productions + [None]
+    production = np.where(census.production < 0, len(census.productions), census.production)
+    breakdown = np.bincount(groups * len(labels) + production, minlength=count * len(labels))
+    breakdown = breakdown.reshape(count, len(labels))
+    for i, row in enumerate(rows):
+        row["production"] = [{"mode": label, "farms": int(n), "share": number(n / farms[i]) if farms[i] else None}
+                             for label, n in zip(labels, breakdown[i])]
+
+    return rows
+
+def compute():
+    census = CensusColumns()
+
+    total = summarize(census, np.zeros(len(census), dtype=np.int64), 1)[0]
+
+    # Provinces not in Municipality.PROVINCES (code -1, e.g. from an import) as the last group, named None
+    names = census.provinces + [None]
+    groups = np.where(census.province < 0, len(census.provinces), census.province).astype(np.int64)
+    provinces = summarize(census, groups, len(names))
+    for name, row in zip(names, provinces):
+        row["name"] = name
+
+    ids, groups = np.unique(census.municipality, return_inverse=True)
+    municipalities = summarize(census, groups.astype(np.int64), len(ids))
+    for pk, row in zip(ids.tolist(), municipalities):
+        row.update(id=pk, name=census.municipality_names[pk], province=census.municipality_provinces[pk])
+
+    return {
+        "computed": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "quantiles": list(QUANTILES),
+        "total": total,
+        "provinces": [row for row in provinces if row["farms"]],
+        "municipalities": sorted(municipalities, key=lambda row: (row["province"], row["name"])),
+    }
+
+def statistics():
+    key = "statistics:{0}".format(data_version())
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, timeout=settings.STATISTICS_CACHE_TIMEOUT)
+    return result
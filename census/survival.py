@@ -0,0 +1,145 @@
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+
+from census import statistics
+from census.models import Farm, Municipality
+from census.snapshots import codes
+
+"""
+    Survival of the farms, from their year of installation (start_year) and of cessation (end_year).
+
+    The duration of a farm is end_year - start_year if it stopped, and CENSUS_YEAR - start_year otherwise (it is then
+    censored: still running when last observed). Farms without start_year, or with inconsistent years (installation
+    after the census year, cessation before the installation), are left out.
+
+    The Kaplan-Meier estimator is computed for all the groups (provinces or production modes) at once: the numbers of
+    cessations and of exits (cessations and censored farms) per group and per year of activity are counted with one
+    np.bincount() each, the farms at risk are the reversed cumulative sums of the exits, and the survival is the
+    cumulative product of 1 - cessations / farms at risk. The 95 % confidence interval uses Greenwood's formula.
+
+    The yearly cohorts (installations, cessations and active farms per calendar year, and the fate of each
+    installation cohort) are counted the same way. Results are cached until the next change of the data (see
+    census.statistics.data_version()).
+"""
+
+# Survival reported in the tables, in years of activity
+MILESTONES = (1, 3, 5, 10)
+
+MISSING = -1
+
+GROUPS = {
+    "province": "Province",
+    "production": "Mode de production",
+}
+
+class Durations:
+    def __init__(self, rows, year):
+        # rows: (start_year, end_year, production, province)
+        columns = list(zip(*rows)) or [()] * 4
+        start = np.array([MISSING if value is None else value for value in columns[0]], dtype=np.int64)
+        end = np.array([MISSING if value is None else value for value in columns[1]], dtype=np.int64)
+
+        self.categories = {"production": list(Farm.PRODUCTION), "province": list(Municipality.PROVINCES)}
+        self.groups = {"production": codes(columns[2], self.categories["production"]).astype(np.int64),
+                       "province": codes(columns[3], self.categories["province"]).astype(np.int64)}
+
+        # A cessation announced for after the census year hasn't happened yet
+        stopped = (end != MISSING) & (end <= year)
+        valid = (start != MISSING) & (start <= year) & (~stopped | (end >= start))
+        self.excluded = int((~valid).sum())
+
+        self.start = start[valid]
+        self.end = end[valid]
+        self.event = stopped[valid]
+        self.duration = np.where(self.event, self.end - self.start, year - self.start)
+        self.groups = {name: group[valid] for name, group in self.groups.items()}
+        self.year = year
+
+def kaplan_meier(duration, event, groups, count):
+    # {"years", "at_risk", "events", "survival", "low", "high"} of each group 0..count - 1, for the years of activity
+    # 0..max(duration)
+    length = int(duration.max()) + 1 if len(duration) else 1
+
+    exits = np.bincount(groups * length + duration, minlength=count * length).reshape(count, length)
+    events = np.bincount(groups[event] * length + duration[event], minlength=count * length).reshape(count, length)
+    at_risk = np.cumsum(exits[:, ::-1], axis=1)[:, ::-1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hazard = np.where(at_risk > 0, events / at_risk, 0)
+        survival = np.cumprod(1 - hazard, axis=1)
+        # Greenwood: var(S) = S² Σ d / (n (n - d)), on the log scale for bounds within [0, 1]
+        terms = np.where(at_risk > events, events / (at_risk * (at_risk - events)), 0)
+        spread = 1.96 * np.sqrt(np.cumsum(terms, axis=1))
+        low = np.clip(survival * np.exp(-spread), 0, 1)
+        high = np.clip(survival * np.exp(spread), 0, 1)
+
+    curves = []
+    for i in range(count):
+        # Up to the last year with farms at risk
+        last = int(np.nonzero(at_risk[i])[0].max()) + 1 if at_risk[i].any() else 0
+        below = np.nonzero(survival[i, :last] <= 0.5)[0]
+        curves.append({
+            "farms": int(exits[i].sum()),
+            "stopped": int(events[i].sum()),
+            "years": list(range(last)),
+            "at_risk": at_risk[i, :last].tolist(),
+            "events": events[i, :last].tolist(),
+            "survival": [round(float(value), 4) for value in survival[i, :last]],
+            "low": [round(float(value), 4) for value in low[i, :last]],
+            "high": [round(float(value), 4) for value in high[i, :last]],
+            "median": int(below[0]) if len(below) else None,
+            # Survival after each of MILESTONES years, None after the last year observed
+            "milestones": [round(float(survival[i, years]), 4) if years < last else None for years in MILESTONES],
+        })
+
+    return curves
+
+def cohorts(durations):
+    # Installations, cessations and active farms at the end of each calendar year, and for each installation cohort
+    # the farms still active
+    if not len(durations.start):
+        return []
+
+    first = int(durations.start.min())
+    length = durations.year - first + 1
+
+    installed = np.bincount(durations.start - first, minlength=length)
+    stopped = np.bincount(durations.end[durations.event] - first, minlength=length)
+    active = np.cumsum(installed) - np.cumsum(stopped)
+    survivors = np.bincount(durations.start[~durations.event] - first, minlength=length)
+
+    return [{"year": first + i, "installed": int(installed[i]), "stopped": int(stopped[i]), "active": int(active[i]),
+             "still_active": int(survivors[i])}
+            for i in range(length)]
+
+def analyze(year=None):
+    year = year or settings.CENSUS_YEAR
+    durations = Durations(Farm.objects.values_list("start_year", "end_year", "production",
+                                                   "municipality__province"), year)
+
+    result = {
+        "year": year,
+        "excluded": durations.excluded,
+        "all": kaplan_meier(durations.duration, durations.event, np.zeros(len(durations.duration), dtype=np.int64),
+                            1)[0],
+        "cohorts": cohorts(durations),
+    }
+
+    for name in GROUPS:
+        # Unknown values (code -1) as the last group
+        categories = durations.categories[name] + [None]
+        groups = np.where(durations.groups[name] < 0, len(categories) - 1, durations.groups[name])
+        curves = kaplan_meier(durations.duration, durations.event, groups, len(categories))
+        result[name] = [dict(curve, name=category) for category, curve in zip(categories, curves) if curve["farms"]]
+
+    return result
+
+def survival():
+    key = "survival:{0}".format(statistics.data_version())
+    result = cache.get(key)
+    if result is None:
+        result = analyze()
+        cache.set(key, result, timeout=settings.STATISTICS_CACHE_TIMEOUT)
+    return result
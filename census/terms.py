@@ -0,0 +1,129 @@
+import itertools
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from census import statistics
+from census.models import Farm, FarmTerm
+from census.text import tokens
+
+"""
+    Analysis of the free-text answers of the farms (research priorities, reasons for not using cover crops).
+
+    The answers are split into terms by census.text.tokens() (no case, no accents, no stop words, light stemming) and
+    each farm has one FarmTerm per field and term, with the number of occurrences. The index is maintained per farm:
+    census.signals reindexes a farm when one of its answers changed, the importer reindexes the farms it wrote, and
+    `manage.py rebuild_term_index` rebuilds everything.
+
+    The analysis (top terms, TF-IDF keywords per province, co-occurring terms) only reads the index, with one query per
+    field, and is cached until the next change of the data (see census.statistics.data_version()).
+"""
+
+FIELDS = list(FarmTerm.FIELDS)
+
+# Terms used by fewer farms are left out of the keywords and co-occurrences (typos, one-off words)
+MIN_FARMS = 2
+
+# Co-occurrences are counted among the most frequent terms only
+COOCCURRENCE_TERMS = 50
+
+"""
+    Index
+"""
+def document_terms(text):
+    # {term: (occurrences, most frequent word)}
+    counts, forms = Counter(), defaultdict(Counter)
+    for term, word in tokens(text or ""):
+        counts[term] += 1
+        forms[term][word] += 1
+    return {term: (count, forms[term].most_common(1)[0][0]) for term, count in counts.items()}
+
+def farm_terms(farm):
+    return [FarmTerm(farm_id=farm.pk, field=field, term=term[:100], word=word[:100], count=min(count, 32767))
+            for field in FIELDS for term, (count, word) in document_terms(getattr(farm, field)).items()]
+
+def index_farm(farm):
+    with transaction.atomic():
+        FarmTerm.objects.filter(farm_id=farm.pk).delete()
+        FarmTerm.objects.bulk_create(farm_terms(farm))
+
+def index_farms(pks):
+    pks = list(pks)
+    farms = Farm.objects.filter(pk__in=pks).only("pk", *FIELDS)
+
+    with transaction.atomic():
+        FarmTerm.objects.filter(farm__in=pks).delete()
+        FarmTerm.objects.bulk_create([term for farm in farms for term in farm_terms(farm)], batch_size=500)
+
+def rebuild(chunk_size=1000):
+    FarmTerm.objects.all().delete()
+    pks = Farm.objects.order_by("pk").values_list("pk", flat=True).iterator()
+    while chunk := list(itertools.islice(pks, chunk_size)):
+        index_farms(chunk)
+
+"""
+    Analysis
+"""
+def analyze(field, limit=30):
+    rows = FarmTerm.objects.filter(field=field).values_list("farm_id", "term", "word", "count",
+                                                             "farm__municipality__province")
+
+    farms = defaultdict(set)                    # {term: farms}
+    occurrences = Counter()                     # {term: occurrences}
+    forms = defaultdict(Counter)                # {term: {word: occurrences}}
+    provinces = defaultdict(Counter)            # {province: {term: occurrences}}
+    documents = defaultdict(set)                # {farm: terms}
+    province_farms = defaultdict(set)           # {province: farms}
+    for farm, term, word, count, province in rows:
+        farms[term].add(farm)
+        occurrences[term] += count
+        forms[term][word] += count
+        provinces[province][term] += count
+        documents[farm].add(term)
+        province_farms[province].add(farm)
+
+    total = len(documents)
+    words = {term: counter.most_common(1)[0][0] for term, counter in forms.items()}
+    frequent = sorted((term for term in farms if len(farms[term]) >= MIN_FARMS),
+                      key=lambda term: (-len(farms[term]), -occurrences[term], term))
+
+    top = [{"term": term, "word": words[term], "farms": len(farms[term]), "occurrences": occurrences[term],
+            "share": len(farms[term]) / total}
+           for term in frequent[:limit]]
+
+    # TF-IDF of the terms of each province: frequency of the term in the answers of the province, weighted by the
+    # inverse of the share of the farms (of all provinces) that use it
+    keywords = []
+    for province, counts in sorted(provinces.items()):
+        length = sum(counts.values())
+        scores = {term: count / length * math.log(total / len(farms[term]))
+                  for term, count in counts.items() if len(farms[term]) >= MIN_FARMS}
+        best = sorted(scores, key=lambda term: (-scores[term], term))[:10]
+        keywords.append({"province": province, "farms": len(province_farms[province]),
+                         "keywords": [{"term": term, "word": words[term], "score": round(scores[term], 4)}
+                                      for term in best if scores[term] > 0]})
+
+    # Pairs of frequent terms used by the same farms, by Jaccard index of their sets of farms
+    common = set(frequent[:COOCCURRENCE_TERMS])
+    pairs = Counter()
+    for terms in documents.values():
+        pairs.update(itertools.combinations(sorted(terms & common), 2))
+
+    cooccurrences = sorted(
+        ({"words": [words[a], words[b]], "farms": count, "jaccard": round(count / len(farms[a] | farms[b]), 4)}
+         for (a, b), count in pairs.items() if count >= MIN_FARMS),
+        key=lambda pair: (-pair["jaccard"], -pair["farms"], pair["words"]))[:limit]
+
+    return {"field": field, "farms": total, "terms": len(farms), "top": top, "keywords": keywords,
+            "cooccurrences": cooccurrences}
+
+def analysis(field):
+    key = "terms:{0}:{1}".format(field, statistics.data_version())
+    result = cache.get(key)
+    if result is None:
+        result = analyze(field)
+        cache.set(key, result, timeout=settings.STATISTICS_CACHE_TIMEOUT)
+    return result
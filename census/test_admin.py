@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .admin import FarmAdmin
+from .models import Farm, Municipality
+
+class FarmChangelistTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_superuser("admin", "admin@example.org", "admin")
+
+        municipalities = [Municipality.objects.create(name="Commune {0}".format(i),
+                                                      province="Namur",
+                                                      area=50,
+                                                      population=10000)
+                          for i in range(5)]
+
+        for i in range(60):
+            Farm.objects.create(name="Ferme {0}".format(i),
+                                municipality=municipalities[i % 5],
+                                email="ferme{0}@example.org".format(i),
+                                phone="+32470{0:06d}".format(i),
+                                research_priorities="Le désherbage")
+
+    def changelist_queries(self, per_page):
+        self.client.login(username="admin", password="admin")
+
+        with mock.patch.object(FarmAdmin, "list_per_page", per_page), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:census_farm_changelist"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cl"].result_list), per_page)
+        self.assertContains(response, "Commune 4")
+        self.assertContains(response, "+32470000059")
+
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.assertEqual(self.changelist_queries(5), self.changelist_queries(50))
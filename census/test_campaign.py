@@ -0,0 +1,93 @@
+from django.core import mail
+from django.test import TestCase
+
+from .campaign import CampaignSender, TokenBucket
+from .delivery import send_email, sent_last_day
+from .models import CampaignDelivery, Farm, Municipality
+
+class Clock:
+    # Fake monotonic clock, advanced by the fake sleep
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TokenBucketTestCase(TestCase):
+    def test_bucket(self):
+        clock = Clock()
+        bucket = TokenBucket("test", rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+        # The burst is consumed without waiting
+        for _ in range(3):
+            bucket.consume()
+        self.assertEqual(clock.sleeps, [])
+
+        # Then one token every 1 / rate seconds
+        self.assertEqual(bucket.take(), 0.5)
+        bucket.consume()
+        self.assertEqual(clock.sleeps, [0.5])
+
+        # Another sender (next chunk of the job, another worker) draws from the same bucket: no new burst
+        other = TokenBucket("test", rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+        other.consume()
+        self.assertEqual(clock.sleeps, [0.5, 0.5])
+
+        # Refilled up to the capacity only
+        clock.now += 60
+        self.assertEqual(other.take(3), 0)
+        self.assertEqual(bucket.take(1), 0.5)
+
+class CampaignSenderTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+        cls.farms = [Farm.objects.create(name="Ferme {0}".format(i), municipality=namur,
+                                         email="ferme{0}@example.org".format(i))
+                     for i in range(3)]
+        cls.ended = Farm.objects.create(name="Ferme arrêtée", municipality=namur, email="fin@example.org",
+                                        end_year=2020)
+
+    def sender(self, campaign="test", **kwargs):
+        clock = Clock()
+        return CampaignSender("campaign", "https://example.org", campaign=campaign, concurrency=1,
+                              bucket=TokenBucket("test", 1, 1, clock=clock, sleep=clock.sleep), **kwargs)
+
+    def test_run_and_resume(self):
+        report = self.sender().run(Farm.objects.all())
+        self.assertEqual((report.sent, report.skipped, report.failed, report.already_done), (3, 1, 0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(CampaignDelivery.objects.get(farm=self.ended).status, "skipped")
+
+        # A failed delivery is retried, the others are not sent again
+        CampaignDelivery.objects.filter(farm=self.farms[0]).update(status="failed")
+        mail.outbox = []
+        report = self.sender().run(Farm.objects.all())
+        self.assertEqual((report.sent, report.skipped, report.already_done), (1, 0, 3))
+        self.assertEqual([message.to for message in mail.outbox], [["ferme0@example.org"]])
+
+    def test_daily_quota(self):
+        report = self.sender(daily_quota=2).run(Farm.objects.all())
+        self.assertTrue(report.quota_reached)
+        self.assertEqual((report.sent, report.remaining), (2, 2))
+
+        # The quota is shared by all the campaigns and counted over the last 24 hours
+        report = self.sender(daily_quota=2, campaign="reminder").run(Farm.objects.all())
+        self.assertTrue(report.quota_reached)
+        self.assertEqual(report.sent, 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_daily_quota_counts_all_mail(self):
+        # E-mails sent outside the campaigns (edit links, digests...) go through the same account
+        send_email(["someone@example.org"], "Modifier vos fermes", "edit_links", {"links": []})
+        self.assertEqual(sent_last_day(), 1)
+
+        report = self.sender(daily_quota=2).run(Farm.objects.all())
+        self.assertTrue(report.quota_reached)
+        self.assertEqual(report.sent, 1)
+        self.assertEqual(sent_last_day(), 2)
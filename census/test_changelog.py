@@ -0,0 +1,59 @@
+import datetime
+
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from . import changelog
+from .admin import FarmAdmin
+from .models import Farm, FarmChange, Municipality
+
+class ChangeLogTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.municipality = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000)
+        cls.farm = Farm.objects.create(name="Ferme du Tilleul", municipality=cls.municipality, email="a@example.org",
+                                       area=1)
+
+    def test_only_changed_fields_are_logged(self):
+        with changelog.change_source("admin", "alice"):
+            self.farm.area = "2.5"
+            self.farm.save()
+            # No change, nothing logged
+            self.farm.save()
+
+        change = FarmChange.objects.filter(farm=self.farm).latest("sequence")
+        self.assertEqual((change.sequence, change.source, change.actor), (1, "admin", "alice"))
+        self.assertEqual(change.diff, {"area": ["1.00", "2.50"]})
+
+        changelog.update(Farm.objects.filter(pk=self.farm.pk), "action", "bob", public=True)
+        self.assertEqual(FarmChange.objects.filter(farm=self.farm).latest("sequence").diff, {"public": [False, True]})
+
+    def test_admin_import_is_logged_as_import(self):
+        def import_farm(admin, request, **kwargs):
+            self.farm.name = "Ferme importée"
+            self.farm.save()
+
+        request = RequestFactory().post("/")
+        request.user = User(username="carol")
+        with mock.patch("import_export.admin.ImportMixin.process_import", import_farm):
+            FarmAdmin(Farm, site).process_import(request)
+
+        change = FarmChange.objects.filter(farm=self.farm).latest("sequence")
+        self.assertEqual((change.source, change.actor), ("import", "carol"))
+
+    def test_state_at_date(self):
+        dates = []
+        for i in range(changelog.CHECKPOINT_EVERY * 2 + 5):
+            self.farm.name = "Nom {0}".format(i)
+            self.farm.save()
+            dates.append(timezone.now())
+
+        with self.assertNumQueries(2):
+            state = changelog.state_at(self.farm.pk, dates[changelog.CHECKPOINT_EVERY + 3])
+
+        self.assertEqual(state["name"], "Nom {0}".format(changelog.CHECKPOINT_EVERY + 3))
+        self.assertIsNone(changelog.state_at(self.farm.pk, dates[0] - datetime.timedelta(days=1)))
@@ -0,0 +1,61 @@
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .jobs import claim_job, run_job
+from .models import ContactEmail, Farm, Job, MarketGardener, Municipality, normalize_email
+
+class ContactEmailTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000,
+                                                email="Commune@Namur.be ")
+        cls.farm = Farm.objects.create(name="Ferme du Tilleul", municipality=cls.namur, email=" Contact@Tilleul.be")
+        cls.other = Farm.objects.create(name="Autre ferme", municipality=cls.namur, email="autre@example.org")
+        MarketGardener.objects.create(firstname="Alice", farm=cls.other, email="ALICE@example.org")
+        MarketGardener.objects.create(firstname="Alice", lastname="Bis", farm=cls.farm, email="alice@example.org ")
+
+    def test_normalize_email(self):
+        self.assertEqual(normalize_email("  Contact@Tilleul.BE "), "contact@tilleul.be")
+
+    def test_sync_by_signals(self):
+        self.assertEqual(list(ContactEmail.farms_for("CONTACT@tilleul.be")), [self.farm])
+        # Through the market gardeners, once per farm
+        self.assertEqual(set(ContactEmail.farms_for("alice@example.org")), {self.farm, self.other})
+        self.assertTrue(ContactEmail.objects.filter(source="municipality", email="commune@namur.be").exists())
+
+        # Changed address: the old one is forgotten
+        self.farm.email = "nouveau@tilleul.be"
+        self.farm.save()
+        self.assertFalse(ContactEmail.farms_for("contact@tilleul.be").exists())
+        self.assertEqual(list(ContactEmail.farms_for("Nouveau@tilleul.be")), [self.farm])
+
+        self.farm.delete()
+        self.assertEqual(list(ContactEmail.farms_for("alice@example.org")), [self.other])
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class EditLinksViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+        Farm.objects.create(name="Ferme du Tilleul", municipality=namur, email="contact@tilleul.be")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_same_answer_whether_known_or_not(self):
+        responses = [self.client.post(reverse("census:links"), {"email": email}, follow=True)
+                     for email in ("Contact@Tilleul.be", "inconnu@example.org")]
+
+        known, unknown = ([message.message for message in response.context["messages"]] for response in responses)
+        self.assertEqual(known, unknown)
+        self.assertEqual(Job.objects.filter(kind="edit_links").count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # The workers send the links to the known address only
+        while (job := claim_job()) is not None:
+            run_job(job)
+
+        self.assertEqual([message.to for message in mail.outbox], [["Contact@Tilleul.be"]])
+        self.assertIn("/update/", mail.outbox[0].body)
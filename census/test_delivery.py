@@ -0,0 +1,160 @@
+import asyncio
+import socket
+
+from unittest import mock
+
+from aiosmtpd.controller import Controller
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .delivery import (MailRejected, MailUnavailable, breaker_open, send_email, send_messages_parallel,
+                       send_with_retries)
+from .jobs import claim_job, run_job
+from .models import Job
+
+class RecordingHandler:
+    # Local stand-in for the SMTP server, with some latency to make the parallelism visible
+    def __init__(self, latency=0.05, refused=()):
+        self.latency = latency
+        self.refused = refused
+        self.received = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refused:
+            return "550 Mailbox unavailable"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.received.append(envelope.rcpt_tos[0])
+        return "250 Message accepted for delivery"
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class ParallelDeliveryTestCase(SimpleTestCase):
+    def setUp(self):
+        port = free_port()
+
+        self.handler = RecordingHandler(refused=("refused@example.com",))
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=port)
+        self.controller.start()
+
+        self.settings = override_settings(EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+                                          EMAIL_HOST="127.0.0.1",
+                                          EMAIL_PORT=port,
+                                          EMAIL_USE_TLS=False,
+                                          EMAIL_HOST_USER="",
+                                          EMAIL_HOST_PASSWORD="")
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.controller.stop()
+
+    def test_results_are_ordered(self):
+        recipients = ["farm{0}@example.com".format(i) for i in range(12)]
+        recipients[5] = "refused@example.com"
+
+        messages = [EmailMessage("Test", "Body", "census@example.com", [to]) for to in recipients]
+        results = send_messages_parallel(messages, concurrency=4)
+
+        self.assertEqual([r.index for r in results], list(range(12)))
+        self.assertEqual([r.ok for r in results], [i != 5 for i in range(12)])
+        self.assertIsNotNone(results[5].error)
+        self.assertCountEqual(self.handler.received, [to for to in recipients if to != "refused@example.com"])
+
+    @override_settings(EMAIL_RETRIES=0)
+    def test_sent_without_retries(self):
+        cache.clear()
+        connection = send_with_retries(EmailMessage("Test", "Body", "census@example.com", ["farm@example.com"]))
+        connection.close()
+
+        self.assertEqual(self.handler.received, ["farm@example.com"])
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+                   EMAIL_HOST="127.0.0.1",
+                   EMAIL_USE_TLS=False,
+                   EMAIL_TIMEOUT=1,
+                   EMAIL_RETRIES=2,
+                   EMAIL_RETRY_BASE_DELAY=0,
+                   EMAIL_BREAKER_THRESHOLD=2,
+                   EMAIL_BREAKER_COOLDOWN=60)
+class CircuitBreakerTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_breaker_opens_when_host_is_down(self):
+        message = EmailMessage("Test", "Body", "census@example.com", ["farm@example.com"])
+
+        # Nothing listens on that port: both attempts fail and open the breaker
+        with override_settings(EMAIL_PORT=free_port()):
+            with self.assertRaises(MailUnavailable):
+                send_with_retries(message)
+
+        self.assertTrue(breaker_open())
+
+        # Fails fast, without even trying to connect
+        with mock.patch("census.delivery.get_connection") as get_connection:
+            with self.assertRaises(MailUnavailable):
+                send_with_retries(message)
+            get_connection.assert_not_called()
+
+    def test_mail_stats_refuses_process_local_cache(self):
+        # The default LocMemCache: the counters of the workers can't be seen from another process
+        with self.assertRaises(CommandError):
+            call_command("mail_stats")
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+                   EMAIL_HOST="127.0.0.1",
+                   EMAIL_USE_TLS=False,
+                   EMAIL_HOST_USER="",
+                   EMAIL_HOST_PASSWORD="",
+                   EMAIL_SYNC_TIMEOUT=1,
+                   EMAIL_RETRIES=3,
+                   EMAIL_RETRY_BASE_DELAY=10,
+                   EMAIL_BREAKER_THRESHOLD=5)
+class QueueOnFailureTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        message = EmailMessage("Test", "Body", "census@example.com", ["refused@example.com"])
+        self.enterContext(mock.patch("census.delivery.build_email", return_value=message))
+
+    def test_queued_after_one_attempt(self):
+        # Nothing listens on that port. No retry, so no backoff (10 s here) before the message is queued.
+        with override_settings(EMAIL_PORT=free_port()), mock.patch("census.delivery.time.sleep") as sleep:
+            status = send_email(["refused@example.com"], "Test", "edit_link", {}, queue_on_failure=True)
+
+        self.assertEqual(status, "queued")
+        sleep.assert_not_called()
+
+        # Sent by the workers
+        with override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"):
+            job = run_job(claim_job())
+        self.assertEqual((job.kind, job.status, job.result), ("send_email", "done", {"sent": 1}))
+        self.assertEqual(mail.outbox[0].to, ["refused@example.com"])
+
+    def test_refused_recipient_not_queued(self):
+        handler = RecordingHandler(refused=("refused@example.com",))
+        controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        self.addCleanup(controller.stop)
+
+        with override_settings(EMAIL_PORT=controller.port):
+            with self.assertRaises(MailRejected):
+                send_email(["refused@example.com"], "Test", "edit_link", {}, queue_on_failure=True)
+
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(breaker_open())
@@ -0,0 +1,30 @@
+from django.test import TestCase
+
+from .duplicates import DuplicateDetector
+from .models import Farm, Municipality
+
+class DuplicateDetectorTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        liege = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000,
+                                            GPS_coordinates="50.6326, 5.5797")
+        seraing = Municipality.objects.create(name="Seraing", province="Liège", area=35, population=64000,
+                                              GPS_coordinates="50.5986, 5.5121")
+        arlon = Municipality.objects.create(name="Arlon", province="Luxembourg", area=118, population=31000,
+                                            GPS_coordinates="49.6833, 5.8167")
+
+        cls.farm = Farm.objects.create(name="Les Jardins du Tilleul", municipality=liege, email="a@example.org",
+                                       website="https://www.tilleul.be/")
+        # Same farm, registered again from the neighbouring municipality
+        cls.same_name = Farm.objects.create(name="Jardin du Tilleul", municipality=seraing, email="b@example.org")
+        # Same website, written differently
+        cls.same_website = Farm.objects.create(name="Autre nom", municipality=arlon, email="c@example.org",
+                                               website="http://tilleul.be")
+        # Same name, but far away
+        Farm.objects.create(name="Jardin du Tilleul", municipality=arlon, email="d@example.org")
+
+    def test_pairs(self):
+        pairs = DuplicateDetector().run()
+
+        self.assertEqual({(pair.first.pk, pair.second.pk) for pair in pairs},
+                         {(self.farm.pk, self.same_name.pk), (self.farm.pk, self.same_website.pk)})
@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+
+from django.test import TestCase, override_settings
+
+from .exports import FarmExport, streaming_response
+from .models import Farm, MarketGardener, Municipality
+
+@override_settings(EXPORT_CHUNK_SIZE=3)
+class StreamingExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+
+        # 8 farms: several chunks of 3, the last one incomplete
+        cls.farms = [Farm.objects.create(name="Ferme {0}".format(i), municipality=namur, area=i)
+                     for i in range(7)]
+        cls.farms.append(Farm.objects.create(name='La "Ferme", du\nTilleul', municipality=namur,
+                                             research_priorities="Le désherbage; l'irrigation"))
+        MarketGardener.objects.create(firstname="Élise", lastname="Dupont", farm=cls.farms[4],
+                                      email="elise@example.org")
+        MarketGardener.objects.create(firstname="Marc", lastname="Dupont", farm=cls.farms[4])
+
+    def content(self, format):
+        response = streaming_response("farm", format)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_csv(self):
+        response = streaming_response("farm", "csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="fermes.csv"')
+
+        rows = list(csv.reader(io.StringIO(self.content("csv"))))
+        header, rows = rows[0], rows[1:]
+
+        self.assertEqual(header, FarmExport().columns())
+        self.assertIn("municipality", header)
+        self.assertNotIn("edit_token_generation", header)
+
+        self.assertEqual(len(rows), len(self.farms))
+        self.assertEqual([int(row[header.index("id")]) for row in rows], [farm.pk for farm in self.farms])
+
+        # Quotes, commas and line breaks survive the round trip
+        last = dict(zip(header, rows[-1]))
+        self.assertEqual(last["name"], 'La "Ferme", du\nTilleul')
+        self.assertEqual(last["research_priorities"], "Le désherbage; l'irrigation")
+        self.assertEqual(last["municipality"], "Namur")
+
+        # Market gardeners prefetched in the second chunk
+        self.assertEqual(dict(zip(header, rows[4]))["market_gardeners"],
+                         "Élise Dupont <elise@example.org>; Marc Dupont")
+        self.assertEqual(dict(zip(header, rows[5]))["market_gardeners"], "")
+
+    def test_jsonl(self):
+        lines = self.content("jsonl").splitlines()
+        self.assertEqual(len(lines), len(self.farms))
+
+        objects = [json.loads(line) for line in lines]
+        self.assertEqual([obj["id"] for obj in objects], [farm.pk for farm in self.farms])
+        self.assertEqual(objects[-1]["name"], 'La "Ferme", du\nTilleul')
+        self.assertIsNone(objects[-1]["area"])
+        self.assertEqual(objects[4]["market_gardeners"], "Élise Dupont <elise@example.org>; Marc Dupont")
@@ -0,0 +1,44 @@
+import io
+import json
+
+from django.test import SimpleTestCase
+
+from .geo import Shape, iter_features
+
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+class GeoTestCase(SimpleTestCase):
+    def test_features_are_read_incrementally(self):
+        features = [{"type": "Feature", "properties": {"name": "Commune {0}".format(i)}, "geometry": None}
+                    for i in range(10)]
+        text = json.dumps({"type": "FeatureCollection", "features": features})
+
+        self.assertEqual(list(iter_features(io.StringIO(text), chunk_size=5)), features)
+
+    def test_large_feature_is_not_decoded_once_per_chunk(self):
+        reads = []
+
+        class Stream(io.StringIO):
+            def read(self, size=-1):
+                reads.append(size)
+                return super().read(size)
+
+        # About 300 KB of coordinates, read with chunks of 1 KB: a few reads instead of hundreds
+        ring = [[5.123456789 + i, 50.123456789] for i in range(10000)]
+        large = {"type": "Feature", "properties": {"name": "Grande commune"},
+                 "geometry": {"type": "Polygon", "coordinates": [ring]}}
+        small = {"type": "Feature", "properties": {"name": "Petite commune"}, "geometry": None}
+        text = json.dumps({"type": "FeatureCollection", "features": [large, small, small]})
+
+        self.assertEqual(list(iter_features(Stream(text), chunk_size=1024)), [large, small, small])
+        self.assertLess(len(reads), 15)
+
+    def test_centroid_and_area_of_polygon_with_hole(self):
+        # Square of 0.1° with a hole in its upper right quarter
+        shape = Shape({"type": "Polygon", "coordinates": [square(4, 50, 0.1), square(4.05, 50.05, 0.05)[::-1]]})
+
+        self.assertAlmostEqual(shape.centroid[0], 50 + 0.1 * 5 / 12, places=6)
+        self.assertAlmostEqual(shape.centroid[1], 4 + 0.1 * 5 / 12, places=6)
+        self.assertAlmostEqual(shape.area, 59.5, places=0)
+        self.assertEqual(shape.bbox, [4, 50, 4.1, 50.1])
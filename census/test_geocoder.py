@@ -0,0 +1,52 @@
+import io
+
+from django.test import TestCase
+
+from .geocoder import BatchGeocoder
+from .models import Farm, FarmChange, GeocodeCache, Municipality
+
+GAZETTEER = """streetname_fr,streetname_nl,house_number,municipality_name_fr,municipality_name_nl,EPSG:4326_lat,EPSG:4326_lon
+Rue de Fer,,10,Namur,Namen,50.4650,4.8660
+Rue de Fer,,12,Namur,Namen,50.4652,4.8662
+Rue de Fer,,12A,Namur,Namen,50.4653,4.8663
+Chaussée de Louvain,,2,Namur,Namen,50.4700,4.8700
+Chaussée de Louvain,,4,Namur,Namen,50.4710,4.8710
+Rue de Fer,,1,Liège,Luik,50.6300,5.5700
+"""
+
+class GeocoderTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+
+        farms = [("Exacte", "Rue de Fer 12A, 5000 Namur"), ("Faute de frappe", "Rue du Fer 14"),
+                 ("Sans numéro", "Chée de Louvain"), ("Inconnue", "Place d'Armes 1")]
+        cls.farms = {name: Farm.objects.create(name=name, municipality=namur, email="{0}@example.org".format(i),
+                                               address=address)
+                     for i, (name, address) in enumerate(farms)}
+        Farm.objects.create(name="Localisée", municipality=namur, email="x@example.org", address="Rue de Fer 10",
+                            GPS_coordinates="50.1, 4.1")
+
+    def test_geocode_and_cache(self):
+        report = BatchGeocoder(min_confidence=0.7).run(io.StringIO(GAZETTEER))
+
+        matches = {farm.name: match for farm, match in report.matches}
+        self.assertEqual(set(matches), {"Exacte", "Faute de frappe", "Sans numéro"})
+        self.assertEqual(matches["Exacte"].confidence, 1.0)
+        self.assertEqual(matches["Exacte"].coordinates(), "50.465300, 4.866300")
+        # Similar street, nearest number (12A or 12)
+        self.assertTrue(0.7 <= matches["Faute de frappe"].confidence < 0.9)
+        # Middle of the street, below the minimum confidence
+        self.assertEqual(matches["Sans numéro"].coordinates(), "50.470500, 4.870500")
+        self.assertEqual(matches["Sans numéro"].confidence, 0.6)
+        self.assertEqual([farm.name for farm, _ in report.unmatched], ["Inconnue"])
+
+        self.assertEqual(Farm.objects.get(pk=self.farms["Exacte"].pk).GPS_coordinates, "50.465300, 4.866300")
+        self.assertIsNone(Farm.objects.get(pk=self.farms["Sans numéro"].pk).GPS_coordinates)
+        self.assertTrue(FarmChange.objects.filter(farm=self.farms["Exacte"], actor="geocode").exists())
+        self.assertEqual(GeocodeCache.objects.count(), 4)
+
+        # The remaining addresses are found in the cache, without reading the gazetteer
+        report = BatchGeocoder(min_confidence=0.7).run(io.StringIO(""))
+        self.assertEqual(report.cached, 1)
+        self.assertEqual([farm.name for farm, _ in report.matches], ["Sans numéro"])
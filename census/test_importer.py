@@ -0,0 +1,98 @@
+import io
+import os
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from .importer import FarmImporter, MunicipalityImporter, RowResult
+from .models import ContactEmail, Farm, Municipality
+from .search import search
+
+class FarmImporterTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.municipality = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000)
+        cls.farm = Farm.objects.create(name="Ferme du Tilleul", municipality=cls.municipality,
+                                       email="tilleul@example.org")
+
+    def run_import(self, text, dry_run):
+        return FarmImporter(dry_run=dry_run).run(io.StringIO(text))
+
+    def test_dry_run_reports_without_writing(self):
+        text = ("id,name,municipality,email\n"
+                "{0},Ferme des Tilleuls,Liege,tilleul@example.org\n"
+                ",Le Jardin d'Élise,LIÈGE,elise@example.org\n"
+                ",Ferme fantôme,Atlantis,\n"
+                ",Doublon,Liège,elise@example.org\n").format(self.farm.pk)
+
+        report = self.run_import(text, dry_run=True)
+
+        self.assertEqual([row.action for row in report.rows],
+                         [RowResult.UPDATE, RowResult.NEW, RowResult.ERROR, RowResult.ERROR])
+        self.assertEqual(report.rows[0].changes, {"name": ("Ferme du Tilleul", "Ferme des Tilleuls")})
+        self.assertEqual(Farm.objects.count(), 1)
+
+    def test_import_updates_derived_tables(self):
+        text = ("name,municipality,email\n"
+                "Le Jardin d'Élise,Liège,Elise@Example.org\n")
+
+        report = self.run_import(text, dry_run=False)
+
+        self.assertEqual(report.counts[RowResult.NEW], 1)
+        farm = Farm.objects.get(name="Le Jardin d'Élise")
+        self.assertEqual(list(ContactEmail.farms_for("elise@example.org")), [farm])
+        self.assertEqual(list(search(Farm.objects.all(), "farm", "elise")), [farm])
+
+class MunicipalityImporterTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+        cls.farm = Farm.objects.create(name="Ferme du Tilleul", municipality=cls.namur)
+
+    def test_import(self):
+        text = ("id,name,province,area,population,email\n"
+                "{0},Namur-Ville,Namur,175.69,113000,commune@namur.example.org\n"
+                ",Gembloux,Namur,95.5,26000,\n"
+                ",Atlantis,Atlantide,1,1,\n").format(self.namur.pk)
+
+        report = MunicipalityImporter(dry_run=False).run(io.StringIO(text))
+
+        self.assertEqual([row.action for row in report.rows], [RowResult.UPDATE, RowResult.NEW, RowResult.ERROR])
+        self.assertEqual(Municipality.objects.get(pk=self.namur.pk).name, "Namur-Ville")
+        self.assertTrue(Municipality.objects.filter(name="Gembloux").exists())
+        self.assertFalse(Municipality.objects.filter(name="Atlantis").exists())
+
+        # Derived tables: contact addresses, and the documents of the farms, which contain the name of their
+        # municipality
+        self.assertTrue(ContactEmail.objects.filter(source="municipality", municipality=self.namur,
+                                                    email="commune@namur.example.org").exists())
+        self.assertEqual(list(search(Farm.objects.all(), "farm", "namur-ville")), [self.farm])
+
+        # Then updated by its name, which has no "id" column
+        report = MunicipalityImporter(dry_run=False).run(io.StringIO("name,population\nNamur-Ville,114000\n"))
+        self.assertEqual(report.counts[RowResult.UPDATE], 1)
+        self.assertEqual(Municipality.objects.get(pk=self.namur.pk).population, 114000)
+
+class BulkImportViewTestCase(TestCase):
+    def test_stale_files_removed(self):
+        User.objects.create_superuser("admin", "admin@example.org", "admin")
+        self.client.login(username="admin", password="admin")
+
+        with tempfile.NamedTemporaryFile(prefix="census-import-", suffix=".csv", delete=False) as old:
+            pass
+        with tempfile.NamedTemporaryFile(prefix="census-import-", suffix=".csv", delete=False) as recent:
+            pass
+        self.addCleanup(lambda: os.path.exists(recent.name) and os.remove(recent.name))
+
+        two_days_ago = time.time() - 2 * 24 * 3600
+        os.utime(old.name, (two_days_ago, two_days_ago))
+
+        response = self.client.get(reverse("admin:census_municipality_bulk_import"))
+        self.assertEqual(response.status_code, 200)
+
+        # The simulation of the recent one can still be confirmed
+        self.assertFalse(os.path.exists(old.name))
+        self.assertTrue(os.path.exists(recent.name))
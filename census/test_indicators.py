@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from . import changelog, indicators
+from .models import Farm, Municipality, MunicipalityIndicator
+
+class IndicatorTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.liege = Municipality.objects.create(name="Liège", province="Liège", area=50, population=20000)
+        self.namur = Municipality.objects.create(name="Namur", province="Namur", area=100, population=0)
+        self.farm = Farm.objects.create(name="Ferme du Tilleul", municipality=self.liege, email="a@example.org",
+                                        area=2, public=True)
+        Farm.objects.create(name="Les Saules", municipality=self.liege, email="b@example.org", area=1, public=False)
+
+    def test_indicators_follow_changes(self):
+        indicator = MunicipalityIndicator.objects.get(municipality=self.liege)
+        self.assertEqual((indicator.farms, indicator.vegetable_area), (1, 2))
+        self.assertAlmostEqual(indicator.farms_per_km2, 0.02)
+        self.assertAlmostEqual(indicator.farms_per_10000, 0.5)
+        self.assertAlmostEqual(indicator.hectares_per_capita, 0.0001)
+
+        # Bulk action
+        changelog.update(Farm.objects.all(), "action", public=True)
+        self.assertEqual(MunicipalityIndicator.objects.get(municipality=self.liege).farms, 2)
+
+        # Both municipalities of a moved farm
+        self.farm.municipality = self.namur
+        self.farm.save()
+        self.assertEqual(MunicipalityIndicator.objects.get(municipality=self.liege).farms, 1)
+        namur = MunicipalityIndicator.objects.get(municipality=self.namur)
+        self.assertEqual(namur.farms, 1)
+        # No population
+        self.assertIsNone(namur.farms_per_10000)
+
+        response = self.client.get(reverse("census:map_indicators"))
+        data = response.json()
+        row = dict(zip(data["columns"], data["municipalities"][0]))
+        self.assertEqual((row["name"], row["farms"], row["hectares_per_capita"]), ("Liège", 1, 0.5))
+        self.assertEqual(data["indicators"]["farms_per_km2"]["breaks"]["jenks"], [0.01, 0.02])
+
+    def test_jenks_breaks(self):
+        values = [1, 2, 2, 3, 10, 11, 12, 30, 31]
+        self.assertEqual(indicators.jenks_breaks(values, 3), [3, 12, 31])
+        self.assertEqual(indicators.jenks_breaks([4, 4, 4], 3), [4])
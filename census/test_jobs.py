@@ -0,0 +1,97 @@
+import datetime
+
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from .jobs import HANDLERS, JobDeferred, claim_job, enqueue, run_job
+from .models import Job
+
+class JobQueueTestCase(TestCase):
+    def test_claim(self):
+        first = enqueue("send_email")
+        second = enqueue("send_email")
+        later = enqueue("send_email")
+        later.run_after = timezone.now() + datetime.timedelta(hours=1)
+        later.save()
+
+        # Oldest first, and a claimed job isn't claimed again
+        job = claim_job()
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual(job.status, "running")
+        self.assertIsNotNone(job.heartbeat)
+
+        self.assertEqual(claim_job().pk, second.pk)
+        self.assertIsNone(claim_job())
+
+    def test_stale_takeover(self):
+        job = enqueue("send_email")
+        started = timezone.now() - datetime.timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(status="running", started=started,
+                                             heartbeat=timezone.now() - datetime.timedelta(seconds=30))
+
+        # The worker is still alive
+        self.assertIsNone(claim_job())
+
+        # It died: another worker takes the job over, where it stopped
+        dead = timezone.now() - datetime.timedelta(seconds=settings.JOB_STALE_AFTER + 1)
+        Job.objects.filter(pk=job.pk).update(heartbeat=dead, processed=1)
+        job = claim_job()
+        self.assertIsNotNone(job)
+        self.assertEqual(job.started, started)
+        self.assertGreater(job.heartbeat, dead)
+        self.assertEqual(job.processed, 1)
+
+    def test_campaign_jobs_one_at_a_time(self):
+        first = enqueue("campaign", [1], base_url="https://example.org")
+        second = enqueue("reminder", [1], base_url="https://example.org")
+        export = enqueue("export_farms", [1])
+
+        self.assertEqual(claim_job().pk, first.pk)
+        # The reminder waits for the campaign, other jobs don't
+        self.assertEqual(claim_job().pk, export.pk)
+        self.assertIsNone(claim_job())
+
+        Job.objects.filter(pk=first.pk).update(status="done")
+        self.assertEqual(claim_job().pk, second.pk)
+
+    def test_deferred(self):
+        run_after = timezone.now() + datetime.timedelta(hours=1)
+        processed = []
+
+        def handler(job, pks):
+            if pks == [2]:
+                raise JobDeferred(run_after, "Quota atteint")
+            processed.extend(pks)
+
+        enqueue("send_email", [1, 2, 3])
+        with mock.patch.dict(HANDLERS, {"send_email": (handler, 1)}):
+            job = run_job(claim_job())
+
+        # Back in the queue, with the chunks already processed kept
+        self.assertEqual(processed, [1])
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(job.processed, 1)
+        self.assertEqual(job.run_after, run_after)
+        self.assertEqual(job.errors[0]["pks"], [2])
+
+        # Not claimed before run_after
+        self.assertIsNone(claim_job())
+
+        with mock.patch("census.jobs.timezone.now", return_value=run_after + datetime.timedelta(seconds=1)):
+            self.assertEqual(claim_job().pk, job.pk)
+
+    def test_job_without_pks(self):
+        calls = []
+        job = enqueue("edit_links", email="a@example.org")
+        self.assertEqual((job.payload["pks"], job.total), (None, 1))
+
+        with mock.patch.dict(HANDLERS, {"edit_links": (lambda job, pks: calls.append(pks), 1)}):
+            job = run_job(claim_job())
+
+        # Run once, from its parameters
+        self.assertEqual(calls, [None])
+        self.assertEqual((job.status, job.processed, job.progress()), ("done", 1, 100))
+
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import TestCase, override_settings
+
+from . import links
+from .models import Farm, LinkStatus, Municipality, OtherLinks
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Local stand-in for the websites of the farms
+    def do_HEAD(self):
+        if self.path == "/no-head":
+            self.answer(405)
+        elif self.path == "/moved":
+            self.answer(301, location="/ok")
+        elif self.path == "/slow":
+            time.sleep(0.5)
+            self.answer(200)
+        elif self.path == "/drop-head":
+            # Connection closed without an answer
+            self.close_connection = True
+        elif self.path in ("/ok", "/nos-l%C3%A9gumes"):
+            self.answer(200)
+        else:
+            self.answer(404)
+
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(0.5)
+        self.answer(200 if self.path in ("/ok", "/no-head", "/drop-head", "/nos-l%C3%A9gumes") else 404)
+
+    def answer(self, status, location=None):
+        self.send_response(status)
+        if location:
+            self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@override_settings(LINK_CHECK_TIMEOUT=0.2, LINK_CHECK_PER_HOST=2)
+class LinkCheckerTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = "http://127.0.0.1:{0}".format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+        farm = Farm.objects.create(name="Ferme", municipality=namur, email="a@example.org", website=self.base + "/ok",
+                                   fb_page=self.base + "/no-head")
+        for path in ("/moved", "/missing", "/slow", "/drop-head", "/nos-légumes"):
+            OtherLinks.objects.create(farm=farm, link=self.base + path)
+
+    def test_check_and_recheck_stale(self):
+        links.sync()
+        links.check()
+
+        statuses = {status.url[len(self.base):]: status for status in LinkStatus.objects.all()}
+        self.assertEqual({path: status.alive for path, status in statuses.items()},
+                         {"/ok": True, "/no-head": True, "/moved": True, "/missing": False, "/slow": False,
+                          "/drop-head": True, "/nos-légumes": True})
+        self.assertEqual(statuses["/missing"].status, 404)
+        self.assertEqual(statuses["/slow"].error, "Délai dépassé")
+
+        # Only the links not checked recently are checked again
+        LinkStatus.objects.filter(url=self.base + "/missing").update(checked=None)
+        self.assertEqual([status.url for status in links.check()], [self.base + "/missing"])
+        self.assertEqual(LinkStatus.objects.get(url=self.base + "/missing").failures, 2)
@@ -0,0 +1,51 @@
+from django.core import mail
+from django.test import TestCase
+
+from .models import Farm, Municipality, NotificationEvent
+from .notifications import coalesce, send_digest
+
+class DigestTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+        cls.farm = Farm.objects.create(name="Ferme du Tilleul", municipality=namur)
+        cls.other = Farm.objects.create(name="Ferme des Saules", municipality=namur)
+
+    def create_events(self):
+        NotificationEvent.objects.create(kind="new_farm", farm=self.farm)
+        NotificationEvent.objects.create(kind="farm_updated", farm=self.farm,
+                                         diff={"area": {"old": 1, "new": 2}, "FTE": {"old": 1, "new": 3}})
+        NotificationEvent.objects.create(kind="farm_updated", farm=self.other, diff={"area": {"old": 5, "new": 6}})
+        NotificationEvent.objects.create(kind="farm_updated", farm=self.farm,
+                                         diff={"area": {"old": 2, "new": 4}, "FTE": {"old": 3, "new": 1}})
+
+    def test_coalesce(self):
+        self.create_events()
+        entries = coalesce(NotificationEvent.objects.order_by("created", "pk"))
+
+        # One entry per farm, in order of first event
+        self.assertEqual([entry["farm"] for entry in entries], [self.farm, self.other])
+        self.assertEqual(entries[0]["count"], 3)
+        self.assertTrue(entries[0]["new"])
+        self.assertFalse(entries[1]["new"])
+
+        # First old value, last new value; FTE came back to its initial value
+        self.assertEqual(entries[0]["diff"], {"area": {"old": 1, "new": 4}})
+
+    def test_send_digest(self):
+        self.assertEqual(send_digest("https://example.org"), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.create_events()
+        self.assertEqual(send_digest("https://example.org"), 2)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("1 nouvelle(s) ferme(s), 1 ferme(s) modifiée(s)", mail.outbox[0].subject)
+        self.assertFalse(NotificationEvent.objects.filter(sent=None).exists())
+
+        # Events already sent aren't sent again
+        self.assertEqual(send_digest("https://example.org"), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+        NotificationEvent.objects.create(kind="farm_updated", farm=self.other, diff={"area": {"old": 6, "new": 7}})
+        self.assertEqual(send_digest("https://example.org"), 1)
+        self.assertIn("0 nouvelle(s) ferme(s), 1 ferme(s) modifiée(s)", mail.outbox[1].subject)
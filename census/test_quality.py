@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import quality
+from .models import Farm, Municipality
+
+class QualityTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        liege = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000,
+                                            GPS_coordinates="50.6326, 5.5797", bbox=[5.50, 50.56, 5.68, 50.69])
+
+        cls.sound = Farm.objects.create(name="Ferme saine", municipality=liege, email="a@example.org", area=1.5,
+                                        FTE=2, start_year=2015, GPS_coordinates="50.62, 5.58",
+                                        website="https://saine.be", fb_page="https://facebook.com/saine")
+        cls.area = Farm.objects.create(name="Ferme en ares", municipality=liege, email="b@example.org", area=50,
+                                       FTE=3)
+        cls.years = Farm.objects.create(name="Ferme des années", municipality=liege, email="c@example.org",
+                                        start_year=2020, end_year=2018, website="https://www.facebook.com/annees/",
+                                        fb_page="https://facebook.com/annees")
+        # Latitude and longitude swapped
+        cls.gps = Farm.objects.create(name="Ferme inversée", municipality=liege, email="d@example.org",
+                                      GPS_coordinates="5.58, 50.62")
+
+    def test_rules(self):
+        suggestions = {suggestion.pk: suggestion for suggestion in quality.run()}
+
+        self.assertNotIn(self.sound.pk, suggestions)
+        self.assertEqual(suggestions[self.area.pk].codes, ["area_unit"])
+        self.assertEqual(suggestions[self.years.pk].codes, ["end_before_start", "website_facebook", "website_fb_page"])
+        self.assertEqual(suggestions[self.gps.pk].codes, ["gps_far"])
+        self.assertIn("fin d'activité en 2018, avant l'installation en 2020", str(suggestions[self.years.pk]))
+
+    def test_explanations(self):
+        # Area unknown: shown as "?"
+        people = Farm.objects.create(name="Ferme des personnes", municipality=self.sound.municipality,
+                                     email="e@example.org", FTE=25)
+
+        # The census year is read when the rules are run, not when they are defined
+        with override_settings(CENSUS_YEAR=2014):
+            suggestions = {suggestion.pk: suggestion for suggestion in quality.run()}
+
+        self.assertIn("25.0 ETP rémunérés pour ? ha", str(suggestions[people.pk]))
+        self.assertEqual(suggestions[self.sound.pk].codes, ["future_start"])
+        self.assertIn("installation en 2015, après 2014", str(suggestions[self.sound.pk]))
+
+    def test_admin_action_flags(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.org", "admin"))
+        self.client.post(reverse("admin:census_farm_changelist"), {"action": "flag_quality",
+                                                 "_selected_action": [self.sound.pk, self.area.pk]})
+
+        self.assertEqual(set(Farm.objects.filter(flagged=True).values_list("pk", flat=True)), {self.area.pk})
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .ratelimit import RateLimiter, client_ip, parse_rate
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class RateLimiterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.clock = Clock()
+
+    def post(self, ip="192.0.2.1", **meta):
+        return self.factory.post("/", REMOTE_ADDR=ip, **meta)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("5/h"), (5, 3600))
+        self.assertEqual(parse_rate("10/m"), (10, 60))
+        with self.assertRaises(KeyError):
+            parse_rate("5/w")
+
+    def test_limit_and_sliding_window(self):
+        limiter = RateLimiter("test", {"ip": "3/m"}, clock=self.clock)
+
+        self.assertEqual([limiter.check(self.post()) for _ in range(3)], [0, 0, 0])
+        retry_after = limiter.check(self.post())
+        self.assertTrue(0 < retry_after <= 61)
+        # Other clients aren't limited
+        self.assertEqual(limiter.check(self.post(ip="192.0.2.2")), 0)
+
+        # Start of the next window: the 3 requests of the previous one still count in full
+        self.clock.now = (self.clock.now // 60 + 1) * 60
+        self.assertGreater(limiter.check(self.post()), 0)
+        # Halfway: they count for 1.5, so one more request is accepted
+        self.clock.now += 30
+        self.assertEqual(limiter.check(self.post()), 0)
+        self.assertGreater(limiter.check(self.post()), 0)
+
+        # Two windows later, everything is forgotten
+        self.clock.now += 120
+        self.assertEqual(limiter.check(self.post()), 0)
+
+    @override_settings(RATE_LIMIT_TRUSTED_PROXIES=1)
+    def test_client_ip_behind_proxy(self):
+        # The left-most entry is set by the client, the right-most one by the proxy
+        request = self.post(ip="10.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.9, 198.51.100.7")
+        self.assertEqual(client_ip(request), "198.51.100.7")
+        self.assertEqual(client_ip(self.post(ip="10.0.0.1")), "10.0.0.1")
+
+        # A client changing the spoofed entry is still limited
+        limiter = RateLimiter("test", {"ip": "2/h"}, clock=self.clock)
+        results = [limiter.check(self.post(ip="10.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.{0}, 198.51.100.7".format(i)))
+                   for i in range(3)]
+        self.assertEqual(results[:2], [0, 0])
+        self.assertGreater(results[2], 0)
+
+    @override_settings(RATE_LIMIT_TRUSTED_PROXIES=0)
+    def test_client_ip_without_proxy(self):
+        self.assertEqual(client_ip(self.post(ip="10.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.9")), "10.0.0.1")
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={"create": {"ip": "1/h"}})
+class TooManyRequestsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_retry_after(self):
+        self.assertNotEqual(self.client.post(reverse("census:create"), {}).status_code, 429)
+
+        response = self.client.post(reverse("census:create"), {})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response["Retry-After"]) <= 3601)
@@ -0,0 +1,40 @@
+from django.test import TestCase
+
+from .models import Farm, MarketGardener, Municipality
+from .search import search
+
+class FarmSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        municipality = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000)
+
+        cls.farm = Farm.objects.create(name="Le Jardin d'Élise",
+                                       municipality=municipality,
+                                       email="elise@example.org",
+                                       research_priorities="Le désherbage")
+        cls.other = Farm.objects.create(name="Ferme du Tilleul",
+                                        municipality=municipality,
+                                        email="contact@example.org",
+                                        research_priorities="Le désherbage")
+
+        MarketGardener.objects.create(firstname="Noémie", lastname="Dubœuf", farm=cls.farm)
+
+    def search(self, text):
+        return list(search(Farm.objects.all(), "farm", text).order_by("-search_rank"))
+
+    def test_accents_and_case_are_ignored(self):
+        self.assertEqual(self.search("ELISE jard"), [self.farm])
+        self.assertEqual(len(self.search("liege")), 2)
+
+    def test_gardener_names_are_indexed(self):
+        self.assertEqual(self.search("duboeuf"), [self.farm])
+
+    def test_documents_follow_changes(self):
+        self.other.name = "Ferme des Saules"
+        self.other.save()
+
+        self.assertEqual(self.search("tilleul"), [])
+        self.assertEqual(self.search("saules"), [self.other])
+
+        self.farm.delete()
+        self.assertEqual(self.search("elise"), [])
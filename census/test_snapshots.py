@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from . import snapshots
+from .models import Farm, MarketGardener, Municipality
+
+class SnapshotTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(SNAPSHOT_DIR=directory.name))
+
+        municipality = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000)
+        self.farm = Farm.objects.create(name="Ferme du Tilleul", municipality=municipality, email="a@example.org",
+                                        area=2, production="Bio certifié")
+        self.stopped = Farm.objects.create(name="Les Saules", municipality=municipality, email="b@example.org")
+        MarketGardener.objects.create(firstname="Élise", lastname="Dupont", farm=self.farm)
+
+    def test_snapshot_and_compare(self):
+        snapshots.write_snapshot(2025)
+
+        Farm.objects.filter(pk=self.farm.pk).update(area=3)
+        Farm.objects.filter(pk=self.stopped.pk).update(end_year=2026)
+        new = Farm.objects.create(name="Le Jardin d'Élise", municipality=self.farm.municipality, email="c@example.org")
+        snapshots.write_snapshot(2026)
+
+        before = snapshots.load(2025)
+        self.assertEqual(before.production(before["farm_production"][0]), "Bio certifié")
+        self.assertEqual(before["farm_gardeners"].tolist(), [1, 0])
+
+        diff = snapshots.compare(2025, 2026)
+        self.assertEqual(diff.new.tolist(), [new.pk])
+        self.assertEqual(diff.stopped.tolist(), [self.stopped.pk])
+
+        ids, old, new_values = diff.changes("farm_area")
+        self.assertEqual((ids.tolist(), old.tolist(), new_values.tolist()), ([self.farm.pk], [2.0], [3.0]))
+
+    def test_failed_write_leaves_no_file(self):
+        with mock.patch("census.snapshots.np.savez_compressed", side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                snapshots.write_snapshot(2025)
+
+        self.assertEqual(os.listdir(settings.SNAPSHOT_DIR), [])
@@ -0,0 +1,86 @@
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from . import statistics
+from .models import Farm, Municipality
+
+class StatisticsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        liege = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000)
+        huy = Municipality.objects.create(name="Huy", province="Liège", area=47, population=21000)
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+
+        self.areas = {"Liège": [1, 2.5, 4, None, 0.5], "Namur": [3, 8]}
+        for i, area in enumerate(self.areas["Liège"]):
+            Farm.objects.create(name="Ferme {0}".format(i), municipality=huy if i % 2 else liege,
+                                email="l{0}@example.org".format(i), area=area, FTE=1, production="Bio certifié")
+        for i, area in enumerate(self.areas["Namur"]):
+            Farm.objects.create(name="Jardin {0}".format(i), municipality=namur, email="n{0}@example.org".format(i),
+                                area=area, FTE=2)
+        # Stopped: not counted
+        Farm.objects.create(name="Ancienne ferme", municipality=namur, email="old@example.org", area=50, end_year=2020)
+
+    def test_aggregates(self):
+        result = statistics.compute()
+
+        provinces = {row["name"]: row for row in result["provinces"]}
+        self.assertEqual(set(provinces), {"Liège", "Namur"})
+        for name, areas in self.areas.items():
+            known = [area for area in areas if area is not None]
+            self.assertEqual(provinces[name]["farms"], len(areas))
+            self.assertEqual(provinces[name]["area"]["count"], len(known))
+            self.assertAlmostEqual(provinces[name]["area"]["median"], np.median(known))
+            self.assertEqual(provinces[name]["area"]["quantiles"],
+                             [round(value, 4) for value in np.quantile(known, statistics.QUANTILES).tolist()])
+
+        # 4 FTE for 8 ha in Liège (the farm without area doesn't count)
+        self.assertAlmostEqual(provinces["Liège"]["FTE_per_ha_overall"], 0.5)
+        self.assertEqual([mode["farms"] for mode in provinces["Namur"]["production"]], [0, 0, 0, 2])
+
+        self.assertEqual([row["name"] for row in result["municipalities"]], ["Huy", "Liège", "Namur"])
+        self.assertEqual(result["total"]["farms"], 7)
+
+    def test_cache_follows_changes(self):
+        first = statistics.statistics()
+        # Not computed again
+        self.assertEqual(statistics.statistics()["computed"], first["computed"])
+
+        farm = Farm.objects.get(name="Jardin 0")
+        farm.area = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            farm.save()
+            # Not before the commit: computed now, the statistics would be cached under the new version
+            self.assertEqual(statistics.statistics()["computed"], first["computed"])
+
+        second = statistics.statistics()
+        self.assertNotEqual(second["computed"], first["computed"])
+        self.assertEqual(second["total"]["area"]["sum"], first["total"]["area"]["sum"] + 2)
+
+        User.objects.create_superuser("admin", "admin@example.org", "admin")
+        self.client.login(username="admin", password="admin")
+        response = self.client.get(reverse("admin:census_farm_statistics"))
+        self.assertContains(response, "Par province")
+        response = self.client.get(reverse("admin:census_farm_statistics"), {"format": "json"})
+        self.assertEqual(response.json()["total"]["farms"], 7)
+
+    def test_unknown_province(self):
+        # Not one of Municipality.PROVINCES (only checked by the forms): written by an import, for instance
+        ostende = Municipality.objects.create(name="Ostende", province="Liège", area=38, population=72000)
+        Municipality.objects.filter(pk=ostende.pk).update(province="Flandre occidentale")
+        Farm.objects.create(name="Ferme de la côte", municipality=ostende, email="c@example.org", area=2)
+
+        provinces = {row["name"]: row for row in statistics.compute()["provinces"]}
+        self.assertEqual(set(provinces), {"Liège", "Namur", None})
+        self.assertEqual(provinces[None]["farms"], 1)
+        self.assertEqual(provinces["Liège"]["farms"], 5)
+
+        User.objects.create_superuser("admin", "admin@example.org", "admin")
+        self.client.login(username="admin", password="admin")
+        response = self.client.get(reverse("admin:census_farm_statistics"))
+        self.assertContains(response, "<td>Inconnue</td>", html=True)
@@ -0,0 +1,32 @@
+from django.test import TestCase
+
+from . import survival
+from .models import Farm, Municipality
+
+class SurvivalTestCase(TestCase):
+    def setUp(self):
+        liege = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000)
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+
+        for i, (municipality, start, end) in enumerate([(liege, 2020, 2022), (liege, 2020, 2024), (namur, 2020, None),
+                                                        (namur, 2020, None), (namur, None, 2021), (namur, 2023, 2021)]):
+            Farm.objects.create(name="Ferme {0}".format(i), municipality=municipality,
+                                email="f{0}@example.org".format(i), start_year=start, end_year=end)
+
+    def test_kaplan_meier_and_cohorts(self):
+        result = survival.analyze(2026)
+        self.assertEqual(result["excluded"], 2)
+
+        curve = result["all"]
+        self.assertEqual((curve["farms"], curve["stopped"], curve["median"]), (4, 2, 4))
+        self.assertEqual(curve["at_risk"], [4, 4, 4, 3, 3, 2, 2])
+        self.assertEqual(curve["survival"], [1, 1, 0.75, 0.75, 0.5, 0.5, 0.5])
+        self.assertEqual(curve["milestones"], [1, 0.75, 0.5, None])
+
+        provinces = {curve["name"]: curve for curve in result["province"]}
+        self.assertEqual(provinces["Liège"]["survival"][-1], 0)
+        self.assertEqual(provinces["Namur"]["survival"][-1], 1)
+
+        cohorts = {row["year"]: row for row in result["cohorts"]}
+        self.assertEqual(cohorts[2020], {"year": 2020, "installed": 4, "stopped": 0, "active": 4, "still_active": 2})
+        self.assertEqual((cohorts[2022]["stopped"], cohorts[2026]["active"]), (1, 2))
@@ -0,0 +1,50 @@
+from django.test import TestCase
+
+from . import terms
+from .models import Farm, FarmTerm, Municipality
+from .text import tokens
+
+class TermIndexTestCase(TestCase):
+    def setUp(self):
+        liege = Municipality.objects.create(name="Liège", province="Liège", area=69, population=190000)
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+
+        answers = [
+            (liege, "Le désherbage mécanique et les couverts végétaux."),
+            (liege, "Désherbage, et la gestion des couverts."),
+            (namur, "La commercialisation des légumes."),
+            (namur, "Commercialisation et désherbage."),
+        ]
+        self.farms = [Farm.objects.create(name="Ferme {0}".format(i), municipality=municipality,
+                                          email="f{0}@example.org".format(i), research_priorities=answer)
+                      for i, (municipality, answer) in enumerate(answers)]
+
+    def test_tokens(self):
+        self.assertEqual(list(tokens("Les couverts végétaux, c'est trop de travail")),
+                         [("couvert", "couverts"), ("vegetal", "végétaux"), ("travail", "travail")])
+
+    def test_incremental_index(self):
+        farm = self.farms[2]
+        self.assertEqual(set(FarmTerm.objects.filter(farm=farm).values_list("term", flat=True)),
+                         {"commercialisation", "legum"})
+
+        # Other changes don't touch the index
+        ids = list(FarmTerm.objects.values_list("pk", flat=True))
+        farm.area = 2
+        farm.save()
+        self.assertEqual(list(FarmTerm.objects.values_list("pk", flat=True)), ids)
+
+        farm.research_priorities = "Les semences"
+        farm.save()
+        self.assertEqual(list(FarmTerm.objects.filter(farm=farm).values_list("word", flat=True)), ["semences"])
+
+        result = terms.analyze("research_priorities")
+        self.assertEqual(result["farms"], 4)
+        self.assertEqual(result["top"][0]["word"], "désherbage")
+        self.assertEqual(result["top"][0]["farms"], 3)
+
+        keywords = {row["province"]: [keyword["word"] for keyword in row["keywords"]] for row in result["keywords"]}
+        self.assertEqual(keywords["Liège"], ["couverts", "désherbage"])
+
+        self.assertIn({"words": ["couverts", "désherbage"], "farms": 2, "jaccard": round(2 / 3, 4)},
+                      result["cooccurrences"])
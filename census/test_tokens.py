@@ -0,0 +1,69 @@
+import datetime
+
+from unittest import mock
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Farm, FarmChange, Municipality
+from .tokens import make_edit_token, read_edit_token, token_is_valid
+
+class EditTokenTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        namur = Municipality.objects.create(name="Namur", province="Namur", area=175, population=113000)
+        cls.farm = Farm.objects.create(name="Ferme du Tilleul", municipality=namur, email="a@example.org")
+
+    def tampered(self, token):
+        # Last character of the signature changed
+        return token[:-1] + ("A" if token[-1] != "A" else "B")
+
+    def expired(self):
+        past = timezone.now() - datetime.timedelta(days=2)
+        with mock.patch("census.tokens.timezone.now", return_value=past):
+            return make_edit_token(self.farm)
+
+    def test_tokens(self):
+        token = make_edit_token(self.farm)
+        payload = read_edit_token(token)
+        self.assertEqual(payload["f"], self.farm.pk)
+        self.assertTrue(token_is_valid(payload, self.farm))
+
+        # Signature still valid, but expired
+        self.assertFalse(token_is_valid(read_edit_token(self.expired()), self.farm))
+
+        self.assertIsNone(read_edit_token(self.tampered(token)))
+
+        # Revoked: the generation of the farm was incremented, and the revocation logged
+        User.objects.create_superuser("admin", "admin@example.org", "admin")
+        self.client.login(username="admin", password="admin")
+        response = self.client.post(reverse("admin:census_farm_changelist"),
+                                    {"action": "revoke_edit_links", ACTION_CHECKBOX_NAME: [self.farm.pk]}, follow=True)
+        self.assertContains(response, "Liens d&#x27;édition révoqués pour 1 ferme(s).")
+
+        self.farm.refresh_from_db()
+        self.assertFalse(token_is_valid(payload, self.farm))
+
+        change = FarmChange.objects.filter(farm=self.farm).latest("sequence")
+        self.assertEqual((change.source, change.actor), ("action", "admin"))
+        self.assertEqual(change.diff, {"edit_token_generation": [0, 1]})
+
+    def test_update_view_refuses_invalid_tokens(self):
+        valid = make_edit_token(self.farm)
+        self.assertTrue(self.client.get(reverse("census:update", args=(valid,))).context["display_form"])
+
+        revoked = make_edit_token(self.farm)
+        Farm.objects.filter(pk=self.farm.pk).update(edit_token_generation=self.farm.edit_token_generation + 1)
+
+        for token in (self.expired(), self.tampered(valid), revoked):
+            url = reverse("census:update", args=(token,))
+            response = self.client.get(url)
+            self.assertContains(response, "Le lien d'édition")
+            self.assertFalse(response.context["display_form"])
+
+            # Nothing saved either
+            self.client.post(url, {"name": "Piratée"})
+            self.assertEqual(Farm.objects.get(pk=self.farm.pk).name, "Ferme du Tilleul")
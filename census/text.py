@@ -0,0 +1,55 @@
+import re
+import unicodedata
+
+# Letters that NFKD doesn't decompose
+LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss"})
+
+WORD = re.compile(r"\w+")
+
+def fold(text):
+    # Lowercase, without accents: "Œuvre Élevée" -> "oeuvre elevee"
+    text = unicodedata.normalize("NFKD", text.lower().translate(LIGATURES))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def words(text):
+    return WORD.findall(fold(text))
+
+def name_key(text):
+    # Comparison key of a name, ignoring case, accents and punctuation: "Braine-l'Alleud" -> "braine l alleud"
+    return " ".join(words(text))
+
+"""
+    French free text
+"""
+# Frequent words without meaning on their own (folded), for the analysis of the answers
+STOP_WORDS = frozenset("""
+    a ai aie aient ait alors as au aucun aucune aussi autre autres aux avant avec avoir avons ayant bcp beaucoup bien
+    c ca car ce ceci cela celle celles celui ces cet cette ceux chaque chez ci comme comment d dans de des deja doit
+    donc dont du e elle elles en encore entre est et etaient etait etant ete etre eu eux fait faire faut fois font
+    ici il ils j je jusqu l la le les leur leurs lors lui m ma mais me meme mes moi moins mon n ne ni nos notre nous
+    on ont or ou par parce pas peu peut peuvent plus plutot pour pourquoi qu quand que quel quelle quelles quels qui
+    quoi s sa sans se selon ses si sien soit son sont sous suis sur t ta tant te tes toi ton tous tout toute toutes
+    tres trop tu un une unes uns vers via voire vos votre vous y
+""".split())
+
+def stem(word):
+    # Light stemming of a folded word (plural, feminine and final vowel), in the spirit of J. Savoy's French light
+    # stemmer: "vegetaux" -> "vegetal", "couverts" -> "couvert", "nouvelles" -> "nouvel", "rotation" -> "rotation"
+    if len(word) > 5 and word.endswith("aux"):
+        word = word[:-3] + "al"
+    elif len(word) > 3 and word[-1] in "sx":
+        word = word[:-1]
+
+    if len(word) > 4 and word[-1] == "e":
+        word = word[:-1]
+    if len(word) > 4 and word[-1] == word[-2] and word[-1] not in "aeiouy":
+        word = word[:-1]
+
+    return word
+
+def tokens(text):
+    # (stem, word) of the meaningful words of a French text, the word being lowercase with its accents
+    for word in WORD.findall(text.lower()):
+        folded = fold(word)
+        if len(folded) >= 3 and not folded.isdigit() and folded not in STOP_WORDS:
+            yield stem(folded), word
@@ -0,0 +1,30 @@
+import datetime
+
+from django.core import signing
+from django.utils import timezone
+
+"""
+    Edit links carry a signed token: {"f": farm id, "g": token generation of the farm, "e": expiration timestamp},
+    signed with SECRET_KEY (HMAC-SHA256). It is verified without touching the database; incrementing
+    Farm.edit_token_generation revokes all the links issued before for that farm.
+"""
+
+SALT = "census.edit-link"
+
+def make_edit_token(farm, days=1):
+    expiration = timezone.now() + datetime.timedelta(days=days)
+
+    return signing.dumps({"f": farm.pk, "g": farm.edit_token_generation, "e": int(expiration.timestamp())},
+                         salt=SALT,
+                         compress=True)
+
+def read_edit_token(token):
+    # Returns the payload of a valid signature (possibly expired or revoked), None otherwise
+    try:
+        return signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return None
+
+def token_is_valid(payload, farm):
+    return (payload["e"] > timezone.now().timestamp() and
+            payload["g"] == farm.edit_token_generation)
@@ -9,9 +9,11 @@ urlpatterns = [
     path("", views.index, name='index'),
     path("listing/", views.ListingView.as_view(), name="listing"),
     path("map/", views.MapView.as_view(), name="map"),
+    path("map/indicators.json", views.map_indicators, name="map_indicators"),
     path("view/<int:pk>/", views.FarmView.as_view(), name="view"),
     path("create/", views.FarmCreateView.as_view(), name="create"),
     path("thanks/<int:farm_id>/", views.thanks, name="thanks"),
     path("update/<str:token>/", views.FarmUpdateView.as_view(), name="update"),
+    path("links/", views.EditLinksView.as_view(), name="links"),
     path("cgu/", views.cgu, name='cgu')
 ]
\ No newline at end of file
@@ -1,30 +1,57 @@
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
-def send_email(to, subject, template, context):
+def build_email(to, subject, template, context):
     # Avoid a crash if I select a farm with no known emails when sending a campaign
-    if len(to) > 0:
-        text_content = render_to_string(
-            "census/mails/" + template + ".txt",
-            context=context,
-        )
-
-        html_content = render_to_string(
-            "census/mails/" + template + ".html",
-            context=context,
-        )
-
-        cc = ["antoine.paris@uclouvain.be"]
-        if to[0] == cc[0]:
-            cc = None
-
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email="Antoine Paris <recensement@maraichage-wallonie.be>",
-            to=to,
-            bcc=cc,
-        )
-
-        email.attach_alternative(html_content, "text/html")
-        email.send()
\ No newline at end of file
+    if len(to) == 0:
+        return None
+
+    text_content = render_to_string(
+        "census/mails/" + template + ".txt",
+        context=context,
+    )
+
+    html_content = render_to_string(
+        "census/mails/" + template + ".html",
+        context=context,
+    )
+
+    cc = ["antoine.paris@uclouvain.be"]
+    if to[0] == cc[0]:
+        cc = None
+
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email="Antoine Paris <recensement@maraichage-wallonie.be>",
+        to=to,
+        bcc=cc,
+    )
+
+    email.attach_alternative(html_content, "text/html")
+
+    return email
+
+def display_value(value):
+    # JSON-friendly representation of a form value (Decimal, PhoneNumber, model instances, etc.)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+def form_diff(form):
+    diff = dict()
+
+    for field in form.changed_data:
+        old = form.initial.get(field)
+
+        # The initial value of a foreign key is its primary key
+        queryset = getattr(form.fields[field], "queryset", None)
+        if queryset is not None and old is not None:
+            old = queryset.filter(pk=old).first()
+
+        diff[field] = {
+            'old': display_value(old),
+            'new': display_value(form.cleaned_data[field]),
+        }
+
+    return diff
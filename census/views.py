@@ -1,3 +1,6 @@
+import logging
+
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
 
 from django.urls import reverse
@@ -5,10 +8,19 @@ from django.views import generic
 from django.contrib import messages
 from django.utils import timezone
 from django.views import View
+from django.views.decorators.cache import cache_control
 
+from .changelog import change_source
 from .forms import EmailForm, FarmForm
-from .models import Farm, ExpiringUniqueEditLink, Municipality
-from .utils import send_email
+from .indicators import payload as indicators_payload
+from .jobs import enqueue
+from .models import Farm, ExpiringUniqueEditLink, Municipality, NotificationEvent, ContactEmail, normalize_email
+from .delivery import send_email
+from .ratelimit import RateLimitMixin
+from .tokens import make_edit_token, read_edit_token, token_is_valid
+from .utils import form_diff
+
+logger = logging.getLogger(__name__)
 
 def index(request):
     farm_list = Farm.objects.filter(public=True, end_year=None)
@@ -26,6 +38,11 @@ def cgu(request):
     return render(request, "census/cgu.html")
 
 
+@cache_control(public=True, max_age=300)
+def map_indicators(request):
+    # Precomputed density indicators and class breaks, for the choropleth layer of the map (see census.indicators)
+    return JsonResponse(indicators_payload(), json_dumps_params={"ensure_ascii": False, "separators": (",", ":")})
+
 class MapView(generic.ListView):
     template_name = "census/map.html"
     context_object_name = "municipalities"
@@ -57,46 +74,53 @@ class FarmUpdatePreviewView(generic.DetailView):
 
         return context
 
-class GetEditLinkFormView(generic.FormView):
+class GetEditLinkFormView(RateLimitMixin, generic.FormView):
+    rate_limit_scope = "edit_link"
     form_class = EmailForm
     template_name = "census/view.html"
 
     def form_valid(self, form):
-        farm = Farm.objects.get(pk=self.kwargs['pk'])
-        email_list = farm.email_list()
+        farm = get_object_or_404(Farm, pk=self.kwargs['pk'])
 
         self.success_url = reverse("census:view", args=(self.kwargs['pk'],))
 
-        if form.check_match(email_list):
-            # Delete existing link pointing to the same farm (if any)
-            # Update: don't, to avoid 404 if clicking on a old link that has not expired
-            #ExpiringUniqueEditLink.objects.filter(farm=farm).delete()
+        # One indexed lookup in the normalized contacts (farm and market gardeners addresses)
+        matches = ContactEmail.objects.filter(email=normalize_email(form.cleaned_data['email']), farm=farm).exists()
 
-            # Create a new expiring unique edit link
-            link = ExpiringUniqueEditLink.create(farm=farm, days=1)
-            link.save()
+        if matches:
+            # Signed token, nothing to store. Previous links stay valid until they expire, to avoid errors when
+            # clicking on an old link.
+            token = make_edit_token(farm, days=1)
 
             # Build absolute URI
-            unique_edit_url = self.request.build_absolute_uri(reverse("census:update", args=(link.token,)))
+            unique_edit_url = self.request.build_absolute_uri(reverse("census:update", args=(token,)))
 
             context = {
                 "url": unique_edit_url,
             }
 
             try:
-                send_email([form.cleaned_data['email']],
-                           "Modifier votre ferme : votre lien unique",
-                           "edit_link",
-                           context)
-
-                messages.success(self.request, "Le lien est parti et devrait arriver dans quelques minutes !"
-                                               " <b>Vérifiez vos courriers indésirables</b>.")
-            except Exception as e:
+                # If the mail host is down, the e-mail is queued and sent by the workers as soon as possible
+                status = send_email([form.cleaned_data['email']],
+                                    "Modifier votre ferme : votre lien unique",
+                                    "edit_link",
+                                    context,
+                                    queue_on_failure=True)
+
+                if status == "queued":
+                    messages.success(self.request, "Notre serveur d'e-mails est momentanément surchargé : le lien "
+                                                   "vous sera envoyé automatiquement dans les prochaines minutes."
+                                                   " <b>Vérifiez vos courriers indésirables</b>.")
+                else:
+                    messages.success(self.request, "Le lien est parti et devrait arriver dans quelques minutes !"
+                                                   " <b>Vérifiez vos courriers indésirables</b>.")
+            except Exception:
+                logger.exception("Could not send nor queue the edit link of farm %s", farm.pk)
                 messages.error(self.request, "Une erreur indépendante de ma volonté s'est produite lors de l'envoi de l'e-mail. "
                                              "Veuillez ré-essayer dans quelques minutes. Si cette erreur persiste, merci "
-                                             "de <a href='mailto:antoine.paris@uclouvain.be'>me contacter</a> en précisant "
-                                             "l'erreur ({0}). Je reviendrai vers vous avec votre lien d'édition unique et "
-                                             "tenterai de résoudre le problème au plus vite.".format(str(type(e).__name__) + ": " + str(e)[1:-1]))
+                                             "de <a href='mailto:antoine.paris@uclouvain.be'>me contacter</a>. Je reviendrai "
+                                             "vers vous avec votre lien d'édition unique et tenterai de résoudre le problème "
+                                             "au plus vite.")
 
         else:
             messages.error(self.request,"L'adresse e-mail indiquée ne correspond pas à celle(s) se trouvant"
@@ -105,6 +129,25 @@ class GetEditLinkFormView(generic.FormView):
 
         return super(GetEditLinkFormView, self).form_valid(form)
 
+class EditLinksView(RateLimitMixin, generic.FormView):
+    # Sends, in a single e-mail, an edit link for each farm linked to the given address
+    rate_limit_scope = "edit_links"
+    form_class = EmailForm
+    template_name = "census/links.html"
+
+    def form_valid(self, form):
+        self.success_url = reverse("census:links")
+
+        # The farms are looked up and the e-mail sent by a background job (see census.jobs): same answer, in the same
+        # time, whether the address is known or not, to not disclose which addresses are in the database
+        enqueue("edit_links", email=form.cleaned_data['email'], base_url=self.request.build_absolute_uri("/"))
+
+        messages.success(self.request, "Si cette adresse correspond à une ou plusieurs fermes de notre base de données, "
+                                       "vous recevrez dans quelques minutes un e-mail avec un lien pour chacune "
+                                       "d'entre elles. <b>Vérifiez vos courriers indésirables</b>.")
+
+        return super(EditLinksView, self).form_valid(form)
+
 class FarmView(View):
     context_object_name = "farm"
 
@@ -116,7 +159,8 @@ class FarmView(View):
         view = GetEditLinkFormView.as_view()
         return view(request, *args, **kwargs)
 
-class FarmCreateView(generic.CreateView):
+class FarmCreateView(RateLimitMixin, generic.CreateView):
+    rate_limit_scope = "create"
     model = Farm
     form_class = FarmForm
     template_name = "census/create.html"
@@ -128,26 +172,13 @@ class FarmCreateView(generic.CreateView):
         return context
 
     def form_valid(self, form):
-        new_farm = form.save()
+        with change_source("user"):
+            new_farm = form.save()
 
         self.success_url = reverse("census:thanks", args=(new_farm.id,))
 
-        admin_change_url = self.request.build_absolute_uri(reverse("admin:census_farm_change",
-                                                                   args=(new_farm.id,)))
-
-        context = {
-            "new_farm": new_farm,
-            "admin_change_url": admin_change_url,
-        }
-
-        # FIXME: not clean
-        try:
-            send_email(["antoine.paris@uclouvain.be"],
-                       "Nouvelle ferme : " + new_farm.name + " à " + new_farm.municipality.name,
-                       "new_farm",
-                       context)
-        except Exception as e:
-            pass
+        # Only record the event: the admin gets a digest of the events (see manage.py send_digest)
+        NotificationEvent.objects.create(kind="new_farm", farm=new_farm)
 
         return super(FarmCreateView, self).form_valid(form)
 
@@ -168,23 +199,40 @@ class FarmUpdateView(generic.UpdateView):
 
         self.success_url = reverse("census:update", args=(token,))
 
-        # Get the ExpiringUniqueEditLink and the corresponding farm
-        try:
-            link = ExpiringUniqueEditLink.objects.get(token=token)
-        except ExpiringUniqueEditLink.DoesNotExist:
-            return None
+        payload = read_edit_token(token)
 
-        farm = get_object_or_404(Farm, pk=link.farm_id)
+        if payload is not None:
+            farm = Farm.objects.filter(pk=payload["f"]).first()
+            if farm is None:
+                return None
 
-        # Needed in the context if the link has expired to redirect to farm/<farm_id>
-        self.farm_id = link.farm_id
+            self.display_form = token_is_valid(payload, farm)
+        else:
+            # Links sent before the signed tokens, stored in the database
+            link = ExpiringUniqueEditLink.objects.select_related("farm").filter(token=token).first()
+            if link is None:
+                return None
 
-        # If expiration date is in the future
-        if link.expiration_date > timezone.now():
-            self.display_form = True
+            farm = link.farm
+            self.display_form = link.expiration_date > timezone.now()
+
+        # Needed in the context if the link has expired to redirect to farm/<farm_id>
+        self.farm_id = farm.id
 
         return farm
 
+    def post(self, request, *args, **kwargs):
+        # Expired, revoked or unknown links must not allow to save anything
+        self.object = self.get_object()
+        if not self.display_form:
+            return self.render_to_response(self.get_context_data())
+
+        form = self.get_form()
+        if form.is_valid():
+            return self.form_valid(form)
+        else:
+            return self.form_invalid(form)
+
     def get_context_data(self, **kwargs):
         context = super(FarmUpdateView, self).get_context_data(**kwargs)
 
@@ -194,39 +242,16 @@ class FarmUpdateView(generic.UpdateView):
         return context
 
     def form_valid(self, form):
+        # If we're here, then the farm has been edit by a user of the platform (set before the save, to log a
+        # single change)
+        form.instance.edited_by_user = True
+
         # save() returns the instance that has been saved to the database
-        modified_farm = form.save()
-
-        # If we're here, then the farm has been edit by a user of the platform
-        modified_farm.edited_by_user = True
-
-        admin_change_url = self.request.build_absolute_uri(reverse("admin:census_farm_change",
-                                                                   args=(modified_farm.id,)))
-
-        diff = dict()
-        if form.has_changed():
-            changed_data = form.changed_data
-
-            for field in changed_data:
-                diff[field] = {
-                    'old': form.initial[field],
-                    'new': form.cleaned_data[field],
-                }
-
-        context = {
-            'admin_change_url': admin_change_url,
-            'modified_farm': modified_farm,
-            'diff': diff,
-        }
-
-        # FIXME: not clean
-        try:
-            send_email(["antoine.paris@uclouvain.be"],
-                       "Ferme modifiée : " + modified_farm.name + " à " + modified_farm.municipality.name,
-                       "farm_updated",
-                       context)
-        except Exception as e:
-            pass
+        with change_source("user"):
+            modified_farm = form.save()
+
+        # Only record the event: the admin gets a digest of the events (see manage.py send_digest)
+        NotificationEvent.objects.create(kind="farm_updated", farm=modified_farm, diff=form_diff(form))
 
         messages.success(self.request,"Modifications enregistrées !")
 
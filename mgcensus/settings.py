@@ -138,3 +138,78 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+
+# Don't let a slow mail host tie up user requests
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "10"))
+
+# E-mails sent during a user request that are queued if they fail: a single attempt, with this shorter timeout
+EMAIL_SYNC_TIMEOUT = int(os.getenv("EMAIL_SYNC_TIMEOUT", "3"))
+
+# Transient SMTP failures are retried EMAIL_RETRIES times in total, with a jittered exponential backoff
+EMAIL_RETRIES = int(os.getenv("EMAIL_RETRIES", "3"))
+EMAIL_RETRY_BASE_DELAY = float(os.getenv("EMAIL_RETRY_BASE_DELAY", "0.5"))
+
+# Circuit breaker: stop trying for EMAIL_BREAKER_COOLDOWN seconds after that many consecutive failures
+EMAIL_BREAKER_THRESHOLD = int(os.getenv("EMAIL_BREAKER_THRESHOLD", "5"))
+EMAIL_BREAKER_COOLDOWN = int(os.getenv("EMAIL_BREAKER_COOLDOWN", "60"))
+
+# Census campaigns
+CENSUS_YEAR = int(os.getenv("CENSUS_YEAR", "2026"))
+
+# Frozen census of each year (see census.snapshots)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshots"))
+
+# Used to build absolute URLs outside of a request (e.g. in management commands)
+CENSUS_BASE_URL = os.getenv("CENSUS_BASE_URL", "http://localhost:8000")
+
+# Sending quotas of the mail provider (token bucket + rolling 24 hours quota)
+CAMPAIGN_RATE_PER_MINUTE = int(os.getenv("CAMPAIGN_RATE_PER_MINUTE", "20"))
+CAMPAIGN_BURST = int(os.getenv("CAMPAIGN_BURST", "5"))
+CAMPAIGN_DAILY_QUOTA = int(os.getenv("CAMPAIGN_DAILY_QUOTA", "1000"))
+
+# Background jobs: a running job without heartbeat for that many seconds is taken over by another worker
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "600"))
+
+# Number of SMTP connections used in parallel to send a batch of e-mails
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "4"))
+
+# Expired edit links are kept that many days (they still redirect to the farm), then purged by purge_edit_links
+EDIT_LINK_GRACE_DAYS = int(os.getenv("EDIT_LINK_GRACE_DAYS", "30"))
+
+# Rate limits, mail metrics and circuit breaker live in the cache: with several workers, use a shared backend, e.g.
+# CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache and CACHE_LOCATION=<table> (see createcachetable)
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Rate limits of the public forms, per endpoint and per key, as "<requests>/<s|m|h|d>" (see census.ratelimit)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True") == "True"
+RATE_LIMITS = {
+    "create": {"ip": "10/h"},
+    "edit_link": {"ip": "30/h", "farm": "5/h", "email": "5/h"},
+    "edit_links": {"ip": "10/h", "email": "3/h"},
+}
+
+# Number of reverse proxies in front of the application (e.g. 1 for nginx): the client address is then read from
+# X-Forwarded-For, that many entries from the right. With 0, all the visitors would share the address of the proxy.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+
+# Admin changelists of large tables (see census.pagination): above that many rows, counts are estimated or cached
+ADMIN_EXACT_COUNT_THRESHOLD = int(os.getenv("ADMIN_EXACT_COUNT_THRESHOLD", "10000"))
+ADMIN_COUNT_CACHE_TIMEOUT = int(os.getenv("ADMIN_COUNT_CACHE_TIMEOUT", "300"))
+
+# Streaming exports (see census.exports): number of rows fetched per query
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Statistics dashboard (see census.statistics): lifetime of the cached results, in seconds
+STATISTICS_CACHE_TIMEOUT = int(os.getenv("STATISTICS_CACHE_TIMEOUT", "3600"))
+
+# Link checker (see census.links): links are checked again after that many days, with that many connections at once
+# (and per host), and a timeout in seconds for each request
+LINK_CHECK_INTERVAL_DAYS = int(os.getenv("LINK_CHECK_INTERVAL_DAYS", "7"))
+LINK_CHECK_CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", "20"))
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", "2"))
+LINK_CHECK_TIMEOUT = float(os.getenv("LINK_CHECK_TIMEOUT", "10"))